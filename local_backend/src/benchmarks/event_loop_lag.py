@@ -0,0 +1,124 @@
+"""
+Event-loop responsiveness under concurrent optimize load.
+
+Builds a synthetic connection graph in memory (no database needed), keeps
+`--concurrency` optimize route searches in flight for `--seconds`, and
+meanwhile measures how late a 10 ms timer fires on the event loop. That
+lateness is what every other request on the same uvicorn worker waits.
+
+Run from local_backend/src:
+    python -m benchmarks.event_loop_lag --nodes 5000 --executors inline thread process
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("MONGO_DB", "medichain_benchmark")
+
+from optimizer.algorithm import plan_routes
+from optimizer.executor import GraphExecutor
+from optimizer.graph_cache import graph_cache
+
+PROBE_INTERVAL = 0.01
+
+
+def build_network(nodes, degree, seed):
+    rng = random.Random(seed)
+    wallets = [f"0xB{i}" for i in range(nodes)]
+    connections = []
+    for i in range(1, nodes):
+        # A random spanning tree keeps the network connected, extra edges add route choice
+        for j in [rng.randrange(i)] + rng.sample(range(nodes), degree - 1):
+            if j != i:
+                connections.append({
+                    "fromWalletAddress": wallets[i],
+                    "toWalletAddress": wallets[j],
+                    "costPerUnit": rng.uniform(1, 20),
+                    "transitTimeDays": rng.randint(1, 7),
+                })
+    graph_cache.load_connections(connections)
+    return wallets
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def probe_lag(stop, samples):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        samples.append((time.perf_counter() - started - PROBE_INTERVAL) * 1000)
+
+
+async def optimize_load(executor, wallets, rng, stop, latencies):
+    while not stop.is_set():
+        target = rng.choice(wallets)
+        sources = [
+            {"wallet": w, "available_qty": rng.randint(1, 20), "product_ids": []}
+            for w in rng.sample(wallets, 20) if w != target
+        ]
+        started = time.perf_counter()
+        await executor.run(plan_routes, "greedy", sources, target, 10, 1.0, False)
+        latencies.append((time.perf_counter() - started) * 1000)
+        # Stand-in for the database awaits a real request makes between searches
+        await asyncio.sleep(0)
+
+
+async def run_one(kind, wallets, args):
+    executor = GraphExecutor(kind, args.workers)
+    stop = asyncio.Event()
+    lag, latencies = [], []
+    rng = random.Random(args.seed)
+
+    # Warm the pool so worker start-up isn't counted as lag
+    await executor.run(plan_routes, "greedy", [], wallets[0], 1, 1.0, False)
+
+    tasks = [asyncio.create_task(probe_lag(stop, lag))]
+    tasks += [
+        asyncio.create_task(optimize_load(executor, wallets, rng, stop, latencies))
+        for _ in range(args.concurrency)
+    ]
+    await asyncio.sleep(args.seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+    executor.shutdown()
+
+    return {
+        "executor": kind,
+        "optimize_calls": len(latencies),
+        "optimize_per_second": len(latencies) / args.seconds,
+        "optimize_ms_p50": statistics.median(latencies) if latencies else 0.0,
+        "loop_lag_ms_p50": percentile(lag, 0.5),
+        "loop_lag_ms_p99": percentile(lag, 0.99),
+        "loop_lag_ms_max": max(lag, default=0.0),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=5000)
+    parser.add_argument("--degree", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--executors", nargs="+", default=["inline", "thread", "process"])
+    args = parser.parse_args()
+
+    wallets = build_network(args.nodes, args.degree, args.seed)
+    results = [await run_one(kind, wallets, args) for kind in args.executors]
+    print(json.dumps({
+        "nodes": len(graph_cache.csr()),
+        "edges": graph_cache.csr().edge_count,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,202 @@
+"""
+Seeded synthetic supply network for the optimizer benchmarks.
+
+generate_network() returns documents shaped like the manufacturers,
+distributors, retailers and connections collections, with serialized
+inventories. Product unit documents are produced lazily by
+unit_documents(), since a large run has millions of them. The same seed and
+sizes always give the same network.
+"""
+import math
+import random
+from datetime import datetime
+
+# Rough bounding box of India, [lng, lat]
+LNG_RANGE = (68.0, 97.0)
+LAT_RANGE = (8.0, 35.0)
+
+# Share of nodes per entity type
+MANUFACTURER_SHARE = 0.02
+DISTRIBUTOR_SHARE = 0.28
+
+# Nearest-neighbour candidates sampled per node when wiring connections
+NEIGHBOUR_SAMPLE = 40
+
+
+def _km(a, b):
+    # Equirectangular approximation is plenty for picking neighbours
+    (lng1, lat1), (lng2, lat2) = a, b
+    x = math.radians(lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return 6371.0 * math.hypot(x, y)
+
+
+def _connect(rng, src, dst, points, kinds, cold):
+    km = _km(points[src], points[dst])
+    return {
+        "fromWalletAddress": src,
+        "fromType": kinds[src],
+        "toWalletAddress": dst,
+        "toType": kinds[dst],
+        "distanceKm": round(km, 1),
+        "transitTimeDays": max(1, round(km / 400 + rng.random())),
+        "costPerUnit": round(0.5 + km * rng.uniform(0.01, 0.03), 2),
+        "active": True,
+        "coldChain": cold,
+    }
+
+
+def generate_network(nodes=1000, products=20, units=100_000, degree=3, cold_fraction=0.2,
+                     in_transit_fraction=0.05, seed=42):
+    """
+    nodes: total entities, split 2% manufacturers / 28% distributors / 70% retailers.
+    units: serialized product units spread over inventories (80% at distributors).
+    degree: connections per distributor to nearby distributors; every retailer
+    and manufacturer links to its nearest distributors.
+    Returns a dict of document lists plus "product_names", "unit_weights",
+    "cold_products" and "in_transit" (unit ids marked inTransit).
+    """
+    rng = random.Random(seed)
+    n_manufacturers = max(1, int(nodes * MANUFACTURER_SHARE))
+    n_distributors = max(1, int(nodes * DISTRIBUTOR_SHARE))
+    n_retailers = max(1, nodes - n_manufacturers - n_distributors)
+
+    product_names = [f"drug-{i:04d}" for i in range(products)]
+    unit_weights = {name: round(rng.uniform(0.05, 2.0), 3) for name in product_names}
+    cold_products = {name for name in product_names if rng.random() < cold_fraction}
+
+    points, kinds = {}, {}
+
+    def place(prefix, kind, count):
+        wallets = []
+        for i in range(count):
+            wallet = f"0x{prefix}{i:06d}"
+            points[wallet] = (rng.uniform(*LNG_RANGE), rng.uniform(*LAT_RANGE))
+            kinds[wallet] = kind
+            wallets.append(wallet)
+        return wallets
+
+    manufacturer_wallets = place("M", "manufacturer", n_manufacturers)
+    distributor_wallets = place("D", "distributor", n_distributors)
+    retailer_wallets = place("R", "retailer", n_retailers)
+    cold_nodes = {w for w in points if rng.random() < max(cold_fraction, 0.3)}
+
+    def geo(wallet):
+        return {"type": "Point", "coordinates": list(points[wallet])}
+
+    def nearest_distributors(wallet, k):
+        sample = rng.sample(distributor_wallets, min(NEIGHBOUR_SAMPLE, len(distributor_wallets)))
+        return sorted((d for d in sample if d != wallet), key=lambda d: _km(points[wallet], points[d]))[:k]
+
+    connections = []
+    seen = set()
+
+    def link(src, dst):
+        if src != dst and (src, dst) not in seen and (dst, src) not in seen:
+            seen.add((src, dst))
+            cold = src in cold_nodes and dst in cold_nodes and rng.random() < 0.8
+            connections.append(_connect(rng, src, dst, points, kinds, cold))
+
+    for i, wallet in enumerate(distributor_wallets):
+        if i:
+            # Link to an earlier distributor so the distributor tier is connected
+            link(wallet, distributor_wallets[rng.randrange(i)])
+        for other in nearest_distributors(wallet, degree):
+            link(wallet, other)
+    for wallet in manufacturer_wallets:
+        for other in nearest_distributors(wallet, degree + 1):
+            link(wallet, other)
+    for wallet in retailer_wallets:
+        for other in nearest_distributors(wallet, 2):
+            link(other, wallet)
+
+    # Serialized inventories
+    inventories = {wallet: {} for wallet in distributor_wallets + retailer_wallets}
+    average_lot = max(1, units // max(1, (n_distributors + n_retailers) * 3))
+    next_id = 0
+    while next_id < units:
+        holder = rng.choice(distributor_wallets) if rng.random() < 0.8 else rng.choice(retailer_wallets)
+        name = rng.choice(product_names)
+        lot = min(units - next_id, rng.randint(1, 2 * average_lot))
+        inventories[holder].setdefault(name, []).extend(f"U{i:09d}" for i in range(next_id, next_id + lot))
+        next_id += lot
+    in_transit = {f"U{i:09d}" for i in rng.sample(range(units), int(units * in_transit_fraction))}
+
+    now = datetime.utcnow()
+
+    def distributor_inventory(wallet):
+        return [
+            {"productName": name, "productIds": ids, "qty": len(ids), "reorderLevel": rng.randint(5, 50)}
+            for name, ids in inventories[wallet].items()
+        ]
+
+    def retailer_inventory(wallet):
+        return [
+            {"productName": name, "productIds": ids, "qtyRemaining": len(ids), "qtyAdded": len(ids),
+             "lastStockAddedDate": now, "reorderLevel": rng.randint(5, 50)}
+            for name, ids in inventories[wallet].items()
+        ]
+
+    manufacturers = [{
+        "name": f"Manufacturer {i}",
+        "address": None,
+        "walletAddress": wallet,
+        "geo": geo(wallet),
+        "contacts": {},
+        "productsProduced": rng.sample(product_names, min(len(product_names), 5)),
+        "productionTimes": [],
+        "certificates": [],
+        "coldChain": wallet in cold_nodes,
+    } for i, wallet in enumerate(manufacturer_wallets)]
+    for doc in manufacturers:
+        doc["productionTimes"] = [{"productName": p, "days": rng.randint(2, 20)} for p in doc["productsProduced"]]
+
+    distributors = [{
+        "name": f"Distributor {i}",
+        "walletAddress": wallet,
+        "geo": geo(wallet),
+        "contacts": None,
+        "inventory": distributor_inventory(wallet),
+        "active": True,
+        "coldChain": wallet in cold_nodes,
+    } for i, wallet in enumerate(distributor_wallets)]
+
+    retailers = [{
+        "name": f"Retailer {i}",
+        "walletAddress": wallet,
+        "geo": geo(wallet),
+        "licenceNo": f"LIC-{i:06d}",
+        "inventory": retailer_inventory(wallet),
+        "coldChain": wallet in cold_nodes,
+    } for i, wallet in enumerate(retailer_wallets)]
+
+    return {
+        "manufacturers": manufacturers,
+        "distributors": distributors,
+        "retailers": retailers,
+        "connections": connections,
+        "product_names": product_names,
+        "unit_weights": unit_weights,
+        "cold_products": cold_products,
+        "in_transit": in_transit,
+    }
+
+
+def unit_documents(network):
+    """Yields one `products` document per serialized unit."""
+    for entity_type in ("distributors", "retailers"):
+        for doc in network[entity_type]:
+            location = {"type": entity_type[:-1], "walletAddress": doc["walletAddress"]}
+            for item in doc["inventory"]:
+                name = item["productName"]
+                for unit_id in item["productIds"]:
+                    yield {
+                        "productId": unit_id,
+                        "productName": name,
+                        "atcCode": None,
+                        "coldChain": name in network["cold_products"],
+                        "unitWeight": network["unit_weights"][name],
+                        "inTransit": unit_id in network["in_transit"],
+                        "location": location,
+                        "shelf_life": None,
+                    }
@@ -0,0 +1,255 @@
+"""
+Optimizer benchmark on a seeded synthetic network.
+
+Backends:
+  memory  Loads the generated network straight into the graph cache and the
+          inventory index (no database) and times the optimizer phases:
+          legacy graph build, cache load, source scan, route planning per
+          mode and point-to-point searches.
+  mongo   Writes the network into MONGO_URI / --mongo-db (collections there
+          are dropped first) and times cache loads plus end-to-end
+          optimize_supply_path calls.
+
+Prints one JSON document (or writes it to --output) with per-phase latency,
+throughput and peak traced memory, so runs can be diffed between commits.
+
+Run from local_backend/src:
+    python -m benchmarks.optimizer_benchmark --nodes 10000 --units 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+MODES = ["greedy", "mincost", "astar", "pareto"]
+INSERT_BATCH = 10_000
+
+
+class PhaseRecorder:
+    """Collects wall time, call counts and traced peak memory per named phase."""
+
+    def __init__(self, trace_memory):
+        self.trace_memory = trace_memory
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            stats = self.phases.setdefault(name, {"samples": [], "peak_mb": 0.0})
+            stats["samples"].append(elapsed)
+            if self.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                stats["peak_mb"] = max(stats["peak_mb"], peak / 2 ** 20)
+
+    def report(self):
+        out = {}
+        for name, stats in self.phases.items():
+            samples = sorted(stats["samples"])
+            total = sum(samples)
+            out[name] = {
+                "calls": len(samples),
+                "total_s": round(total, 6),
+                "p50_ms": round(statistics.median(samples) * 1000, 3),
+                "p95_ms": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))] * 1000, 3),
+                "max_ms": round(samples[-1] * 1000, 3),
+                "per_second": round(len(samples) / total, 2) if total else None,
+                "peak_mb": round(stats["peak_mb"], 2) if self.trace_memory else None,
+            }
+        return out
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def pick_queries(network, count, rng):
+    retailers = [doc["walletAddress"] for doc in network["retailers"]]
+    return [
+        (rng.choice(network["product_names"]), rng.randint(1, 50), rng.choice(retailers))
+        for _ in range(count)
+    ]
+
+
+def run_memory(network, queries, args, recorder):
+    from optimizer.utils import build_weighted_graph, shortest_path, shortest_path_tree, reverse_graph
+    from optimizer.graph_cache import graph_cache
+    from optimizer.inventory_index import inventory_index
+    from optimizer.algorithm import build_source_nodes, plan_routes, pareto_routes
+
+    with recorder.phase("build_weighted_graph"):
+        build_weighted_graph(network["connections"], 1, 1)
+
+    with recorder.phase("graph_cache_load"):
+        graph_cache.load_nodes(network["manufacturers"] + network["distributors"] + network["retailers"])
+        graph_cache.load_connections(network["connections"])
+        csr = graph_cache.csr()
+
+    with recorder.phase("inventory_index_load"):
+        for entity_type in ("distributor", "retailer"):
+            for doc in network[entity_type + "s"]:
+                inventory_index._set(doc["walletAddress"], entity_type, doc["inventory"])
+        inventory_index.loaded = True
+
+    in_transit = network["in_transit"]
+    lookup = graph_cache.transit_times
+    for product_name, qty, target in queries:
+        with recorder.phase("source_scan"):
+            holders = inventory_index.products.get(product_name, {})
+            available = {
+                pid for wallet, entry in holders.items()
+                if wallet != target and entry["entityType"] != "retailer"
+                for pid in entry["productIds"] if pid not in in_transit
+            }
+            source_nodes = build_source_nodes(holders, available, target, csr)
+
+        weight = network["unit_weights"][product_name]
+        for mode in args.modes:
+            with recorder.phase(f"plan_{mode}"):
+                if mode == "pareto":
+                    pareto_routes(csr, lookup, source_nodes, target, weight * qty)
+                else:
+                    plan_routes(csr, lookup, mode, source_nodes, target, qty, weight, False)
+
+    graph = graph_cache.view()
+    rng = random.Random(args.seed + 1)
+    wallets = list(csr.index)
+    for _ in range(args.point_queries):
+        src, dst = rng.sample(wallets, 2)
+        with recorder.phase("shortest_path_dijkstra"):
+            shortest_path(graph, src, dst, False)
+        with recorder.phase("shortest_path_astar"):
+            shortest_path(graph, src, dst, False, astar=True)
+        with recorder.phase("shortest_path_tree"):
+            shortest_path_tree(reverse_graph(graph), dst, False)
+
+
+async def load_mongo(network, db, recorder):
+    from benchmarks.generator import unit_documents
+
+    for name in ("manufacturers", "distributors", "retailers", "connections", "products"):
+        await db.drop_collection(name)
+
+    with recorder.phase("mongo_insert_entities"):
+        for name in ("manufacturers", "distributors", "retailers", "connections"):
+            docs = network[name]
+            for i in range(0, len(docs), INSERT_BATCH):
+                await db[name].insert_many([dict(doc) for doc in docs[i:i + INSERT_BATCH]])
+
+    with recorder.phase("mongo_insert_units"):
+        await db.products.create_index("productId")
+        batch = []
+        for doc in unit_documents(network):
+            batch.append(doc)
+            if len(batch) == INSERT_BATCH:
+                await db.products.insert_many(batch)
+                batch = []
+        if batch:
+            await db.products.insert_many(batch)
+
+
+async def run_end_to_end(network, queries, args, recorder):
+    from config.db import db
+    from optimizer.graph_cache import graph_cache
+    from optimizer.inventory_index import inventory_index
+    from optimizer.result_cache import result_cache
+    from optimizer.algorithm import optimize_supply_path
+
+    await load_mongo(network, db, recorder)
+
+    with recorder.phase("graph_cache_load"):
+        await graph_cache.load()
+    with recorder.phase("inventory_index_load"):
+        await inventory_index.load()
+
+    # Measure the optimizer, not the result cache
+    result_cache.max_size = 0
+    for product_name, qty, target in queries:
+        for mode in args.modes:
+            with recorder.phase(f"optimize_{mode}"):
+                await optimize_supply_path(product_name, qty, target, mode=mode)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["memory", "mongo"], default="memory")
+    parser.add_argument("--nodes", type=int, default=1000)
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--units", type=int, default=100_000)
+    parser.add_argument("--degree", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--point-queries", type=int, default=50)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-db", default="medichain_benchmark")
+    parser.add_argument("--executor", choices=["inline", "thread", "process"], default="inline")
+    parser.add_argument("--no-trace-memory", action="store_true", help="skip tracemalloc (faster, no peak_mb)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    # Must be set before config.db and the optimizer modules are imported
+    os.environ["MONGO_DB"] = args.mongo_db
+    os.environ["OPTIMIZER_EXECUTOR"] = args.executor
+    from benchmarks.generator import generate_network
+
+    recorder = PhaseRecorder(trace_memory=not args.no_trace_memory)
+    if recorder.trace_memory:
+        tracemalloc.start()
+
+    with recorder.phase("generate"):
+        network = generate_network(
+            args.nodes, args.products, args.units, args.degree, seed=args.seed
+        )
+    queries = pick_queries(network, args.queries, random.Random(args.seed))
+
+    if args.backend == "memory":
+        run_memory(network, queries, args, recorder)
+    else:
+        asyncio.run(run_end_to_end(network, queries, args, recorder))
+
+    report = {
+        "benchmark": "optimizer",
+        "backend": args.backend,
+        "commit": git_commit(),
+        "params": {k: v for k, v in vars(args).items() if k != "output"},
+        "network": {
+            "manufacturers": len(network["manufacturers"]),
+            "distributors": len(network["distributors"]),
+            "retailers": len(network["retailers"]),
+            "connections": len(network["connections"]),
+            "units": args.units,
+        },
+        "phases": recorder.report(),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if resource else None,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 import certifi
 import os
+from optimizer.stats import mongo_command_counter
 
 load_dotenv()
 
@@ -10,5 +11,6 @@ MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB = os.getenv("MONGO_DB")
 
 
-client = AsyncIOMotorClient(MONGO_URI) #tls=True, tlsAllowInvalidCertificates=False
+# mongo_command_counter attributes round trips to optimizer traces (explain=true)
+client = AsyncIOMotorClient(MONGO_URI, event_listeners=[mongo_command_counter]) #tls=True, tlsAllowInvalidCertificates=False
 db = client[MONGO_DB]
@@ -0,0 +1,193 @@
+"""
+Declarative index registry for the collections the controllers query.
+
+Every lookup by a business key (orderId, walletAddress, productId,
+shipmentId, ...) and every connection pair query would otherwise be a
+collection scan. ensure_indexes() applies INDEXES idempotently at startup.
+An index that already exists with the same key and the same options
+(unique, sparse, partialFilterExpression, expireAfterSeconds) is left alone.
+One with the same key but other options is reported as mismatched and left
+as it is: fixing it means dropping it first, which is left to an operator.
+An index that can't be built (e.g. duplicate keys under a unique index) is
+reported without stopping the others.
+
+Collections owned by optional features create their own indexes:
+unit_reservations (optimizer.reservations) and network_changes
+(optimizer.snapshot).
+
+Report missing and unused indexes, or apply the registry (run from local_backend/src):
+    python -m config.indexes --report
+    python -m config.indexes --apply
+"""
+import argparse
+import asyncio
+import json
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from config.db import db
+
+
+def _unique_key(field):
+    # Unique only among documents that have the key, so older documents without it don't collide on null
+    return IndexModel([(field, ASCENDING)], name=f"{field}_unique", unique=True,
+                      partialFilterExpression={field: {"$type": "string"}})
+
+
+INDEXES = {
+    "manufacturers": [
+        IndexModel([("walletAddress", ASCENDING)], name="walletAddress_unique", unique=True),
+        _unique_key("manufacturerId"),
+    ],
+    "distributors": [
+        IndexModel([("walletAddress", ASCENDING)], name="walletAddress_unique", unique=True),
+        _unique_key("distributorId"),
+    ],
+    "retailers": [
+        IndexModel([("walletAddress", ASCENDING)], name="walletAddress_unique", unique=True),
+        _unique_key("retailerId"),
+    ],
+    "connections": [
+        # add/update/delete_connection and the "from" lookups; also serves fromWalletAddress alone
+        IndexModel([("fromWalletAddress", ASCENDING), ("toWalletAddress", ASCENDING)],
+                   name="fromWalletAddress_toWalletAddress_unique", unique=True),
+        # get_connection_to_id and the "to" half of get_connections_for_entity
+        IndexModel([("toWalletAddress", ASCENDING)], name="toWalletAddress"),
+    ],
+    "products": [
+        _unique_key("productId"),
+        IndexModel([("batchId", ASCENDING)], name="batchId"),
+        IndexModel([("location.walletAddress", ASCENDING), ("location.type", ASCENDING)],
+                   name="location_walletAddress_type"),
+        # Only the units in transit, which get_products_in_transit lists
+        IndexModel([("inTransit", ASCENDING)], name="inTransit_true",
+                   partialFilterExpression={"inTransit": True}),
+    ],
+    "orders": [
+        _unique_key("orderId"),
+        IndexModel([("retailerWalletAddress", ASCENDING)], name="retailerWalletAddress"),
+        # Multikey: orders whose allocation paths start from a distributor
+        IndexModel([("lineItems.allocations.path.fromWalletAddress", ASCENDING), ("status", ASCENDING)],
+                   name="allocations_path_fromWalletAddress_status"),
+        # Pending allocations per distributor, without the already fulfilled orders
+        IndexModel([("lineItems.allocations.path.fromWalletAddress", ASCENDING)],
+                   name="pending_allocations_path_fromWalletAddress",
+                   partialFilterExpression={"lineItems.allocations.fulfilled": False}),
+    ],
+    "shipments": [
+        _unique_key("shipmentId"),
+        IndexModel([("parentShipmentId", ASCENDING)], name="parentShipmentId", sparse=True),
+    ],
+    "proposed_orders": [
+        IndexModel([("status", ASCENDING)], name="status"),
+        # The replenishment planner upserts one open proposal per (wallet, product)
+        IndexModel([("retailerWalletAddress", ASCENDING), ("productName", ASCENDING)],
+                   name="retailerWalletAddress_productName_proposed", unique=True,
+                   partialFilterExpression={"status": "proposed"}),
+    ],
+    "unit_allocations": [
+        IndexModel([("orderId", ASCENDING)], name="orderId"),
+    ],
+}
+
+
+# Index options that change what an index enforces or holds
+INDEX_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+
+def _key(spec):
+    return tuple((field, direction) for field, direction in spec.items())
+
+
+def _options(spec):
+    # unique=False and sparse=False are the same as leaving them out
+    return {option: spec[option] for option in INDEX_OPTIONS if spec.get(option) not in (None, False)}
+
+
+async def _existing(collection):
+    """key -> [{"name", options...}, ...] for the collection's indexes."""
+    existing = {}
+    async for index in collection.list_indexes():
+        existing.setdefault(_key(index["key"]), []).append({"name": index["name"], **_options(index)})
+    return existing
+
+
+def _mismatch(model, existing):
+    """
+    {"expected", "existing"} when indexes with `model`'s key exist but none
+    has its options; None when one matches or there is none with that key.
+    """
+    matches = existing.get(_key(model.document["key"]))
+    expected = _options(model.document)
+    if not matches or any({k: v for k, v in index.items() if k != "name"} == expected for index in matches):
+        return None
+    return {"expected": expected, "existing": matches}
+
+
+async def ensure_indexes(registry=INDEXES):
+    """
+    Creates the registry's indexes that are missing. Returns
+    {"created": [...], "failed": {"collection.name": error},
+    "mismatched": {"collection.name": {"expected", "existing"}}}.
+    """
+    created, failed, mismatched = [], {}, {}
+    for name, models in registry.items():
+        collection = db.get_collection(name)
+        existing = await _existing(collection)
+        for model in models:
+            index_name = f"{name}.{model.document['name']}"
+            if _key(model.document["key"]) in existing:
+                mismatch = _mismatch(model, existing)
+                if mismatch is not None:
+                    mismatched[index_name] = mismatch
+                continue
+            try:
+                await collection.create_indexes([model])
+                created.append(index_name)
+            except OperationFailure as e:
+                failed[index_name] = str(e)
+    return {"created": created, "failed": failed, "mismatched": mismatched}
+
+
+async def index_report(registry=INDEXES):
+    """
+    Per collection: registry indexes that don't exist yet, ones whose key
+    exists with other options, and existing indexes with no recorded use
+    since the server started ($indexStats; left out where the server
+    doesn't support it).
+    """
+    report = {}
+    for name, models in registry.items():
+        collection = db.get_collection(name)
+        existing = await _existing(collection)
+        entry = {"missing": [], "mismatched": {}}
+        for model in models:
+            if _key(model.document["key"]) not in existing:
+                entry["missing"].append(model.document["name"])
+            elif _mismatch(model, existing) is not None:
+                entry["mismatched"][model.document["name"]] = _mismatch(model, existing)
+        try:
+            stats = await collection.aggregate([{"$indexStats": {}}]).to_list(length=None)
+            entry["unused"] = [
+                {"name": stat["name"], "since": stat["accesses"]["since"].isoformat()}
+                for stat in stats
+                if stat["name"] != "_id_" and stat["accesses"]["ops"] == 0
+            ]
+        except OperationFailure:
+            pass
+        report[name] = entry
+    return report
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--report", action="store_true", help="list missing and unused indexes (default)")
+    parser.add_argument("--apply", action="store_true", help="create the missing indexes")
+    args = parser.parse_args()
+    if args.apply:
+        print(json.dumps(await ensure_indexes(), indent=2))
+    if args.report or not args.apply:
+        print(json.dumps(await index_report(), indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
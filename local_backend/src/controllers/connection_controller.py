@@ -2,6 +2,9 @@ from fastapi import HTTPException
 from models.connection import ProductInDB, ConnectionModel, ConnectionUpdateModel
 from config.db import db
 from bson import ObjectId
+from pymongo import ReturnDocument
+from optimizer.graph_cache import graph_cache
+from optimizer.snapshot import network_changes
 
 collection = db.get_collection('connections')
 
@@ -49,6 +52,8 @@ async def add_connection(connection: ConnectionModel):
     connection_dict = connection.model_dump(by_alias=True)
     result = await collection.insert_one(connection_dict)
     new_connection = await collection.find_one({"_id": result.inserted_id})
+    graph_cache.upsert_connection(new_connection)
+    await network_changes.record(connections=[(connection.fromWalletAddress, connection.toWalletAddress)])
     return ProductInDB(**new_connection)
 
 
@@ -97,6 +102,8 @@ async def delete_connection(from_walletAddress: str, to_walletAddress: str):
     })
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Connection not found")
+    graph_cache.remove_connection(from_walletAddress, to_walletAddress)
+    await network_changes.record(connections=[(from_walletAddress, to_walletAddress)])
     return {"detail": "Connection deleted"}
 
 
@@ -104,13 +111,23 @@ async def delete_connection(from_walletAddress: str, to_walletAddress: str):
 async def update_connection(from_walletAddress: str, to_walletAddress: str, update_data: ConnectionUpdateModel):
     update_dict = {k: v for k, v in update_data.dict(exclude_unset=True).items()}
     
-    result = await collection.update_one(
+    # Fetch the previous version in the same round trip so the graph cache can be patched
+    before = await collection.find_one_and_update(
         {"fromWalletAddress": from_walletAddress, "toWalletAddress": to_walletAddress},
-        {"$set": update_dict}
+        {"$set": update_dict},
+        return_document=ReturnDocument.BEFORE
     )
 
-    if result.modified_count == 0:
+    if before is None or all(before.get(k) == v for k, v in update_dict.items()):
         raise HTTPException(status_code=404, detail="Connection not found or nothing changed")
+
+    graph_cache.remove_connection(from_walletAddress, to_walletAddress)
+    graph_cache.upsert_connection({**before, **update_dict})
+    new_key = (
+        update_dict.get("fromWalletAddress") or from_walletAddress,
+        update_dict.get("toWalletAddress") or to_walletAddress,
+    )
+    await network_changes.record(connections={(from_walletAddress, to_walletAddress), new_key})
     
     return {"detail": "Connection updated successfully"}
 
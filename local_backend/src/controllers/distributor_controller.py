@@ -1,9 +1,12 @@
 from fastapi import HTTPException
 from models.distributor import ProductInDB, DistributorModel, DistributorUpdateModel
 from config.db import db
+from optimizer.inventory_index import inventory_index
+from optimizer.graph_cache import graph_cache
+from utils.ids import id_service
+from optimizer.snapshot import network_changes
 from datetime import datetime
 from bson import ObjectId
-import random
 
 
 collection = db.get_collection("distributors")
@@ -13,18 +16,16 @@ async def add_distributor(distributor: DistributorModel):
     if await collection.find_one({"walletAddress": distributor.walletAddress}):
         raise HTTPException(status_code=400, detail="WalletAddress already exists")
     # Generate a unique distributorId
-    suffix = random.randint(1000, 9999)
-    distributor_id = f"dist_{suffix}"
-
-    # Ensure uniqueness
-    while await collection.find_one({"distributorId": distributor_id}):
-        suffix = random.randint(1000, 9999)
-        distributor_id = f"dist_{suffix}"
+    distributor_id = await id_service.next("dist_")
 
     distributor_dict = distributor.model_dump(exclude_unset=True)
     distributor_dict["distributorId"] = distributor_id
 
     result = await collection.insert_one(distributor_dict)
+    inventory_index.set_inventory(distributor_dict["walletAddress"], "distributor", distributor_dict.get("inventory"))
+    graph_cache.set_location(distributor_dict["walletAddress"], distributor_dict.get("geo"))
+    graph_cache.set_cold_chain(distributor_dict["walletAddress"], distributor_dict.get("coldChain"))
+    await network_changes.record(wallets=[distributor_dict["walletAddress"]])
     new_distributor = await collection.find_one({"_id": result.inserted_id})
     return ProductInDB(**new_distributor)
 
@@ -48,6 +49,9 @@ async def delete_distributor(distributor_walletAddress: str):
     result = await collection.delete_one({"walletAddress": distributor_walletAddress})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Distributor not found")
+    inventory_index.remove_wallet(distributor_walletAddress)
+    graph_cache.remove_node(distributor_walletAddress)
+    await network_changes.record(wallets=[distributor_walletAddress])
     return {"detail": "Distributor deleted"}
 
 
@@ -62,6 +66,17 @@ async def update_distributor(distributor_walletAddress: str, update_data: Distri
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Distributor not found")
 
+    new_wallet = update_dict.get("walletAddress") or distributor_walletAddress
+    inventory_index.rename_wallet(distributor_walletAddress, new_wallet)
+    if "inventory" in update_dict:
+        inventory_index.set_inventory(new_wallet, "distributor", update_dict["inventory"])
+    graph_cache.rename_node(distributor_walletAddress, new_wallet)
+    if "geo" in update_dict:
+        graph_cache.set_location(new_wallet, update_dict["geo"])
+    if update_dict.get("coldChain") is not None:
+        graph_cache.set_cold_chain(new_wallet, update_dict["coldChain"])
+    await network_changes.record(wallets={distributor_walletAddress, new_wallet})
+
     if result.modified_count == 0:
         return {"detail": "No changes were made"} 
 
@@ -146,6 +161,8 @@ async def bulk_update_inventory(distributor_walletAddress: str, updates: list[di
         {"walletAddress": distributor_walletAddress},
         {"$set": {"inventory": updated_inventory}}
     )
+    inventory_index.set_inventory(distributor_walletAddress, "distributor", updated_inventory)
+    await network_changes.record(wallets=[distributor_walletAddress])
 
     if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="No changes made to inventory")
@@ -197,6 +214,8 @@ async def update_inventory_item(distributor_walletAddress: str, product_name: st
         {"walletAddress": distributor_walletAddress},
         {"$set": {"inventory": inventory}}
     )
+    inventory_index.set_inventory(distributor_walletAddress, "distributor", inventory)
+    await network_changes.record(wallets=[distributor_walletAddress])
 
     if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="Failed to update inventory")
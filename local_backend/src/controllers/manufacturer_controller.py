@@ -1,9 +1,11 @@
 from fastapi import HTTPException
 from models.manufacturer import ProductInDB, ManufacturerModel, ManufacturerUpdateModel
 from config.db import db
+from optimizer.graph_cache import graph_cache
+from utils.ids import id_service
+from optimizer.snapshot import network_changes
 from datetime import datetime
 from bson import ObjectId
-import random
 
 
 collection = db.get_collection("manufacturers")
@@ -15,18 +17,15 @@ async def add_manufacturer(manufacturer: ManufacturerModel):
         raise HTTPException(status_code=400, detail="WalletAddress already exists")
    
     # Generate a unique manufacturerId
-    suffix = random.randint(1000, 9999)
-    manufacturer_id = f"manu_{suffix}"
-    
-    # Ensure uniqueness
-    while await collection.find_one({"manufacturerId": manufacturer_id}):
-        suffix = random.randint(1000, 9999)
-        manufacturer_id = f"manu_{suffix}"
+    manufacturer_id = await id_service.next("manu_")
 
     manufacturer_dict = manufacturer.model_dump(exclude_unset=True)
     manufacturer_dict["manufacturerId"] = manufacturer_id
 
     result = await collection.insert_one(manufacturer_dict)
+    graph_cache.set_location(manufacturer_dict["walletAddress"], manufacturer_dict.get("geo"))
+    graph_cache.set_cold_chain(manufacturer_dict["walletAddress"], manufacturer_dict.get("coldChain"))
+    await network_changes.record(wallets=[manufacturer_dict["walletAddress"]])
     new_manufacturer = await collection.find_one({"_id": result.inserted_id})
     return ProductInDB(**new_manufacturer)
 
@@ -49,6 +48,8 @@ async def delete_manufacturer(manufacturer_walletAddress: str):
     result = await collection.delete_one({"walletAddress": manufacturer_walletAddress})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Manufacturer not found")
+    graph_cache.remove_node(manufacturer_walletAddress)
+    await network_changes.record(wallets=[manufacturer_walletAddress])
     return {"detail": "Manufacturer deleted"}
 
 
@@ -62,7 +63,15 @@ async def update_manufacturer(manufacturer_walletAddress: str, update_data: Manu
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Manufacturer not found or nothing changed")
-    
+
+    new_wallet = update_dict.get("walletAddress") or manufacturer_walletAddress
+    graph_cache.rename_node(manufacturer_walletAddress, new_wallet)
+    if "geo" in update_dict:
+        graph_cache.set_location(new_wallet, update_dict["geo"])
+    if update_dict.get("coldChain") is not None:
+        graph_cache.set_cold_chain(new_wallet, update_dict["coldChain"])
+    await network_changes.record(wallets={manufacturer_walletAddress, new_wallet})
+
     return {"detail": "Manufacturer updated successfully"}
 
 
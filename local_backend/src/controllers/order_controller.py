@@ -3,25 +3,20 @@ from models.order import ProductInDB, OrderModel, PathModel
 from controllers import product_controller as controller
 
 from config.db import db
+from optimizer.reservations import reservations, order_unit_ids
+from utils.ids import id_service
+from utils.unit_allocations import unit_allocations
 from datetime import datetime
 from bson import ObjectId
-import random
-import string
+from pymongo import UpdateOne
 
 collection = db.get_collection("orders")
 
 # Create an order
 
 async def generate_unique_order_id():
-    """
-    Generates a unique orderId like 'OXXXX' where XXXX is a random 4-digit number.
-    Checks MongoDB for uniqueness.
-    """
-    while True:
-        order_id = "O" + "".join(random.choices(string.digits, k=4))
-        existing = await collection.find_one({"orderId": order_id})
-        if not existing:
-            return order_id
+    """Next orderId ('O' + zero-padded sequence number, e.g. 'O0000000001') from the shared ID service."""
+    return await id_service.next("O")
 
 async def create_order(order: OrderModel):
     order_dict = order.model_dump(exclude_unset=True)
@@ -33,8 +28,23 @@ async def create_order(order: OrderModel):
     order_dict["createdAt"] = datetime.utcnow()
     order_dict["updatedAt"] = datetime.utcnow()
 
-    result = await collection.insert_one(order_dict)
+    # The allocated units move from the optimizer's reservation to this order
+    conflicts = await reservations.convert(
+        order_dict.get("reservationId"), order_dict["orderId"], order_unit_ids(order_dict["lineItems"])
+    )
+    if conflicts:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Product units are reserved or allocated elsewhere", "productUnitIds": conflicts}
+        )
+
+    try:
+        result = await collection.insert_one(order_dict)
+    except Exception:
+        await reservations.release_order(order_dict["orderId"])
+        raise
     new_order = await collection.find_one({"_id": result.inserted_id})
+    await unit_allocations.index_order(new_order)
     return ProductInDB(**new_order)
 
 
@@ -63,6 +73,10 @@ async def update_order(order_id: str, update_data: dict):
     )
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Order not found or no changes made")
+    if "lineItems" in update_data:
+        await unit_allocations.index_order(await collection.find_one({"orderId": order_id}))
+    if update_data.get("status") in ("completed", "cancelled"):
+        await reservations.release_order(order_id)
     return {"detail": "Order updated successfully"}
 
 
@@ -71,6 +85,8 @@ async def delete_order(order_id: str):
     result = await collection.delete_one({"orderId": order_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Order not found")
+    await reservations.release_order(order_id)
+    await unit_allocations.remove_order(order_id)
     return {"detail": "Order deleted"}
 
 # Update allocation (fulfill products)
@@ -146,6 +162,7 @@ async def add_path_to_order(order_id: str, allocation_index: int, path_data: lis
 
     if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="Failed to update path")
+    await unit_allocations.index_order(await collection.find_one({"orderId": order_id}))
 
     return {"detail": "Path added successfully", "order_id": order_id}
 
@@ -220,63 +237,85 @@ async def new_orders_by_distributor(distributor_walletAddress: str):
 
 # Update allocation fulfilled for a specific allocation
 async def update_allocations_fulfilled_by_products(product_ids: list[str]):
+    """
+    Re-evaluates `fulfilled` for every allocation holding one of the scanned
+    product_ids: an allocation is fulfilled once all of its units sit at the
+    last hop's toWalletAddress and are not in transit.
+
+    One point read per scanned unit in the unit_allocations index, one query
+    for the affected orders, one $in lookup for the units of their
+    allocations, and one bulk_write setting only the changed flags.
+    """
     if not product_ids:
         raise HTTPException(status_code=400, detail="No product IDs provided")
 
-    updated_orders = []
-
-    for product_id in product_ids:
-        product = await controller.get_product_by_id(product_id)
-        if not product:
+    scanned = {}  # productId -> first position in the request, to report orders in scan order
+    for position, product_id in enumerate(product_ids):
+        scanned.setdefault(product_id, position)
+    entries = await unit_allocations.lookup(scanned)
+    orders = {
+        order["_id"]: order for order in await collection.find(
+            {"_id": {"$in": list({entry["order"] for entry in entries.values()})}},
+            {"orderId": 1, "lineItems.allocations.productUnitIds": 1,
+             "lineItems.allocations.path.toWalletAddress": 1, "lineItems.allocations.fulfilled": 1}
+        ).to_list(length=None)
+    } if entries else {}
+
+    # (order, "lineItems.i.allocations.j", allocation) for allocations holding a scanned unit
+    touched = {}
+    for product_id, entry in entries.items():
+        order = orders.get(entry["order"])
+        i, j = entry["lineItem"], entry["allocation"]
+        try:
+            allocation = order["lineItems"][i]["allocations"][j]
+        except (IndexError, KeyError, TypeError):
             continue
+        if product_id in (allocation.get("productUnitIds") or []):
+            touched[(order["_id"], i, j)] = (order, f"lineItems.{i}.allocations.{j}", allocation)
+    touched = list(touched.values())
 
-        # Find the order containing this productId
-        order = await collection.find_one({
-            "lineItems.allocations.productUnitIds": product_id
-        })
-        if not order:
+    positions = await controller.get_unit_positions(
+        [pid for _, _, allocation in touched for pid in allocation["productUnitIds"]]
+    )
+
+    changes = {}  # order _id -> {field: fulfilled}
+    first_seen = {}  # order _id -> (scan position, orderId)
+    for order, field, allocation in touched:
+        unit_ids = allocation["productUnitIds"]
+        # Scanned IDs that aren't known products don't count as scans
+        seen = [scanned[pid] for pid in unit_ids if pid in scanned and pid in positions]
+        if not seen:
             continue
+        path = allocation.get("path") or []
+        to_wallet = path[-1].get("toWalletAddress") if path else None
+        all_products_fulfilled = to_wallet is not None and all(
+            positions.get(pid) == (to_wallet, False) for pid in unit_ids
+        )
+        if allocation.get("fulfilled") != all_products_fulfilled:
+            changes.setdefault(order["_id"], {})[f"{field}.fulfilled"] = all_products_fulfilled
+            rank = (min(seen), order["orderId"])
+            first_seen[order["_id"]] = min(first_seen.get(order["_id"], rank), rank)
 
-        updated = False
-
-        for line_item in order.get("lineItems", []):
-            for allocation in line_item.get("allocations", []):
-                if product_id in allocation.get("productUnitIds", []):
-                    to_wallet = allocation["path"]["toWalletAddress"]
-
-                    # Check ALL products in this allocation
-                    all_products_fulfilled = True
-                    for pid in allocation["productUnitIds"]:
-                        p = await controller.get_product_by_id(pid)
-                        if not (
-                            p and 
-                            p.location and 
-                            p.location.walletAddress == to_wallet and 
-                            not p.inTransit
-                        ):
-                            all_products_fulfilled = False
-                            break
-
-                    if allocation.get("fulfilled") != all_products_fulfilled:
-                        allocation["fulfilled"] = all_products_fulfilled
-                        updated = True
-
-        if updated:
-            await collection.update_one(
-                {"_id": order["_id"]},
-                {"$set": {"lineItems": order["lineItems"], "updatedAt": datetime.utcnow()}}
-            )
-            updated_orders.append(order["orderId"])
-
-    if not updated_orders:
+    if not changes:
         raise HTTPException(status_code=404, detail="No matching allocations updated")
 
-    return {"updatedOrders": updated_orders}
+    now = datetime.utcnow()
+    await collection.bulk_write([
+        UpdateOne({"_id": _id}, {"$set": {**fields, "updatedAt": now}})
+        for _id, fields in changes.items()
+    ], ordered=False)
+
+    return {"updatedOrders": [order_id for _, order_id in sorted(first_seen.values())]}
 
 
 
 # Update order status using product IDs
 async def update_order_status_by_products(product_ids: list[str], status: str):
+    """
+    Sets `status` on every order holding one of product_ids: the
+    unit_allocations index resolves the distinct orders, one query keeps
+    those not yet in that status, one update_many changes them all.
+    """
     valid_statuses = ["created", "in-transit", "completed", "cancelled"]
     if status not in valid_statuses:
         raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
@@ -284,27 +323,28 @@ async def update_order_status_by_products(product_ids: list[str], status: str):
     if not product_ids:
         raise HTTPException(status_code=400, detail="No product IDs provided")
 
-    updated_orders = []
+    entries = await unit_allocations.lookup(product_ids)
+    first_scan = {}  # order _id -> (position of its first scanned unit, orderId)
+    for position, product_id in enumerate(product_ids):
+        entry = entries.get(product_id)
+        if entry and entry["order"] not in first_scan:
+            first_scan[entry["order"]] = (position, entry["orderId"])
 
-    for product_id in product_ids:
-        # Find the order containing this productId
-        order = await collection.find_one({
-            "lineItems.allocations.productUnitIds": product_id
-        })
-        if not order:
-            continue
+    orders = await collection.find(
+        {"_id": {"$in": list(first_scan)}, "status": {"$ne": status}}, {"_id": 1}
+    ).to_list(length=None) if first_scan else []
 
-        # Update the order status
-        result = await collection.update_one(
-            {"_id": order["_id"]},
-            {"$set": {"status": status, "updatedAt": datetime.utcnow()}}
-        )
+    if not orders:
+        raise HTTPException(status_code=404, detail="No matching orders found")
 
-        if result.modified_count > 0:
-            updated_orders.append(order["orderId"])
+    await collection.update_many(
+        {"_id": {"$in": [order["_id"] for order in orders]}, "status": {"$ne": status}},
+        {"$set": {"status": status, "updatedAt": datetime.utcnow()}}
+    )
+    updated_orders = [order_id for _, order_id in sorted(first_scan[order["_id"]] for order in orders)]
 
-    if not updated_orders:
-        raise HTTPException(status_code=404, detail="No matching orders found")
+    if status in ("completed", "cancelled"):
+        await reservations.release_orders(updated_orders)
 
     return {"updatedOrders": updated_orders, "newStatus": status}
 
@@ -1,6 +1,8 @@
 from fastapi import HTTPException
+from pymongo import ReturnDocument
 from models.product import ProductInDB, ProductModel, LocationModel
 from config.db import db
+from optimizer.result_cache import result_cache
 from datetime import datetime
 
 collection = db.get_collection("products")
@@ -17,6 +19,8 @@ async def create_product(product: ProductModel):
     product_dict["createdAt"] = product_dict.get("createdAt") or datetime.utcnow()
 
     await collection.insert_one(product_dict)
+    # A new unit can make listed stock available to the optimizer
+    result_cache.invalidate_products([product.productName])
     new_product = await collection.find_one({"productId": product.productId})
     return ProductInDB(**new_product)
 
@@ -37,6 +41,47 @@ async def get_product_by_id(product_id: str):
     return ProductInDB(**product)
 
 
+# Bulk availability check: which of these units exist and are not in transit
+AVAILABILITY_CHUNK_SIZE = 5000
+
+async def get_available_product_ids(product_ids: list[str], chunk_size: int = AVAILABILITY_CHUNK_SIZE):
+    """
+    Returns the set of product_ids that exist and are not in transit.
+    Uses one $in query per `chunk_size` ids instead of one query per unit.
+    """
+    unique_ids = list(dict.fromkeys(product_ids))
+    available = set()
+    for start in range(0, len(unique_ids), chunk_size):
+        chunk = unique_ids[start:start + chunk_size]
+        cursor = collection.find(
+            {"productId": {"$in": chunk}},
+            {"_id": 0, "productId": 1, "inTransit": 1}
+        )
+        async for doc in cursor:
+            if not doc.get("inTransit", False):
+                available.add(doc["productId"])
+    return available
+
+
+async def get_unit_positions(product_ids: list[str], chunk_size: int = AVAILABILITY_CHUNK_SIZE):
+    """
+    Returns {productId: (location walletAddress or None, inTransit)} for the
+    product_ids that exist, with one $in query per `chunk_size` ids.
+    """
+    unique_ids = list(dict.fromkeys(product_ids))
+    positions = {}
+    for start in range(0, len(unique_ids), chunk_size):
+        chunk = unique_ids[start:start + chunk_size]
+        cursor = collection.find(
+            {"productId": {"$in": chunk}},
+            {"_id": 0, "productId": 1, "location.walletAddress": 1, "inTransit": 1}
+        )
+        async for doc in cursor:
+            location = doc.get("location") or {}
+            positions[doc["productId"]] = (location.get("walletAddress"), doc.get("inTransit", False))
+    return positions
+
+
 # Get products by location
 async def get_products_by_location(entity_walletAddress: str, entity_type: str):
     query = {"location.walletAddress": entity_walletAddress, "location.type": entity_type}
@@ -66,21 +111,33 @@ async def get_products_by_name(name: str):
     return [ProductInDB(**p) for p in products]
 
 
+# unitWeight and coldChain of the first unit matching the name (same match as get_products_by_name)
+async def get_product_profile_by_name(name: str):
+    return await collection.find_one(
+        {"productName": {"$regex": name, "$options": "i"}}, {"_id": 0, "unitWeight": 1, "coldChain": 1}
+    )
+
+
 # Update product location
 async def update_product_location(product_id: str, new_location: LocationModel, in_transit: bool = False):
     update_data = {
         "location": new_location.model_dump(),
         "inTransit": in_transit
     }
-    result = await collection.update_one({"productId": product_id}, {"$set": update_data})
-    if result.modified_count == 0:
+    before = await collection.find_one_and_update(
+        {"productId": product_id}, {"$set": update_data}, return_document=ReturnDocument.BEFORE
+    )
+    if before is None or all(before.get(k) == v for k, v in update_data.items()):
         raise HTTPException(status_code=404, detail="Product not found or no changes made")
+    if before.get("inTransit", False) != in_transit:
+        result_cache.invalidate_products([before.get("productName")])
     return {"detail": "Product location updated successfully"}
 
 
 # Delete Product
 async def delete_product(product_id: str):
-    result = await collection.delete_one({"productId": product_id})
-    if result.deleted_count == 0:
+    deleted = await collection.find_one_and_delete({"productId": product_id})
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Product not found")
+    result_cache.invalidate_products([deleted.get("productName")])
     return {"detail": "Product deleted successfully"}
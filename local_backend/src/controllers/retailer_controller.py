@@ -1,9 +1,12 @@
 from fastapi import HTTPException
 from models.retailer import ProductInDB, RetailerModel, RetailerUpdateModel, BulkUpdateItem
 from config.db import db
+from optimizer.inventory_index import inventory_index
+from optimizer.graph_cache import graph_cache
+from utils.ids import id_service
+from optimizer.snapshot import network_changes
 from datetime import datetime
 from bson import ObjectId
-import random
 from typing import Optional, List
 
 
@@ -19,18 +22,16 @@ async def add_retailer(retailer : RetailerModel):
         raise HTTPException(status_code=400, detail="Retailer with this walletAddress already exists")
    
     # Generate a unique retailerId
-    suffix = random.randint(1000, 9999)
-    retailer_id = f"ret_{suffix}"
-    
-    # Ensure uniqueness
-    while await collection.find_one({"retailerId": retailer_id}):
-        suffix = random.randint(1000, 9999)
-        retailer_id = f"ret_{suffix}"
+    retailer_id = await id_service.next("ret_")
 
     
     retailer_dict["retailerId"] = retailer_id
 
     result = await collection.insert_one(retailer_dict)
+    inventory_index.set_inventory(retailer_dict["walletAddress"], "retailer", retailer_dict.get("inventory"))
+    graph_cache.set_location(retailer_dict["walletAddress"], retailer_dict.get("geo"))
+    graph_cache.set_cold_chain(retailer_dict["walletAddress"], retailer_dict.get("coldChain"))
+    await network_changes.record(wallets=[retailer_dict["walletAddress"]])
     new_retailer = await collection.find_one({"_id": result.inserted_id})
     return ProductInDB(**new_retailer)
 
@@ -54,6 +55,9 @@ async def delete_retailer(retailer_walletAddress: str):
     result = await collection.delete_one({"walletAddress": retailer_walletAddress})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail=" retailer not found")
+    inventory_index.remove_wallet(retailer_walletAddress)
+    graph_cache.remove_node(retailer_walletAddress)
+    await network_changes.record(wallets=[retailer_walletAddress])
     return {"detail": "retailer deleted"}
 
 
@@ -67,6 +71,17 @@ async def update_retailer(retailer_walletAddress: str, update_data: RetailerUpda
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Retailer not found or nothing changed")
+
+    new_wallet = update_dict.get("walletAddress") or retailer_walletAddress
+    inventory_index.rename_wallet(retailer_walletAddress, new_wallet)
+    if "inventory" in update_dict:
+        inventory_index.set_inventory(new_wallet, "retailer", update_dict["inventory"])
+    graph_cache.rename_node(retailer_walletAddress, new_wallet)
+    if "geo" in update_dict:
+        graph_cache.set_location(new_wallet, update_dict["geo"])
+    if update_dict.get("coldChain") is not None:
+        graph_cache.set_cold_chain(new_wallet, update_dict["coldChain"])
+    await network_changes.record(wallets={retailer_walletAddress, new_wallet})
     
     return {"detail": "Retailer updated successfully"}
 
@@ -134,6 +149,8 @@ async def bulk_update_inventory(retailer_walletAddress: str, updates: list[BulkU
         {"walletAddress": retailer_walletAddress},
         {"$set": {"inventory": updated_inventory}}
     )
+    inventory_index.set_inventory(retailer_walletAddress, "retailer", updated_inventory)
+    await network_changes.record(wallets=[retailer_walletAddress])
 
     if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="No changes made to inventory")
@@ -202,6 +219,8 @@ async def update_inventory_item(
         {"walletAddress": retailer_walletAddress},
         {"$set": {"inventory": inventory}}
     )
+    inventory_index.set_inventory(retailer_walletAddress, "retailer", inventory)
+    await network_changes.record(wallets=[retailer_walletAddress])
 
 
 async def get_retailer_inventory_item(wallet_address: str, product_name: str):
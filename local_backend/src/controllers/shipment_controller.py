@@ -1,8 +1,9 @@
 from fastapi import HTTPException
 from models.shipment import ShipmentModel, ProductInDB
 from config.db import db
+from optimizer.result_cache import result_cache
+from utils.ids import id_service
 from datetime import datetime
-import random
 
 collection = db.get_collection("shipments")
 products_collection = db.get_collection("products")
@@ -10,12 +11,7 @@ products_collection = db.get_collection("products")
 
 # Helper: Generate unique shipmentId
 async def generate_shipment_id():
-    while True:
-        suffix = random.randint(1000, 9999)
-        shipment_id = f"ship_{suffix}"
-        exists = await collection.find_one({"shipmentId": shipment_id})
-        if not exists:
-            return shipment_id
+    return await id_service.next("ship_")
 
 
 # Create a new shipment
@@ -39,6 +35,7 @@ async def create_shipment(shipment: ShipmentModel):
                 }
             }
         )
+        result_cache.invalidate_products([shipment.productName])
 
     new_shipment = await collection.find_one({"_id": result.inserted_id})
     return ProductInDB(**new_shipment)
@@ -106,6 +103,7 @@ async def receive_shipment(shipment_id: str, location: dict):
                 }
             }
         )
+        result_cache.invalidate_products([shipment.get("productName")])
 
     return {"detail": "Shipment received and products updated"}
 
@@ -123,10 +121,12 @@ async def split_shipment(shipment_id: str, sub_shipments: list[ShipmentModel]):
     )
 
     created_shipments = []
-    for sub in sub_shipments:
+    # One counter round trip for every sub-shipment ID
+    sub_ids = await id_service.allocate("ship_", len(sub_shipments))
+    for sub, sub_id in zip(sub_shipments, sub_ids):
         sub_data = sub.model_dump(exclude_unset=True)
         sub_data["parentShipmentId"] = shipment_id
-        sub_data["shipmentId"] = await generate_shipment_id()
+        sub_data["shipmentId"] = sub_id
         sub_data["createdAt"] = datetime.utcnow()
         sub_data["updatedAt"] = datetime.utcnow()
         result = await collection.insert_one(sub_data)
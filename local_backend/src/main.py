@@ -13,11 +13,63 @@ from routes.certificate_route import router as certificate_router
 from routes.optimizer_route import router as optimizer_router
 from routes.qr_route import router as qr_router
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+from optimizer.executor import graph_executor
+from optimizer.replenishment import replenishment_planner
+from optimizer.reservations import reservations
+from optimizer.snapshot import load_network, network_changes
+from utils.unit_allocations import unit_allocations
+from config.indexes import ensure_indexes
 
 
 import uvicorn
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Indexes from the registry in config/indexes.py; existing ones are left as they are
+    try:
+        report = await ensure_indexes()
+        if report["created"]:
+            print(f"Created indexes: {', '.join(report['created'])}")
+        for index, error in report["failed"].items():
+            print(f"Could not create index {index}: {error}")
+        for index, mismatch in report["mismatched"].items():
+            print(f"Index {index} exists with other options: expected {mismatch['expected']}, "
+                  f"found {mismatch['existing']}")
+    except Exception as e:
+        print(f"Index bootstrap failed: {e}")
+    # Warm the optimizer's network graph and inventory index so the first optimize call doesn't pay for them;
+    # with NETWORK_SNAPSHOT_PATH set they come from the snapshot file plus the changes logged since
+    try:
+        report = await load_network()
+        print(f"Optimizer network loaded from {report['source']} in {report['seconds']}s")
+    except Exception as e:
+        print(f"Optimizer cache warm-up failed, will load on first use: {e}")
+    if network_changes.enabled:
+        try:
+            await network_changes.ensure_indexes()
+        except Exception as e:
+            print(f"Could not create network_changes indexes: {e}")
+    if reservations.enabled:
+        try:
+            await reservations.ensure_indexes()
+        except Exception as e:
+            print(f"Could not create unit_reservations indexes: {e}")
+    # Reverse index for scan-driven order updates; backfilled from orders on first start
+    try:
+        backfilled = await unit_allocations.ensure_populated()
+        if backfilled is not None:
+            print(f"Indexed {backfilled} allocated units of existing orders in unit_allocations")
+    except Exception as e:
+        print(f"Could not prepare unit_allocations index: {e}")
+    # Scheduled reorder-level replenishment (REPLENISHMENT_INTERVAL_SECONDS, 0 = off)
+    replenishment_planner.start()
+    yield
+    replenishment_planner.stop()
+    graph_executor.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 # Add this part for CORS
 app.add_middleware(
     CORSMiddleware,
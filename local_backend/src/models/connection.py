@@ -45,6 +45,7 @@ class ConnectionModel(BaseModel):
     transitTimeDays: Optional[conint(ge=0)]
     costPerUnit: Optional[float]
     active: Optional[bool]
+    coldChain: bool = False  # refrigerated transport
 
 class ConnectionUpdateModel(BaseModel):
     fromWalletAddress: Optional[str]
@@ -55,6 +56,7 @@ class ConnectionUpdateModel(BaseModel):
     transitTimeDays: Optional[conint(ge=0)]
     costPerUnit: Optional[float]
     active: Optional[bool]
+    coldChain: Optional[bool] = None
 
 class ProductInDB(ConnectionModel):
     id: PyObjectId = Field(default_factory=PyObjectId, alias='_id')
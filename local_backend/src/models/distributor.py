@@ -80,6 +80,7 @@ class DistributorModel(BaseModel):
     leadTimes: Optional[List[LeadTimesModel]] = []
     inventory: Optional[List[InventoryModel]] = []
     active: Optional[bool] = True
+    coldChain: bool = False  # refrigerated storage
 
 class DistributorUpdateModel(BaseModel):
     name: Optional[str]
@@ -91,6 +92,7 @@ class DistributorUpdateModel(BaseModel):
     leadTimes: Optional[List[LeadTimesModel]] = []
     inventory: Optional[List[InventoryModel]] = []
     active: Optional[bool] = True
+    coldChain: Optional[bool] = None
 
 
 
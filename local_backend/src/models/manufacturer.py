@@ -69,6 +69,7 @@ class ManufacturerModel(BaseModel):
     productsProduced: Optional[List[str]]
     productionTimes: List[ProductionTimesModel]
     certificates: List[CertificateModel]
+    coldChain: bool = False  # refrigerated storage
 
 class ManufacturerUpdateModel(BaseModel):
     name: Optional[str] = None
@@ -79,6 +80,7 @@ class ManufacturerUpdateModel(BaseModel):
     productsProduced: Optional[List[str]] = None
     productionTimes: Optional[dict] = None
     certificates: Optional[List[str]] = None
+    coldChain: Optional[bool] = None
 
 class ProductInDB(ManufacturerModel):
     id: PyObjectId = Field(default_factory=PyObjectId, alias='_id')
@@ -0,0 +1,24 @@
+from typing import List, Literal, Optional
+from pydantic import BaseModel, conint
+
+
+class OptimizeRequest(BaseModel):
+    product_name: str
+    required_qty: conint(gt=0)
+    target_wallet: str
+    is_cold_storage: bool = False
+    mode: Literal["greedy", "mincost", "pareto", "astar"] = "greedy"
+    k_routes: conint(ge=1, le=10) = 1
+
+
+class OrderLineItemRequest(BaseModel):
+    productName: str
+    qty: conint(ge=0)
+
+
+class OrderOptimizeRequest(BaseModel):
+    """OrderModel-shaped payload; other order fields (status, allocations, ...) are ignored."""
+    retailerWalletAddress: str
+    lineItems: List[OrderLineItemRequest]
+    is_cold_storage: bool = False
+    reserve: Optional[bool] = None  # hold the allocated units; None: whenever reservations are on
@@ -65,6 +65,7 @@ class OrderModel(BaseModel):
     retailerWalletAddress: str
     lineItems: List[LineItemsModel]
     status: Literal['created','in-transit','completed','cancelled']
+    reservationId: Optional[str] = None  # from /test-optimize; its units become this order's allocations
     createdAt: Optional[datetime]
     updatedAt: Optional[datetime]
 
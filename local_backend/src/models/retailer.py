@@ -79,6 +79,7 @@ class RetailerModel(BaseModel):
     licenceNo: str
     contacts: Optional[ContactsModel] = None
     inventory: Optional[List[InventoryModel]] = []
+    coldChain: bool = False  # refrigerated storage
 
 
 class RetailerUpdateModel(BaseModel):
@@ -89,6 +90,7 @@ class RetailerUpdateModel(BaseModel):
     licenceNo: Optional[str]
     contacts: Optional[ContactsModel] = None
     inventory: Optional[List[InventoryModel]] = []
+    coldChain: Optional[bool] = None
 
 
 class ProductInDB(RetailerModel):
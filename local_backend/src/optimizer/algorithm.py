@@ -1,10 +1,19 @@
-from controllers.retailer_controller import all_retailers
-from controllers.distributor_controller import all_distributors
-from controllers.connection_controller import get_all_connections
-from controllers.product_controller import get_products_by_name
-from optimizer.utils import build_weighted_graph, shortest_path
+from controllers.product_controller import get_product_profile_by_name
+from optimizer.utils import path_from_tree
+from optimizer.graph_cache import graph_cache
+from optimizer.inventory_index import inventory_index
+from optimizer.routing_table import routing_table
+from optimizer.result_cache import result_cache
+from optimizer.executor import graph_executor
+from optimizer.csr import SearchResult, dijkstra
+from optimizer.ksp import k_shortest_paths
+from optimizer.pareto import pareto_search
+from optimizer.astar import AStarRoutes
 from controllers.manufacturer_controller import all_manufacturers
-from controllers.product_controller import get_product_by_id
+from controllers.product_controller import get_available_product_ids
+from optimizer.flow import min_cost_paths
+from optimizer.stats import OptimizerTrace
+from optimizer.reservations import reservations, optimize_result_unit_ids
 
 
 def calculate_eta(path, connections_lookup):
@@ -22,29 +31,25 @@ def calculate_eta(path, connections_lookup):
     return total_days
 
 async def get_all_inventories(product_name):
-    inventories = {}
-    retailers = await all_retailers()
-    distributors = await all_distributors()
-    for entity in retailers + distributors:
-        wallet = entity.walletAddress
-        items = [
-            item for item in getattr(entity, 'inventory', [])
-            if getattr(item, 'productName', '').lower() == product_name.lower()
-        ]
-        if items:
-            inventories[wallet] = items
-    return inventories
+    """
+    Returns {wallet: entry} for every retailer/distributor holding the product,
+    straight from the in-memory inventory index.
+    """
+    return await inventory_index.holders(product_name)
     
+async def get_product_profile(product_name):
+    """Returns (unitWeight, coldChain) for the product, from one projected unit document."""
+    product = await get_product_profile_by_name(product_name)
+
+    if product is None:
+        return 1, False  # default weight, no cold chain
+
+    return product.get("unitWeight"), product.get("coldChain", False)
+
+
 async def get_weights_product(product_name):
-    products = await get_products_by_name(product_name)
-    
-    if not products:
-        # Decide what to do if the product is not found
-        # Either return a default value or raise an error
-        return 1  # default weight
-    
-    # If you expect a single product match:
-    return products[0].unitWeight
+    product_weight, _ = await get_product_profile(product_name)
+    return product_weight
 
 
 async def suggest_wait_strategy(graph, inventories, product_name, target_wallet, cold_storage=False):
@@ -60,143 +65,107 @@ async def suggest_wait_strategy(graph, inventories, product_name, target_wallet,
         "message": f"Product '{product_name}' is currently out of stock across the network."
     }
 
-async def optimize_supply_path(product_name, required_qty, target_wallet, is_cold_storage=False):
-    # print(f"[INPUT] product_name={product_name}, required_qty={required_qty}, target_wallet={target_wallet}, cold_storage={is_cold_storage}")
-
-    product_weight = await get_weights_product(product_name)
-    # print(f"[DEBUG] Product weight: {product_weight}")
-
-    connections = await get_all_connections()
-    connections = [conn.dict() if hasattr(conn, "dict") else conn for conn in connections]
-    # print(f"[DEBUG] Total connections retrieved: {len(connections)}")
-
-    # Build a lookup for transit times (place here)
-    connections_lookup = {}
-    for conn in connections:
-        key = (conn["fromWalletAddress"], conn["toWalletAddress"])
-        connections_lookup[key] = conn.get("transitTimeDays", 0)
-
-    graph = build_weighted_graph(connections, product_weight, required_qty)
-    # print(f"[DEBUG] Graph nodes: {len(graph)}")
-    # for node, edges in graph.items():
-    #     print(f"    {node} -> {edges}")
-
-    inventories = await get_all_inventories(product_name)
-    # print(f"[DEBUG] Inventories found for '{product_name}': {list(inventories.keys())}")
-
-    if not inventories:
-        # print("[WARN] No inventories found for product!")
-        return {
-            "status": "partial",
-            "wait_recommendation": {
-                "message": f"Product '{product_name}' not found in the system."
-            }
-        }
-
-    # Get all retailers and distributors for entity type check
-    retailers = await all_retailers()
-    distributors = await all_distributors()
-    retailer_wallets = {r.walletAddress for r in retailers}
-    distributor_wallets = {d.walletAddress for d in distributors}
-
-    # print("[DEBUG] Building source nodes...")
+def build_source_nodes(inventories, available_ids, target_wallet, csr, consumed=None):
+    """
+    Turns inventory index entries into optimizer source nodes.
+    `consumed` ({wallet: {"ids": set, "qty": int}}) holds stock already promised
+    to earlier requests in the same batch and is subtracted first.
+    """
+    consumed = consumed or {}
     source_nodes = []
 
-    for wallet, items in inventories.items():
-        if wallet == target_wallet:
-            # print(f"    [SKIP] Wallet {wallet} is target wallet.")
-            continue
-
-        # Skip retailers if we don't allow them as sources
-        if wallet in retailer_wallets:
-            # print(f"    [SKIP] Wallet {wallet} is a retailer (not valid source).")
+    for wallet, entry in inventories.items():
+        # Retailers and the target itself are never sources
+        if wallet == target_wallet or entry["entityType"] == "retailer":
             continue
 
-        total_available = 0
-        product_ids = []
-
-        # print(f"    Checking inventory for wallet {wallet}...")
-        for item in items:
-            if getattr(item, 'productIds', []):
-                valid_product_ids = []
-                for pid in item.productIds:
-                    try:
-                        product = await get_product_by_id(pid)
-                    except Exception as e:
-                        # print(f"        [ERROR] Failed fetching product {pid}: {e}")
-                        continue
-
-                    if product and not getattr(product, 'inTransit', False):
-                        valid_product_ids.append(pid)
-
-                if valid_product_ids:
-                    product_ids.extend(valid_product_ids)
-                    total_available += len(valid_product_ids)
-            else:
-                if not getattr(item, 'inTransit', False):
-                    qty = getattr(item, 'qty', getattr(item, 'qtyRemaining', 1))
-                    total_available += qty
+        used = consumed.get(wallet, {"ids": set(), "qty": 0})
+        # Serialized units count only if available; untracked stock counts by qty
+        product_ids = [
+            pid for pid in entry["productIds"]
+            if pid in available_ids and pid not in used["ids"]
+        ]
+        total_available = len(product_ids) + max(entry["untrackedQty"] - used["qty"], 0)
 
         if total_available > 0:
-            if wallet not in graph or not graph.get(wallet):
-                # print(f"    [SKIP] Wallet {wallet} has stock but is not connected in graph.")
+            if not csr.has_edges(wallet):
                 continue
 
-            # print(f"    [ADD] Wallet {wallet} added as source node. total_available={total_available}, product_ids={product_ids}")
             source_nodes.append({
                 "wallet": wallet,
                 "available_qty": total_available,
                 "product_ids": product_ids,
             })
-        else:
-            print(f"    [SKIP] Wallet {wallet} has no available stock.")
 
-    # If no source nodes available
-    if not source_nodes:
-        # print("[WARN] No source nodes found!")
-        manufacturers = await all_manufacturers()
-        available_manufacturers = [
-            m for m in manufacturers if product_name in (m.productsProduced or [])
-        ]
-
-        if available_manufacturers:
-            manufacturer_info = [
-                {
-                    "manufacturer": m.name,
-                    "wallet": m.walletAddress,
-                    "production_time_days": next(
-                        (pt.days for pt in m.productionTimes if pt.productName == product_name),
-                        "Unknown"
-                    )
-                }
-                for m in available_manufacturers
-            ]
-            return {
-                "status": "partial",
-                "wait_recommendation": {
-                    "message": f"No stock found, but manufacturers are available to produce '{product_name}'.",
-                    "producers": manufacturer_info
-                }
+    return source_nodes
+
+
+async def get_unit_availability(inventories, target_wallet=None):
+    """Bulk availability lookup for every serialized unit held by a candidate source."""
+    unit_ids = [
+        pid for wallet, entry in inventories.items()
+        if wallet != target_wallet and entry["entityType"] != "retailer"
+        for pid in entry["productIds"]
+    ]
+    return await get_available_product_ids(unit_ids) if unit_ids else set()
+
+
+def manufacturer_fallback(product_name, manufacturers, is_cold_storage=False):
+    available_manufacturers = [
+        m for m in manufacturers if product_name in (m.productsProduced or [])
+    ]
+
+    if available_manufacturers:
+        manufacturer_info = [
+            {
+                "manufacturer": m.name,
+                "wallet": m.walletAddress,
+                "production_time_days": next(
+                    (pt.days for pt in m.productionTimes if pt.productName == product_name),
+                    "Unknown"
+                )
             }
-
-        msg = (
-            "Product requires cold storage, but no suitable nodes support cold storage at this time."
-            if is_cold_storage else
-            f"Product '{product_name}' is currently out of stock across the network and not produced by any manufacturer."
-        )
+            for m in available_manufacturers
+        ]
         return {
             "status": "partial",
             "wait_recommendation": {
-                "message": msg
+                "message": f"No stock found, but manufacturers are available to produce '{product_name}'.",
+                "producers": manufacturer_info
             }
         }
 
+    msg = (
+        "Product requires cold storage, but no suitable nodes support cold storage at this time."
+        if is_cold_storage else
+        f"Product '{product_name}' is currently out of stock across the network and not produced by any manufacturer."
+    )
+    return {
+        "status": "partial",
+        "wait_recommendation": {
+            "message": msg
+        }
+    }
+
+
+def search_stats(algorithm, result):
+    """Nodes settled and heap pushes of a SearchResult, AStarRoutes or ParetoResult."""
+    settled = len(result.label_node) if algorithm == "pareto" else result.settled
+    return {"algorithm": algorithm, "settled": settled, "heap_pushes": result.pushes}
+
+
+def plan_allocations(source_nodes, tree, required_qty, is_cold_storage, connections_lookup):
+    """
+    Greedy allocation over a shortest-path tree rooted at the target.
+    Uses the best single source that can cover required_qty, otherwise takes
+    sources in priority order until the quantity is met.
+    Returns (allocations, qty_remaining).
+    """
     # Try to fulfill from a single node
     single_node_candidates = []
     for src in source_nodes:
         if src["available_qty"] >= required_qty:
-            result = shortest_path(graph, src['wallet'], target_wallet, return_time=is_cold_storage)
-            # print(f"    [PATH CHECK] {src['wallet']} -> {target_wallet} = {result}")
+            result = path_from_tree(tree, src['wallet'])
 
             if result and result[0] is not None:
                 path, cost, time = result
@@ -210,34 +179,24 @@ async def optimize_supply_path(product_name, required_qty, target_wallet, is_col
                     "product_ids": src['product_ids'][:required_qty],
                     "available_qty": src['available_qty']
                 })
-        else:
-            # print(f"    [INFO] Wallet {src['wallet']} has only {src['available_qty']} units, need {required_qty}.")
-            continue
 
     if single_node_candidates:
         single_node_candidates.sort(key=lambda x: x["priority"])
         best = single_node_candidates[0]
-        # print(f"[SUCCESS] Fulfilled by single node {best['wallet']}")
-        return {
-            "allocations": [{
-                "source": best["wallet"],
-                "path": best["path"],
-                "product_ids": best["product_ids"],
-                "total_cost": best["cost"],
-                "allocated_qty": required_qty,
-                "eta_time": best["eta_time"]
-
-            }],
-            "status": "complete"
-        }
+        return [{
+            "source": best["wallet"],
+            "path": best["path"],
+            "product_ids": best["product_ids"],
+            "total_cost": best["cost"],
+            "allocated_qty": required_qty,
+            "eta_time": best["eta_time"]
+        }], 0
 
     # Multi-node allocation
-    # print("[DEBUG] Attempting multi-node allocation...")
     scored_sources = []
     for src in source_nodes:
-        result = shortest_path(graph, src['wallet'], target_wallet, return_time=is_cold_storage)
+        result = path_from_tree(tree, src['wallet'])
         if not result or result[0] is None:
-            # print(f"    [SKIP] No path from {src['wallet']} to {target_wallet}.")
             continue
 
         path, cost, time = result
@@ -270,12 +229,160 @@ async def optimize_supply_path(product_name, required_qty, target_wallet, is_col
         })
         qty_remaining -= take_qty
 
+    return allocations, qty_remaining
+
+
+def plan_min_cost_allocations(source_nodes, csr, target_wallet, required_qty, product_weight,
+                              is_cold_storage, connections_lookup, no_transit=()):
+    """
+    Min-cost-flow allocation: sources supply up to available_qty, edges cost
+    costPerUnit * unitWeight per unit (transitTimeDays for cold storage), and
+    the target is the sink. Unlike plan_allocations it may split an order
+    whenever that is cheaper overall.
+    Returns (allocations, qty_remaining, search_stats); total_cost is the
+    route's per-unit cost times allocated_qty.
+    """
+    target = csr.index.get(target_wallet)
+    if target is None:
+        return [], required_qty, None
+
+    by_node = {
+        csr.index[src["wallet"]]: src for src in source_nodes if src["wallet"] in csr.index
+    }
+    supplies = {node: src["available_qty"] for node, src in by_node.items()}
+    weights = csr.times if is_cold_storage else csr.costs
+    paths, sent, stats = min_cost_paths(
+        csr, supplies, target, required_qty, weights, 1 if is_cold_storage else product_weight, no_transit
+    )
+
+    allocations = []
+    taken = {}
+    for nodes, qty in paths:
+        src = by_node[nodes[0]]
+        start = taken.get(nodes[0], 0)
+        taken[nodes[0]] = start + qty
+        path = [csr.nodes[i] for i in nodes]
+        unit_cost = sum(
+            min(csr.costs[e] for e in range(csr.offsets[a], csr.offsets[a + 1]) if csr.targets[e] == b)
+            for a, b in zip(nodes, nodes[1:])
+        )
+        allocations.append({
+            "source": src["wallet"],
+            "path": path,
+            "product_ids": src["product_ids"][start:start + qty],
+            "total_cost": unit_cost * product_weight * qty,
+            "allocated_qty": qty,
+            "eta_time": calculate_eta(path, connections_lookup)
+        })
+
+    allocations.sort(key=lambda a: a["total_cost"] / a["allocated_qty"])
+    return allocations, required_qty - sent, stats
+
+
+def add_alternative_paths(allocations, csr, target_wallet, is_cold_storage, k_routes, product_weight,
+                          required_qty, connections_lookup, tree=None, no_transit=()):
+    """
+    Attaches up to k_routes - 1 next-best loopless routes to every allocation
+    (`alternative_paths`), so a client can fail over when a route is blocked.
+    Reuses `tree` when it is a Dijkstra tree rooted at the target. total_cost
+    follows the allocation's convention: scaled by required_qty for greedy
+    plans (required_qty given), by allocated_qty for mincost (required_qty None).
+    """
+    if k_routes <= 1 or not allocations:
+        return
+    if not isinstance(tree, SearchResult):
+        tree = dijkstra(csr, target_wallet, is_cold_storage, no_transit=no_transit)
+    for allocation in allocations:
+        qty = required_qty if required_qty is not None else allocation["allocated_qty"]
+        routes = k_shortest_paths(
+            tree.with_scale(product_weight * qty), allocation["source"], k_routes, no_transit=no_transit
+        )
+        allocation["alternative_paths"] = [
+            {"path": path, "total_cost": cost, "eta_time": calculate_eta(path, connections_lookup)}
+            for path, cost, _ in routes if path != allocation["path"]
+        ][:k_routes - 1]
+
+
+def plan_routes(csr, connections_lookup, mode, source_nodes, target_wallet, required_qty,
+                product_weight, is_cold_storage, k_routes=1, no_transit=()):
+    """
+    CPU-bound part of optimize_supply_path (route search and allocation).
+    Runs in graph_executor, so it only touches its arguments. Routes never
+    pass through a `no_transit` wallet.
+    Returns (allocations, qty_remaining, search_stats).
+    """
+    if mode == "mincost":
+        allocations, qty_remaining, stats = plan_min_cost_allocations(
+            source_nodes, csr, target_wallet, required_qty, product_weight,
+            is_cold_storage, connections_lookup, no_transit
+        )
+        add_alternative_paths(
+            allocations, csr, target_wallet, is_cold_storage, k_routes, product_weight,
+            None, connections_lookup, no_transit=no_transit
+        )
+        return allocations, qty_remaining, stats
+
+    scale = product_weight * required_qty
+    if mode == "astar":
+        # One goal-directed search towards the sources instead of a full tree
+        tree = AStarRoutes(
+            csr, target_wallet, [src["wallet"] for src in source_nodes], is_cold_storage, scale, no_transit
+        )
+    else:
+        # Connections are bidirectional, so the CSR doubles as its own reverse graph
+        tree = dijkstra(csr, target_wallet, is_cold_storage, scale, no_transit=no_transit)
+    allocations, qty_remaining = plan_allocations(
+        source_nodes, tree, required_qty, is_cold_storage, connections_lookup
+    )
+    add_alternative_paths(
+        allocations, csr, target_wallet, is_cold_storage, k_routes, product_weight,
+        required_qty, connections_lookup, tree, no_transit
+    )
+    return allocations, qty_remaining, search_stats("astar" if mode == "astar" else "dijkstra", tree)
+
+
+def pareto_routes(csr, connections_lookup, source_nodes, target_wallet, scale, no_transit=()):
+    """
+    One bi-objective search from the target; returns the non-dominated
+    (cost, transit time) routes of every source, cheapest source first, and
+    the search statistics. Routes never pass through a `no_transit` wallet.
+    """
+    labels = pareto_search(csr, target_wallet, no_transit=no_transit)
+    frontiers = []
+    for src in source_nodes:
+        routes = [
+            {"path": path, "total_cost": cost, "eta_time": calculate_eta(path, connections_lookup)}
+            for path, cost, _ in labels.frontier(src["wallet"], scale)
+        ]
+        if routes:
+            frontiers.append({
+                "source": src["wallet"],
+                "available_qty": src["available_qty"],
+                "product_ids": src["product_ids"],
+                "routes": routes,
+            })
+    frontiers.sort(key=lambda f: f["routes"][0]["total_cost"])
+    return frontiers, search_stats("pareto", labels)
+
+
+def pareto_result(frontiers, required_qty, product_name):
+    reachable_qty = sum(f["available_qty"] for f in frontiers)
+    if reachable_qty >= required_qty:
+        return {"frontiers": frontiers, "status": "complete"}
+    return {
+        "frontiers": frontiers,
+        "status": "partial",
+        "wait_recommendation": {
+            "message": f"Only {reachable_qty} units available for {product_name}. Please wait for restock."
+        }
+    }
+
+
+async def allocation_result(allocations, qty_remaining, required_qty, product_name, inventories, is_cold_storage=False):
     if qty_remaining == 0:
-        # print("[SUCCESS] Multi-node allocation complete.")
         return {"allocations": allocations, "status": "complete"}
 
     if allocations:
-        # print("[PARTIAL] Only partially fulfilled.")
         return {
             "allocations": allocations,
             "status": "partial",
@@ -284,10 +391,139 @@ async def optimize_supply_path(product_name, required_qty, target_wallet, is_col
             }
         }
 
-    # print("[FAIL] No allocation possible.")
-    wait_plan = await suggest_wait_strategy(graph, inventories, product_name, target_wallet, cold_storage=is_cold_storage)
+    wait_plan = await suggest_wait_strategy(None, inventories, product_name, None, cold_storage=is_cold_storage)
     return {
         "allocations": [],
         "status": "partial",
         "wait_recommendation": wait_plan
     }
+
+
+async def optimize_supply_path(product_name, required_qty, target_wallet, is_cold_storage=False, mode="greedy",
+                               k_routes=1, explain=False, reserve=False):
+    """
+    Cached front for _optimize_supply_path; see optimizer.result_cache for invalidation.
+    With reserve=True the allocated units are reserved (optimizer.reservations)
+    and the result carries the reservationId to pass on to create_order.
+    Every call is traced (optimizer.stats); explain=True also returns the trace
+    under "explain".
+    """
+    trace = OptimizerTrace(
+        product=product_name, required_qty=required_qty, target=target_wallet, mode=mode, k_routes=k_routes
+    )
+
+    async def plan():
+        with trace.phase("result_cache"):
+            key = result_cache.key(product_name, required_qty, target_wallet, is_cold_storage, mode, k_routes)
+            # A cached answer whose units were reserved since it was stored is stale
+            cached = result_cache.get(
+                key, usable=lambda result: not reservations.held(optimize_result_unit_ids(result))
+            )
+        trace.count("result_cache_hit", int(cached is not None))
+
+        if cached is not None:
+            return cached
+        token = result_cache.token(product_name)
+        result = await _optimize_supply_path(
+            product_name, required_qty, target_wallet, is_cold_storage, mode, k_routes, trace
+        )
+        # A reserved result is held as soon as it is returned, so only plain plans are cached
+        if not reserve:
+            result_cache.put(key, result, token)
+        return result
+
+    with trace:
+        if not reserve:
+            result, reservation = await plan(), None
+        else:
+            result, reservation = await reservations.reserve(plan, optimize_result_unit_ids)
+        if reservation is not None:
+            trace.count("reserved_units", len(optimize_result_unit_ids(result)))
+            # Copy so the reservation never ends up in the cached result
+            result = {**result, **reservation}
+
+    if explain:
+        # Copy so the trace never ends up in the cached result
+        return {**result, "explain": trace.as_dict()}
+    return result
+
+
+async def _optimize_supply_path(product_name, required_qty, target_wallet, is_cold_storage, mode, k_routes,
+                                trace):
+    with trace.phase("product_lookup"):
+        product_weight, product_cold_chain = await get_product_profile(product_name)
+
+    # Topology comes from the process-wide cache; cost scaling is applied lazily
+    with trace.phase("graph_load"):
+        await graph_cache.ensure_loaded()
+        connections_lookup = graph_cache.transit_times
+        graph = graph_cache.view(product_weight, required_qty)
+
+        # Cold-chain products (or cold-storage requests) only move over the cold-chain subgraph
+        cold_chain = is_cold_storage or product_cold_chain
+        csr = graph_cache.cold_csr() if cold_chain else graph.csr()
+    trace.count("graph_nodes", len(csr))
+
+    with trace.phase("inventory_scan"):
+        inventories = await get_all_inventories(product_name)
+    trace.count("holders", len(inventories))
+
+    if not inventories:
+        return {
+            "status": "partial",
+            "wait_recommendation": {
+                "message": f"Product '{product_name}' not found in the system."
+            }
+        }
+
+    # Check every unit's availability in bulk instead of one lookup per unit;
+    # units reserved by other requests are skipped
+    with trace.phase("unit_availability"):
+        available_ids = await get_unit_availability(inventories, target_wallet)
+        held_ids = reservations.held(available_ids)
+        available_ids -= held_ids
+    trace.count("held_units", len(held_ids))
+    with trace.phase("source_nodes"):
+        source_nodes = build_source_nodes(inventories, available_ids, target_wallet, csr)
+    trace.count("available_units", len(available_ids))
+    trace.count("source_nodes", len(source_nodes))
+
+    # If no source nodes available
+    if not source_nodes:
+        with trace.phase("manufacturer_fallback"):
+            return manufacturer_fallback(product_name, await all_manufacturers(), cold_chain)
+
+    # Only distributors forward stock
+    no_transit = graph_cache.non_forwarding_wallets()
+    if mode == "pareto":
+        with trace.phase("route_search"):
+            frontiers, search = await graph_executor.run(
+                pareto_routes, source_nodes, target_wallet, graph.scale, no_transit, cold_chain=cold_chain
+            )
+        trace.search(search)
+        return pareto_result(frontiers, required_qty, product_name)
+
+    # Plain greedy lookups read the target's routing table row (built on first
+    # use); anything else runs off the event loop
+    with trace.phase("route_search"):
+        tree = await routing_table.load_tree(target_wallet, is_cold_storage, graph.scale) \
+            if mode == "greedy" and k_routes <= 1 and not cold_chain else None
+        if tree is not None:
+            allocations, qty_remaining = plan_allocations(
+                source_nodes, tree, required_qty, is_cold_storage, connections_lookup
+            )
+            search = {"algorithm": "routing_table", "settled": 0, "heap_pushes": 0}
+        else:
+            allocations, qty_remaining, search = await graph_executor.run(
+                plan_routes, mode, source_nodes, target_wallet, required_qty, product_weight,
+                is_cold_storage, k_routes, no_transit, cold_chain=cold_chain
+            )
+    trace.search(search)
+    trace.count("allocations", len(allocations))
+
+    result = await allocation_result(
+        allocations, qty_remaining, required_qty, product_name, inventories, cold_chain
+    )
+    if mode == "astar":
+        result["settled_nodes"] = search["settled"]
+    return result
@@ -0,0 +1,246 @@
+import heapq
+import math
+import os
+from array import array
+from optimizer.csr import SearchResult
+
+INF = float("inf")
+EARTH_RADIUS_KM = 6371.0088
+# Past this many goals the nearest-goal estimate costs more than it saves;
+# multi_goal_astar then searches without one (i.e. as Dijkstra)
+ASTAR_MAX_GOALS = int(os.getenv("ASTAR_MAX_GOALS", "64"))
+
+
+def great_circle_km(lat1, lng1, lat2, lng2):
+    """Haversine distance between two points given in radians."""
+    a = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def geo_ratios(csr):
+    """
+    Smallest cost-per-km and time-per-km over all edges, keyed by return_time.
+
+    Every edge weighs at least ratio * its great-circle length, so by the
+    triangle inequality ratio * great_circle_km(node, goal) never overestimates
+    a route, i.e. the A* heuristic is admissible and consistent. That only holds
+    when every node has coordinates, so otherwise both ratios are 0 (plain
+    Dijkstra). Cached on the CSR graph, which is immutable.
+    """
+    if csr.geo_ratios is not None:
+        return csr.geo_ratios
+
+    ratios = {False: 0.0, True: 0.0}
+    if not any(math.isnan(x) for x in csr.lat):
+        cost_ratio = time_ratio = INF
+        lat, lng = csr.lat, csr.lng
+        for u in range(len(csr)):
+            for e in range(csr.offsets[u], csr.offsets[u + 1]):
+                v = csr.targets[e]
+                km = great_circle_km(lat[u], lng[u], lat[v], lng[v])
+                if km > 0:
+                    cost_ratio = min(cost_ratio, csr.costs[e] / km)
+                    time_ratio = min(time_ratio, csr.times[e] / km)
+        if cost_ratio != INF:
+            # Shave a little off so float rounding can't make the bound inadmissible
+            ratios = {False: cost_ratio * (1 - 1e-9), True: time_ratio * (1 - 1e-9)}
+    csr.geo_ratios = ratios
+    return ratios
+
+
+def astar(csr, root, goal, return_time=True, scale=1, no_transit=()):
+    """
+    A* over a CSRGraph from `root` towards `goal`, minimizing time if return_time
+    else cost, with cost as the tie-break like dijkstra(). The heuristic is the
+    great-circle distance to `goal` times geo_ratios(csr). Nodes whose label
+    improves after expansion are reopened. Wallets in `no_transit` (other than
+    the root) are reached but never passed through. Returns a SearchResult
+    whose `settled` counts expansions and `pushes` heap pushes.
+    """
+    n = len(csr)
+    priority = array('d', [INF]) * n
+    cost = array('d', [INF]) * n
+    pred = array('i', [-1]) * n
+
+    root_id = csr.index.get(root)
+    goal_id = csr.index.get(goal)
+    if root_id is None or goal_id is None:
+        return SearchResult(csr, root, priority, cost, pred, scale, return_time)
+
+    blocked = {csr.index[wallet] for wallet in no_transit if wallet in csr.index} - {root_id}
+    ratio = geo_ratios(csr)[return_time]
+    lat, lng = csr.lat, csr.lng
+    goal_lat, goal_lng = lat[goal_id], lng[goal_id]
+    estimates = {}
+
+    def estimate(node):
+        h = estimates.get(node)
+        if h is None:
+            h = ratio * great_circle_km(lat[node], lng[node], goal_lat, goal_lng) if ratio else 0.0
+            estimates[node] = h
+        return h
+
+    offsets, targets, costs, times = csr.offsets, csr.targets, csr.costs, csr.times
+    weights = times if return_time else costs
+
+    priority[root_id] = 0
+    cost[root_id] = 0
+    settled = 0
+    pushes = 1
+    queue = [(estimate(root_id), 0, 0, root_id)]  # (estimated total, priority, cost, node id)
+    while queue:
+        _, node_priority, node_cost, node = heapq.heappop(queue)
+        if node_priority != priority[node] or node_cost != cost[node]:
+            continue  # superseded by a better label
+        settled += 1
+        if node == goal_id:
+            break
+        if node in blocked:
+            continue
+        for e in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[e]
+            next_priority = node_priority + weights[e]
+            next_cost = node_cost + costs[e]
+            if (next_priority, next_cost) < (priority[neighbor], cost[neighbor]):
+                priority[neighbor] = next_priority
+                cost[neighbor] = next_cost
+                pred[neighbor] = node
+                heapq.heappush(queue, (next_priority + estimate(neighbor), next_priority, next_cost, neighbor))
+                pushes += 1
+
+    return SearchResult(csr, root, priority, cost, pred, scale, return_time, settled, pushes)
+
+
+def multi_goal_astar(csr, root, goals, return_time=True, scale=1, no_transit=()):
+    """
+    One A* search from `root` that runs until every wallet in `goals` is
+    settled. The heuristic is the great-circle distance to the nearest goal
+    not settled yet, times geo_ratios(csr); it only grows as goals are
+    settled, so heap keys pushed earlier stay lower bounds and are raised
+    lazily when popped. Every node it settles is one a Dijkstra from `root`
+    stopping at the last goal would settle too. Wallets in `no_transit`
+    (other than the root) are reached but never passed through. Returns a
+    SearchResult; the labels of the goals are exact.
+    """
+    n = len(csr)
+    priority = array('d', [INF]) * n
+    cost = array('d', [INF]) * n
+    pred = array('i', [-1]) * n
+
+    root_id = csr.index.get(root)
+    remaining = {csr.index[goal] for goal in goals if goal in csr.index}
+    if root_id is None or not remaining:
+        return SearchResult(csr, root, priority, cost, pred, scale, return_time)
+
+    blocked = {csr.index[wallet] for wallet in no_transit if wallet in csr.index} - {root_id}
+    ratio = geo_ratios(csr)[return_time] if len(remaining) <= ASTAR_MAX_GOALS else 0.0
+    lat, lng = csr.lat, csr.lng
+    generation = 0
+    estimates = {}  # node id -> (generation, estimate)
+
+    def estimate(node):
+        if not ratio:
+            return 0.0
+        cached = estimates.get(node)
+        if cached is None or cached[0] != generation:
+            h = ratio * min(great_circle_km(lat[node], lng[node], lat[goal], lng[goal]) for goal in remaining)
+            cached = estimates[node] = (generation, h)
+        return cached[1]
+
+    offsets, targets, costs, times = csr.offsets, csr.targets, csr.costs, csr.times
+    weights = times if return_time else costs
+
+    priority[root_id] = 0
+    cost[root_id] = 0
+    settled = 0
+    pushes = 1
+    queue = [(estimate(root_id), 0, 0, root_id)]  # (estimated total, priority, cost, node id)
+    while queue:
+        key, node_priority, node_cost, node = heapq.heappop(queue)
+        if node_priority != priority[node] or node_cost != cost[node]:
+            continue  # superseded by a better label
+        h = estimate(node)
+        if node_priority + h > key:
+            # The goal this key aimed at has been settled since
+            heapq.heappush(queue, (node_priority + h, node_priority, node_cost, node))
+            pushes += 1
+            continue
+        settled += 1
+        if node in remaining:
+            remaining.discard(node)
+            generation += 1
+            if not remaining:
+                break
+        if node in blocked:
+            continue
+        for e in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[e]
+            next_priority = node_priority + weights[e]
+            next_cost = node_cost + costs[e]
+            if (next_priority, next_cost) < (priority[neighbor], cost[neighbor]):
+                priority[neighbor] = next_priority
+                cost[neighbor] = next_cost
+                pred[neighbor] = node
+                heapq.heappush(queue, (next_priority + estimate(neighbor), next_priority, next_cost, neighbor))
+                pushes += 1
+
+    return SearchResult(csr, root, priority, cost, pred, scale, return_time, settled, pushes)
+
+
+class AStarRoutes:
+    """
+    Routes from `sources` to `target` found by one multi_goal_astar search,
+    behind the SearchResult interface so plan_allocations can use it in place
+    of a shortest-path tree. Only the sources' routes are exact; any other
+    node gets its own astar() search. Worth it when a few sources sit in a
+    large network.
+    """
+
+    def __init__(self, csr, target, sources, return_time, scale=1, no_transit=()):
+        self.csr = csr
+        self.root = target
+        self.return_time = return_time
+        self.scale = scale
+        self.no_transit = no_transit
+        self.goals = set(sources)
+        self.search = None
+        self.results = {}
+
+    @property
+    def settled(self):
+        return sum(result.settled for result in self._searches())
+
+    @property
+    def pushes(self):
+        return sum(result.pushes for result in self._searches())
+
+    def _searches(self):
+        return ([self.search] if self.search is not None else []) + list(self.results.values())
+
+    def _result(self, node):
+        # Connections are bidirectional, so searching from the target finds node -> target
+        if node in self.goals:
+            if self.search is None:
+                self.search = multi_goal_astar(
+                    self.csr, self.root, self.goals, self.return_time, self.scale, self.no_transit
+                )
+            return self.search
+        if node not in self.results:
+            self.results[node] = astar(self.csr, self.root, node, self.return_time, self.scale, self.no_transit)
+        return self.results[node]
+
+    def with_scale(self, scale):
+        routes = AStarRoutes(self.csr, self.root, self.goals, self.return_time, scale, self.no_transit)
+        routes.search = self.search.with_scale(scale) if self.search is not None else None
+        routes.results = {node: result.with_scale(scale) for node, result in self.results.items()}
+        return routes
+
+    def reached(self, node):
+        return self._result(node).reached(node)
+
+    def path_to_root(self, node):
+        return self._result(node).path_to_root(node)
+
+    def labels(self, node):
+        return self._result(node).labels(node)
@@ -0,0 +1,211 @@
+from controllers.manufacturer_controller import all_manufacturers
+from controllers.product_controller import get_available_product_ids
+from optimizer.algorithm import (
+    get_product_profile,
+    build_source_nodes,
+    manufacturer_fallback,
+    plan_allocations,
+    plan_min_cost_allocations,
+    pareto_routes,
+    pareto_result,
+    add_alternative_paths,
+    allocation_result,
+)
+from optimizer.graph_cache import graph_cache
+from optimizer.inventory_index import inventory_index
+from optimizer.executor import graph_executor
+from optimizer.csr import dijkstra
+from optimizer.astar import AStarRoutes
+from optimizer.reservations import reservations, optimize_result_unit_ids
+
+
+class NetworkSnapshot:
+    """
+    Consistent view of the graph and inventory for a batch of optimize requests.
+
+    load() copies inventory entries per product on the event loop, so writes
+    that land while the batch is running don't change its answers. The
+    snapshot is then handed to graph_executor, where attach() gives it the
+    (immutable) CSR graphs to plan on. Stock handed out to earlier entries is
+    tracked in `consumed` and never allocated twice.
+    """
+
+    def __init__(self):
+        self.csr = None
+        self.cold_csr = None
+        self.transit_times = {}
+        self.inventories = {}   # productName.lower() -> {wallet: entry}
+        self.weights = {}       # productName.lower() -> unitWeight
+        self.cold_chain = {}    # productName.lower() -> product coldChain flag
+        self.available_ids = set()
+        self.consumed = {}      # productName.lower() -> {wallet: {"ids": set, "qty": int}}
+        self.trees = {}         # (target_wallet, return_time, cold_chain) -> SearchResult
+        self.no_transit = ()
+        self.manufacturers = None
+
+    async def load(self, product_names):
+        unit_ids = []
+        for name in {name.lower() for name in product_names}:
+            holders = dict(inventory_index.products.get(name, {}))
+            self.inventories[name] = holders
+            self.weights[name], self.cold_chain[name] = await get_product_profile(name)
+            unit_ids.extend(
+                pid for entry in holders.values() if entry["entityType"] != "retailer"
+                for pid in entry["productIds"]
+            )
+
+        # One bulk availability lookup for every unit in the batch; reserved units are skipped
+        self.available_ids = await get_available_product_ids(unit_ids) if unit_ids else set()
+        self.available_ids -= reservations.held(self.available_ids)
+
+    def attach(self, csr, cold_csr, transit_times, no_transit=()):
+        self.csr = csr
+        self.cold_csr = cold_csr
+        self.transit_times = transit_times
+        self.no_transit = no_transit
+        self.trees = {}
+
+    def graph(self, cold_chain):
+        return self.cold_csr if cold_chain else self.csr
+
+    def tree(self, target_wallet, return_time, cold_chain=False):
+        # Connections are bidirectional, so the CSR doubles as its own reverse graph
+        key = (target_wallet, return_time, cold_chain)
+        if key not in self.trees:
+            self.trees[key] = dijkstra(
+                self.graph(cold_chain), target_wallet, return_time, no_transit=self.no_transit
+            )
+        return self.trees[key]
+
+    def consume(self, product_name, allocations):
+        used = self.consumed.setdefault(product_name.lower(), {})
+        for allocation in allocations:
+            wallet_used = used.setdefault(allocation["source"], {"ids": set(), "qty": 0})
+            wallet_used["ids"].update(allocation["product_ids"])
+            wallet_used["qty"] += allocation["allocated_qty"] - len(allocation["product_ids"])
+
+
+def alternatives_tree(snapshot, request, cold_chain):
+    # Alternative routes need the full tree; with k_routes = 1 astar and mincost never build one
+    if request.k_routes <= 1:
+        return None
+    return snapshot.tree(request.target_wallet, request.is_cold_storage, cold_chain)
+
+
+def plan_batch(csr, cold_csr, connections_lookup, snapshot, requests, no_transit=()):
+    """
+    CPU-bound part of optimize_batch; runs in graph_executor, so it only
+    touches its arguments. Routes never pass through a `no_transit` wallet.
+    Returns one plan per request:
+    ("missing",), ("fallback", cold_chain), ("pareto", frontiers) or
+    ("allocations", allocations, qty_remaining, cold_chain).
+    """
+    snapshot.attach(csr, cold_csr, connections_lookup, no_transit)
+    plans = []
+    for request in requests:
+        name = request.product_name.lower()
+        inventories = snapshot.inventories[name]
+        if not inventories:
+            plans.append(("missing",))
+            continue
+
+        cold_chain = request.is_cold_storage or snapshot.cold_chain[name]
+        csr = snapshot.graph(cold_chain)
+        source_nodes = build_source_nodes(
+            inventories, snapshot.available_ids, request.target_wallet,
+            csr, snapshot.consumed.get(name)
+        )
+        if not source_nodes:
+            plans.append(("fallback", cold_chain))
+            continue
+
+        if request.mode == "pareto":
+            # Frontiers only describe options, so no stock is consumed
+            scale = snapshot.weights[name] * request.required_qty
+            frontiers, _ = pareto_routes(
+                csr, snapshot.transit_times, source_nodes, request.target_wallet, scale, no_transit
+            )
+            plans.append(("pareto", frontiers))
+            continue
+
+        if request.mode == "mincost":
+            allocations, qty_remaining, _ = plan_min_cost_allocations(
+                source_nodes, csr, request.target_wallet, request.required_qty,
+                snapshot.weights[name], request.is_cold_storage, snapshot.transit_times, no_transit
+            )
+            add_alternative_paths(
+                allocations, csr, request.target_wallet, request.is_cold_storage,
+                request.k_routes, snapshot.weights[name], None, snapshot.transit_times,
+                alternatives_tree(snapshot, request, cold_chain), no_transit
+            )
+        else:
+            scale = snapshot.weights[name] * request.required_qty
+            if request.mode == "astar":
+                tree = AStarRoutes(
+                    csr, request.target_wallet, [src["wallet"] for src in source_nodes],
+                    request.is_cold_storage, scale, no_transit
+                )
+            else:
+                tree = snapshot.tree(request.target_wallet, request.is_cold_storage, cold_chain).with_scale(scale)
+
+            allocations, qty_remaining = plan_allocations(
+                source_nodes, tree, request.required_qty, request.is_cold_storage, snapshot.transit_times
+            )
+            add_alternative_paths(
+                allocations, csr, request.target_wallet, request.is_cold_storage,
+                request.k_routes, snapshot.weights[name], request.required_qty, snapshot.transit_times,
+                alternatives_tree(snapshot, request, cold_chain), no_transit
+            )
+        snapshot.consume(name, allocations)
+        plans.append(("allocations", allocations, qty_remaining, cold_chain))
+    return plans
+
+
+async def optimize_batch(requests, reserve=False):
+    """
+    Plans many (product_name, required_qty, target_wallet, is_cold_storage)
+    requests against one network snapshot, in order.
+    Returns one optimize_supply_path-shaped result per request. With
+    reserve=True each result's units are reserved like optimize_supply_path
+    does and the result carries its own reservationId.
+    """
+    if not reserve:
+        return await _optimize_batch(requests)
+    results, holds = await reservations.reserve_each(lambda: _optimize_batch(requests), optimize_result_unit_ids)
+    return [result if hold is None else {**result, **hold} for result, hold in zip(results, holds)]
+
+
+async def _optimize_batch(requests):
+    await graph_cache.ensure_loaded()
+    await inventory_index.ensure_loaded()
+
+    snapshot = NetworkSnapshot()
+    await snapshot.load([r.product_name for r in requests])
+    plans = await graph_executor.run_with_graphs(
+        plan_batch, snapshot, requests, graph_cache.non_forwarding_wallets()
+    )
+
+    results = []
+    for request, plan in zip(requests, plans):
+        name = request.product_name.lower()
+        if plan[0] == "missing":
+            results.append({
+                "status": "partial",
+                "wait_recommendation": {
+                    "message": f"Product '{request.product_name}' not found in the system."
+                }
+            })
+        elif plan[0] == "fallback":
+            if snapshot.manufacturers is None:
+                snapshot.manufacturers = await all_manufacturers()
+            results.append(manufacturer_fallback(request.product_name, snapshot.manufacturers, plan[1]))
+        elif plan[0] == "pareto":
+            results.append(pareto_result(plan[1], request.required_qty, request.product_name))
+        else:
+            _, allocations, qty_remaining, cold_chain = plan
+            results.append(await allocation_result(
+                allocations, qty_remaining, request.required_qty, request.product_name,
+                snapshot.inventories[name], cold_chain
+            ))
+
+    return results
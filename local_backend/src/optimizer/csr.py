@@ -0,0 +1,276 @@
+import heapq
+import math
+import mmap
+import os
+from array import array
+
+INF = float("inf")
+
+
+class CSRGraph:
+    """
+    Compact routing graph.
+
+    Wallet addresses are interned to integer ids (`index` / `nodes`) and edges
+    are stored in CSR form: the edges leaving node i are
+    targets[offsets[i]:offsets[i + 1]], with matching entries in costs and times.
+    Costs are the unscaled costPerUnit values; searches apply a scale factor.
+    lat / lng hold node coordinates in radians (nan when unknown) for A*.
+    """
+
+    def __init__(self, nodes, offsets, targets, costs, times, lat=None, lng=None):
+        self.nodes = nodes
+        self.index = {node: i for i, node in enumerate(nodes)}
+        self.offsets = offsets
+        self.targets = targets
+        self.costs = costs
+        self.times = times
+        self.lat = lat if lat is not None else array('d', [math.nan]) * len(nodes)
+        self.lng = lng if lng is not None else array('d', [math.nan]) * len(nodes)
+        self.geo_ratios = None  # filled lazily by astar.geo_ratios
+        self.source = None      # (path, nodes, layout, fingerprint) when mapped from a snapshot file
+
+    @classmethod
+    def from_mapped_file(cls, path, nodes, layout, fingerprint=None):
+        """
+        CSR whose arrays are read-only views into a memory-mapped file, so
+        every process mapping the same file shares one copy in the page cache.
+        layout: {"offsets" | "targets" | "costs" | "times" | "lat" | "lng":
+        (byte_offset, typecode, count)}. fingerprint: the file's
+        (st_ino, st_size, st_mtime_ns), checked so a replaced file is never
+        read with an old layout.
+        """
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if fingerprint is not None and (stat.st_ino, stat.st_size, stat.st_mtime_ns) != tuple(fingerprint):
+                raise ValueError(f"{path} changed since it was mapped")
+            buffer = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        arrays = {}
+        for name, (offset, typecode, count) in layout.items():
+            size = array(typecode).itemsize
+            arrays[name] = buffer[offset:offset + count * size].cast(typecode)
+        graph = cls(
+            nodes, arrays["offsets"], arrays["targets"], arrays["costs"], arrays["times"],
+            arrays["lat"], arrays["lng"]
+        )
+        graph.source = (path, nodes, layout, (stat.st_ino, stat.st_size, stat.st_mtime_ns))
+        return graph
+
+    def __getstate__(self):
+        if self.source is None:
+            return self.__dict__
+        # Process pool workers map the same file instead of receiving copies of the arrays
+        return {"source": self.source}
+
+    def __setstate__(self, state):
+        if "offsets" not in state:
+            state = CSRGraph.from_mapped_file(*state["source"]).__dict__
+        self.__dict__.update(state)
+
+    @classmethod
+    def from_adjacency(cls, adjacency, nodes=None, coordinates=None):
+        """
+        adjacency: {node: [(neighbor, cost, time), ...]}
+        nodes: optional fixed node order; nodes missing from it are appended.
+        coordinates: optional {node: (lng, lat)} in degrees.
+        """
+        nodes = list(nodes if nodes is not None else adjacency)
+        index = {node: i for i, node in enumerate(nodes)}
+        for edges in adjacency.values():
+            for neighbor, _, _ in edges:
+                if neighbor not in index:
+                    index[neighbor] = len(nodes)
+                    nodes.append(neighbor)
+
+        offsets = array('i', [0])
+        targets = array('i')
+        costs = array('d')
+        times = array('d')
+        for node in nodes:
+            for neighbor, edge_cost, edge_time in adjacency.get(node, ()):
+                targets.append(index[neighbor])
+                costs.append(edge_cost)
+                times.append(edge_time)
+            offsets.append(len(targets))
+
+        coordinates = coordinates or {}
+        lat = array('d')
+        lng = array('d')
+        for node in nodes:
+            lng_deg, lat_deg = coordinates.get(node, (math.nan, math.nan))
+            lat.append(math.radians(lat_deg))
+            lng.append(math.radians(lng_deg))
+        return cls(nodes, offsets, targets, costs, times, lat, lng)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    def has_edges(self, node):
+        i = self.index.get(node)
+        return i is not None and self.offsets[i + 1] > self.offsets[i]
+
+
+class SearchResult:
+    """
+    Dijkstra labels for every node reached from `root`.
+    pred[i] is the node i was reached from (-1 for the root and unreached nodes);
+    on a reversed graph that is i's next hop towards the root.
+    """
+
+    def __init__(self, csr, root, priority, cost, pred, scale, return_time, settled=0, pushes=0):
+        self.csr = csr
+        self.root = root
+        self.priority = priority
+        self.cost = cost
+        self.pred = pred
+        self.scale = scale
+        self.return_time = return_time
+        self.settled = settled  # nodes taken off the heap
+        self.pushes = pushes    # heap pushes
+
+    def with_scale(self, scale):
+        """Same tree read with a different cost scale (the search order doesn't depend on it)."""
+        return SearchResult(
+            self.csr, self.root, self.priority, self.cost, self.pred, scale, self.return_time,
+            self.settled, self.pushes
+        )
+
+    def reached(self, node):
+        i = self.csr.index.get(node)
+        return i is not None and self.cost[i] != INF
+
+    def path_to_root(self, node):
+        """Follows pred links from `node` back to the root: [node, ..., root]."""
+        i = self.csr.index[node]
+        path = []
+        while i != -1:
+            path.append(self.csr.nodes[i])
+            i = self.pred[i]
+        return path
+
+    def labels(self, node):
+        """Returns (total_cost, total_priority) for `node`, with cost scaling applied."""
+        i = self.csr.index[node]
+        priority = self.priority[i] if self.return_time else self.priority[i] * self.scale
+        return self.cost[i] * self.scale, priority
+
+
+def dijkstra(csr, root, return_time=True, scale=1, target=None, no_transit=()):
+    """
+    Dijkstra over a CSRGraph from `root`, minimizing time if return_time else cost.
+    Stops early once `target` is settled. Wallets in `no_transit` (other than
+    the root) are reached but never passed through. Returns a SearchResult.
+    """
+    n = len(csr)
+    priority = array('d', [INF]) * n
+    cost = array('d', [INF]) * n
+    pred = array('i', [-1]) * n
+    settled = bytearray(n)
+    blocked = bytearray(n)
+    for wallet in no_transit:
+        i = csr.index.get(wallet)
+        if i is not None:
+            blocked[i] = 1
+
+    root_id = csr.index.get(root)
+    target_id = csr.index.get(target) if target is not None else None
+    if root_id is None:
+        return SearchResult(csr, root, priority, cost, pred, scale, return_time)
+
+    offsets, targets, costs, times = csr.offsets, csr.targets, csr.costs, csr.times
+    weights = times if return_time else costs
+
+    priority[root_id] = 0
+    cost[root_id] = 0
+    settled_count = 0
+    pushes = 1
+    queue = [(0, 0, root_id)]  # (priority, cost, node id)
+    while queue:
+        node_priority, node_cost, node = heapq.heappop(queue)
+        if settled[node]:
+            continue
+        settled[node] = 1
+        settled_count += 1
+        if node == target_id:
+            break
+        if blocked[node] and node != root_id:
+            continue
+        for e in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[e]
+            if settled[neighbor]:
+                continue
+            next_priority = node_priority + weights[e]
+            next_cost = node_cost + costs[e]
+            if (next_priority, next_cost) < (priority[neighbor], cost[neighbor]):
+                priority[neighbor] = next_priority
+                cost[neighbor] = next_cost
+                pred[neighbor] = node
+                heapq.heappush(queue, (next_priority, next_cost, neighbor))
+                pushes += 1
+
+    return SearchResult(csr, root, priority, cost, pred, scale, return_time, settled_count, pushes)
+
+
+def nearest_sources(csr, sources, return_time=True, no_transit=()):
+    """
+    Multi-source Dijkstra: every node is labelled with its best route from any
+    of `sources` (wallets). Wallets in `no_transit` can end a route but are
+    never passed through. Returns (SearchResult, origin) where origin[i] is
+    the id of the source node i is reached from (-1 if unreached); on the
+    bidirectional connection graph path_to_root(node) runs node -> ... -> origin.
+    """
+    n = len(csr)
+    priority = array('d', [INF]) * n
+    cost = array('d', [INF]) * n
+    pred = array('i', [-1]) * n
+    origin = array('i', [-1]) * n
+    settled = bytearray(n)
+    blocked = bytearray(n)
+    for wallet in no_transit:
+        i = csr.index.get(wallet)
+        if i is not None:
+            blocked[i] = 1
+
+    queue = []
+    for wallet in sources:
+        i = csr.index.get(wallet)
+        if i is not None and origin[i] == -1:
+            priority[i] = 0
+            cost[i] = 0
+            origin[i] = i
+            queue.append((0, 0, i))
+    heapq.heapify(queue)
+
+    offsets, targets, costs, times = csr.offsets, csr.targets, csr.costs, csr.times
+    weights = times if return_time else costs
+
+    settled_count = 0
+    pushes = len(queue)
+    while queue:
+        node_priority, node_cost, node = heapq.heappop(queue)
+        if settled[node]:
+            continue
+        settled[node] = 1
+        settled_count += 1
+        if blocked[node] and origin[node] != node:
+            continue
+        for e in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[e]
+            if settled[neighbor]:
+                continue
+            next_priority = node_priority + weights[e]
+            next_cost = node_cost + costs[e]
+            if (next_priority, next_cost) < (priority[neighbor], cost[neighbor]):
+                priority[neighbor] = next_priority
+                cost[neighbor] = next_cost
+                pred[neighbor] = node
+                origin[neighbor] = origin[node]
+                heapq.heappush(queue, (next_priority, next_cost, neighbor))
+                pushes += 1
+
+    result = SearchResult(csr, None, priority, cost, pred, 1, return_time, settled_count, pushes)
+    return result, origin
@@ -0,0 +1,132 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from optimizer.graph_cache import graph_cache
+
+# "process", "thread" or "inline" (run on the event loop, as before)
+OPTIMIZER_EXECUTOR = os.getenv("OPTIMIZER_EXECUTOR", "process")
+OPTIMIZER_WORKERS = int(os.getenv("OPTIMIZER_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Graph held by each worker process, set once by the pool initializer
+_worker_graph = None
+
+
+def _init_worker(csr, cold_csr, connections_lookup):
+    global _worker_graph
+    _worker_graph = (csr, cold_csr, connections_lookup)
+
+
+def _call_with_graph(fn, cold_chain, *args):
+    csr, cold_csr, connections_lookup = _worker_graph
+    return fn(cold_csr if cold_chain else csr, connections_lookup, *args)
+
+
+def _call_with_graphs(fn, *args):
+    return fn(*_worker_graph, *args)
+
+
+class GraphExecutor:
+    """
+    Runs pure-CPU optimizer work (graph search, allocation) off the event loop.
+
+    Functions are called as fn(csr, connections_lookup, *args) and must be
+    module-level so a process pool can pickle them by reference. With
+    cold_chain=True they get the cold-chain subgraph instead of the full graph;
+    run_with_graphs passes both, as fn(csr, cold_csr, connections_lookup, *args).
+    Process workers receive both graphs once, through the pool initializer.
+    When the graph, its coordinates or its cold-chain flags change, the next
+    call gets a new pool; the old one is shut down once its last call returns,
+    so calls already submitted finish against the graph they were planned on.
+    Thread workers get the graph objects plus a copy of the transit times,
+    which the event loop keeps updating.
+    """
+
+    def __init__(self, kind=OPTIMIZER_EXECUTOR, workers=OPTIMIZER_WORKERS):
+        if kind not in ("process", "thread", "inline"):
+            raise ValueError(f"Unknown OPTIMIZER_EXECUTOR: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self._pool = None
+        self._pool_version = None
+        self._in_flight = {}  # process pool -> calls not yet returned
+
+    def _process_pool(self):
+        version = (graph_cache.version, graph_cache.geo_version, graph_cache.cold_version)
+        if self._pool is None or self._pool_version != version:
+            if self._pool is not None and not self._in_flight.get(self._pool):
+                self._in_flight.pop(self._pool, None)
+                self._pool.shutdown(wait=False)
+            # A busy pool is shut down by _run_in_process once its last call returns
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(graph_cache.csr(), graph_cache.cold_csr(), dict(graph_cache.transit_times)),
+            )
+            self._pool_version = version
+        return self._pool
+
+    async def _run_in_process(self, call):
+        pool = self._process_pool()
+        self._in_flight[pool] = self._in_flight.get(pool, 0) + 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, call)
+        except BrokenProcessPool:
+            if pool is self._pool:
+                self._pool = None
+            raise
+        finally:
+            self._in_flight[pool] -= 1
+            if not self._in_flight[pool] and pool is not self._pool:
+                del self._in_flight[pool]
+                pool.shutdown(wait=False)
+
+    def _thread_pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="optimizer")
+        return self._pool
+
+    async def run(self, fn, *args, cold_chain=False):
+        csr = graph_cache.cold_csr() if cold_chain else graph_cache.csr()
+        connections_lookup = graph_cache.transit_times
+        if self.kind == "inline":
+            return fn(csr, connections_lookup, *args)
+
+        if self.kind == "thread":
+            return await asyncio.get_running_loop().run_in_executor(
+                self._thread_pool(), partial(fn, csr, dict(connections_lookup), *args)
+            )
+
+        try:
+            return await self._run_in_process(partial(_call_with_graph, fn, cold_chain, *args))
+        except BrokenProcessPool as e:
+            print(f"Optimizer process pool failed, running inline: {e}")
+            return fn(csr, connections_lookup, *args)
+
+    async def run_with_graphs(self, fn, *args):
+        """Like run, for work that needs the full and the cold-chain graph (batches, orders)."""
+        graphs = (graph_cache.csr(), graph_cache.cold_csr(), graph_cache.transit_times)
+        if self.kind == "inline":
+            return fn(*graphs, *args)
+
+        if self.kind == "thread":
+            csr, cold_csr, connections_lookup = graphs
+            return await asyncio.get_running_loop().run_in_executor(
+                self._thread_pool(), partial(fn, csr, cold_csr, dict(connections_lookup), *args)
+            )
+
+        try:
+            return await self._run_in_process(partial(_call_with_graphs, fn, *args))
+        except BrokenProcessPool as e:
+            print(f"Optimizer process pool failed, running inline: {e}")
+            return fn(*graphs, *args)
+
+    def shutdown(self):
+        for pool in {*self._in_flight, self._pool} - {None}:
+            pool.shutdown(wait=False, cancel_futures=True)
+        self._in_flight = {}
+        self._pool = None
+
+
+graph_executor = GraphExecutor()
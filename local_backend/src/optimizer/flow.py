@@ -0,0 +1,187 @@
+import heapq
+
+INF = float("inf")
+
+
+class FlowNetwork:
+    """
+    Residual network for min-cost flow. Arcs are stored in parallel lists and
+    added in pairs, so arc ^ 1 is always the reverse of arc.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.adjacency = [[] for _ in range(size)]
+        self.head = []
+        self.capacity = []
+        self.initial_capacity = []
+        self.cost = []
+        # Search statistics of successive_shortest_paths
+        self.augmentations = 0
+        self.settled = 0
+        self.pushes = 0
+
+    def add_arc(self, u, v, capacity, cost):
+        for a, b, cap, c in ((u, v, capacity, cost), (v, u, 0, -cost)):
+            self.adjacency[a].append(len(self.head))
+            self.head.append(b)
+            self.capacity.append(cap)
+            self.initial_capacity.append(cap)
+            self.cost.append(c)
+
+    def flow(self, arc):
+        return self.initial_capacity[arc] - self.capacity[arc]
+
+
+def successive_shortest_paths(network, source, sink, demand):
+    """
+    Pushes up to `demand` units from source to sink at minimum total cost.
+    Each round runs Dijkstra on reduced costs (Johnson potentials) and augments
+    along the cheapest residual path. All initial arc costs must be >= 0.
+    Returns (flow_sent, total_cost).
+    """
+    potential = [0.0] * network.size
+    sent = 0
+    total_cost = 0.0
+
+    while sent < demand:
+        dist = [INF] * network.size
+        prev_arc = [-1] * network.size
+        dist[source] = 0.0
+        queue = [(0.0, source)]
+        network.pushes += 1
+        while queue:
+            d, u = heapq.heappop(queue)
+            if d > dist[u]:
+                continue
+            network.settled += 1
+            for arc in network.adjacency[u]:
+                if network.capacity[arc] <= 0:
+                    continue
+                v = network.head[arc]
+                # Reduced costs are >= 0 in exact arithmetic; clamp float rounding
+                # (~1e-16) so it can't form negative cycles and loop forever
+                nd = d + max(0.0, network.cost[arc] + potential[u] - potential[v])
+                if nd < dist[v]:
+                    dist[v] = nd
+                    prev_arc[v] = arc
+                    heapq.heappush(queue, (nd, v))
+                    network.pushes += 1
+
+        if dist[sink] == INF:
+            break
+
+        for node in range(network.size):
+            if dist[node] < INF:
+                potential[node] += dist[node]
+
+        # Bottleneck along the augmenting path
+        push = demand - sent
+        node = sink
+        while node != source:
+            arc = prev_arc[node]
+            push = min(push, network.capacity[arc])
+            node = network.head[arc ^ 1]
+
+        node = sink
+        while node != source:
+            arc = prev_arc[node]
+            network.capacity[arc] -= push
+            network.capacity[arc ^ 1] += push
+            total_cost += push * network.cost[arc]
+            node = network.head[arc ^ 1]
+        sent += push
+        network.augmentations += 1
+
+    return sent, total_cost
+
+
+def decompose_paths(network, source, sink):
+    """
+    Splits the flow on forward arcs into source -> sink paths.
+    Zero-cost cycles carrying flow are cancelled along the way.
+    Returns [(node_path, qty), ...].
+    """
+    remaining = {
+        arc: network.flow(arc)
+        for arc in range(0, len(network.head), 2) if network.flow(arc) > 0
+    }
+    out_arcs = {}
+    for arc in remaining:
+        out_arcs.setdefault(network.head[arc ^ 1], []).append(arc)
+
+    def next_arc(node):
+        arcs = out_arcs.get(node, [])
+        while arcs and remaining.get(arcs[-1], 0) <= 0:
+            arcs.pop()
+        return arcs[-1] if arcs else None
+
+    paths = []
+    while True:
+        arc = next_arc(source)
+        if arc is None:
+            break
+        nodes = [source]
+        arcs = []
+        position = {source: 0}
+        node = source
+        while node != sink:
+            arc = next_arc(node)
+            if arc is None:
+                break
+            node = network.head[arc]
+            if node in position:
+                # Cancel the cycle and continue from where it started
+                cycle = arcs[position[node]:] + [arc]
+                qty = min(remaining[a] for a in cycle)
+                for a in cycle:
+                    remaining[a] -= qty
+                del arcs[position[node]:]
+                for n in nodes[position[node] + 1:]:
+                    position.pop(n, None)
+                del nodes[position[node] + 1:]
+                continue
+            position[node] = len(nodes)
+            nodes.append(node)
+            arcs.append(arc)
+
+        if node != sink or not arcs:
+            break
+        qty = min(remaining[a] for a in arcs)
+        for a in arcs:
+            remaining[a] -= qty
+        paths.append((nodes, qty))
+    return paths
+
+
+def min_cost_paths(csr, supplies, target, demand, weights, scale=1, no_transit=()):
+    """
+    Routes up to `demand` units to `target` as a min-cost flow over a CSRGraph.
+
+    supplies: {node_id: available_qty}. A super source feeds every supply node
+    up to its quantity; graph edges have no capacity limit (modelled as
+    `demand`, which no edge can exceed) and cost weights[e] * scale per unit.
+    Wallets in `no_transit` get no graph edges in (other than the target), so
+    flow can start there but never pass through.
+    Returns ([(path_node_ids, qty), ...], qty_sent, search_stats).
+    """
+    n = len(csr)
+    super_source = n
+    blocked = {csr.index[wallet] for wallet in no_transit if wallet in csr.index} - {target}
+    network = FlowNetwork(n + 1)
+    for u in range(n):
+        for e in range(csr.offsets[u], csr.offsets[u + 1]):
+            if csr.targets[e] not in blocked:
+                network.add_arc(u, csr.targets[e], demand, weights[e] * scale)
+    for node, qty in supplies.items():
+        network.add_arc(super_source, node, qty, 0)
+
+    sent, _ = successive_shortest_paths(network, super_source, target, demand)
+    paths = [(nodes[1:], qty) for nodes, qty in decompose_paths(network, super_source, target)]
+    stats = {
+        "algorithm": "mincost",
+        "augmentations": network.augmentations,
+        "settled": network.settled,
+        "heap_pushes": network.pushes,
+    }
+    return paths, sent, stats
@@ -0,0 +1,335 @@
+import asyncio
+from config.db import db
+from optimizer.csr import CSRGraph
+
+collection = db.get_collection('connections')
+
+# Entities whose geo point (A* heuristic) and coldChain flag describe graph nodes
+NODE_COLLECTIONS = [
+    db.get_collection('manufacturers'),
+    db.get_collection('distributors'),
+    db.get_collection('retailers'),
+]
+NODE_FIELDS = {"_id": 0, "walletAddress": 1, "geo.coordinates": 1, "coldChain": 1}
+
+CONNECTION_FIELDS = {
+    "_id": 0,
+    "fromWalletAddress": 1,
+    "toWalletAddress": 1,
+    "fromType": 1,
+    "toType": 1,
+    "costPerUnit": 1,
+    "transitTimeDays": 1,
+    "coldChain": 1,
+}
+
+
+def _edge_values(conn):
+    """
+    Returns (costPerUnit, transitTimeDays) for a connection, using the same
+    defaults as build_weighted_graph when a value is missing.
+    """
+    cost = conn.get('costPerUnit')
+    time = conn.get('transitTimeDays')
+    return (1 if cost is None else cost), (1 if time is None else time)
+
+
+def _coordinates(geo):
+    """(lng, lat) from a GeoJSON point (dict or GeoModel), or None."""
+    if geo is None:
+        return None
+    coords = geo.get("coordinates") if isinstance(geo, dict) else getattr(geo, "coordinates", None)
+    if not coords or len(coords) != 2:
+        return None
+    return float(coords[0]), float(coords[1])
+
+
+class ScaledGraph:
+    """
+    Read-only view over the cached adjacency dict.
+    Edge costs are multiplied by `scale` (unitWeight * qty) only when a node's
+    edges are read, so the base graph is never rebuilt per request.
+    """
+
+    def __init__(self, adjacency, scale=1, cache=None):
+        self.adjacency = adjacency
+        self.scale = scale
+        self.cache = cache
+
+    def get(self, node, default=None):
+        edges = self.adjacency.get(node)
+        if edges is None:
+            return default
+        if self.scale == 1:
+            return edges
+        return [(dst, cost * self.scale, time) for dst, cost, time in edges]
+
+    def __getitem__(self, node):
+        edges = self.get(node)
+        if edges is None:
+            raise KeyError(node)
+        return edges
+
+    def __contains__(self, node):
+        return node in self.adjacency
+
+    def __iter__(self):
+        return iter(self.adjacency)
+
+    def __len__(self):
+        return len(self.adjacency)
+
+    def reversed(self):
+        # Every connection is stored in both directions, so the reversed graph is the same graph
+        return self
+
+    def csr(self):
+        if self.cache is not None:
+            return self.cache.csr()
+        return CSRGraph.from_adjacency(self.adjacency)
+
+
+class GraphCache:
+    """
+    Process-wide copy of the `connections` topology.
+
+    Loaded once (at startup, or lazily on first use) and then patched in place
+    by connection_controller whenever a connection is added, updated or deleted.
+    Entity coordinates (for A*) and cold-chain flags are kept alongside and
+    patched by the entity controllers. Cold-chain routing uses cold_csr(): only
+    cold-chain connections between cold-chain entities, or the full graph
+    while nothing is flagged. Each uvicorn worker
+    keeps its own copy.
+    """
+
+    def __init__(self):
+        self.edges = {}          # (from, to) -> (costPerUnit, transitTimeDays)
+        self.adjacency = {}      # node -> [(neighbor, costPerUnit, transitTimeDays), ...]
+        self.transit_times = {}  # (from, to) -> transitTimeDays, used for ETA
+        self.loaded = False
+        self.version = 0         # bumped on every topology change
+        self.coordinates = {}    # wallet -> (lng, lat)
+        self.geo_version = 0     # bumped on every coordinate change
+        self.cold_nodes = set()  # wallets with coldChain storage
+        self.cold_edges = set()  # (from, to) of coldChain connections
+        self.cold_version = 0    # bumped on every entity coldChain change
+        self.node_types = {}     # wallet -> manufacturer / distributor / retailer, from connections
+        self._csr = None
+        self._csr_version = None
+        self._cold_csr = None
+        self._cold_csr_version = None
+        self._cold_fallback_warned = False
+        self.listeners = []      # called as listener(event, src, dst, before, after)
+        self._lock = asyncio.Lock()
+
+    async def load(self):
+        nodes = []
+        for entity_collection in NODE_COLLECTIONS:
+            nodes += await entity_collection.find({}, NODE_FIELDS).to_list(length=None)
+        self.load_nodes(nodes)
+        docs = await collection.find({}, CONNECTION_FIELDS).to_list(length=None)
+        self.load_connections(docs)
+
+    async def ensure_loaded(self):
+        if self.loaded:
+            return
+        async with self._lock:
+            if not self.loaded:
+                await self.load()
+
+    def load_connections(self, connections):
+        self.edges = {}
+        self.node_types = {}
+        self.adjacency = {}
+        self.transit_times = {}
+        self.cold_edges = set()
+        for conn in connections:
+            self._add(conn)
+        self.loaded = True
+        self.version += 1
+        self._notify("reload", None, None, None, None)
+
+    def load_state(self, adjacency, edges, transit_times, cold_edges, node_types, coordinates, cold_nodes,
+                   csr=None):
+        """
+        Replaces the whole cache with state read from a network snapshot.
+        `csr`, when given, must be the CSR of `adjacency` with these
+        coordinates; it is used as is instead of being rebuilt.
+        """
+        self.adjacency = adjacency
+        self.edges = edges
+        self.transit_times = transit_times
+        self.cold_edges = cold_edges
+        self.node_types = node_types
+        self.coordinates = coordinates
+        self.cold_nodes = cold_nodes
+        self.loaded = True
+        self.version += 1
+        self.geo_version += 1
+        self.cold_version += 1
+        if csr is not None:
+            self._csr = csr
+            self._csr_version = (self.version, self.geo_version)
+        self._notify("reload", None, None, None, None)
+
+    def load_nodes(self, docs):
+        self.coordinates = {}
+        self.cold_nodes = set()
+        for doc in docs:
+            coords = _coordinates(doc.get("geo"))
+            if coords is not None:
+                self.coordinates[doc["walletAddress"]] = coords
+            if doc.get("coldChain"):
+                self.cold_nodes.add(doc["walletAddress"])
+        self.geo_version += 1
+        self.cold_version += 1
+
+    def set_location(self, wallet, geo):
+        coords = _coordinates(geo)
+        if self.coordinates.get(wallet) == coords:
+            return
+        if coords is None:
+            self.coordinates.pop(wallet, None)
+        else:
+            self.coordinates[wallet] = coords
+        self.geo_version += 1
+
+    def set_cold_chain(self, wallet, cold_chain):
+        if (wallet in self.cold_nodes) == bool(cold_chain):
+            return
+        if cold_chain:
+            self.cold_nodes.add(wallet)
+        else:
+            self.cold_nodes.discard(wallet)
+        self.cold_version += 1
+        self._notify("cold", wallet, None, None, None)
+
+    def remove_node(self, wallet):
+        self.set_location(wallet, None)
+        self.set_cold_chain(wallet, False)
+
+    def rename_node(self, old_wallet, new_wallet):
+        if old_wallet == new_wallet:
+            return
+        if old_wallet in self.coordinates:
+            self.coordinates[new_wallet] = self.coordinates.pop(old_wallet)
+            self.geo_version += 1
+        if old_wallet in self.cold_nodes:
+            self.set_cold_chain(old_wallet, False)
+            self.set_cold_chain(new_wallet, True)
+
+    def add_listener(self, listener):
+        """
+        Registers a callback for topology changes. `before`/`after` are the
+        edge's (costPerUnit, transitTimeDays), or None when it didn't/doesn't exist.
+        Entity coldChain changes arrive as event "cold" with src = the wallet.
+        """
+        self.listeners.append(listener)
+
+    def _notify(self, event, src, dst, before, after):
+        for listener in self.listeners:
+            listener(event, src, dst, before, after)
+
+    def _add(self, conn):
+        src = conn['fromWalletAddress']
+        dst = conn['toWalletAddress']
+        cost, time = _edge_values(conn)
+        self.edges[(src, dst)] = (cost, time)
+        self.transit_times[(src, dst)] = conn.get('transitTimeDays') or 0
+        if conn.get('coldChain'):
+            self.cold_edges.add((src, dst))
+        for wallet, entity_type in ((src, conn.get('fromType')), (dst, conn.get('toType'))):
+            if entity_type:
+                self.node_types[wallet] = entity_type
+        self.adjacency.setdefault(src, []).append((dst, cost, time))
+        # Connections are treated as bidirectional
+        self.adjacency.setdefault(dst, []).append((src, cost, time))
+
+    def _remove(self, src, dst):
+        cost, time = self.edges.pop((src, dst))
+        self.transit_times.pop((src, dst), None)
+        self.cold_edges.discard((src, dst))
+        for node, entry in ((src, (dst, cost, time)), (dst, (src, cost, time))):
+            edges = self.adjacency.get(node, [])
+            if entry in edges:
+                edges.remove(entry)
+            if not edges:
+                self.adjacency.pop(node, None)
+
+    def has_connection(self, conn):
+        """True when `conn` is cached with the same values."""
+        key = (conn['fromWalletAddress'], conn['toWalletAddress'])
+        return (
+            self.edges.get(key) == _edge_values(conn)
+            and self.transit_times.get(key) == (conn.get('transitTimeDays') or 0)
+            and (key in self.cold_edges) == bool(conn.get('coldChain'))
+            and all(
+                self.node_types.get(wallet) == entity_type
+                for wallet, entity_type in ((key[0], conn.get('fromType')), (key[1], conn.get('toType')))
+                if entity_type
+            )
+        )
+
+    def upsert_connection(self, conn):
+        if not self.loaded:
+            return
+        if hasattr(conn, "model_dump"):
+            conn = conn.model_dump()
+        key = (conn['fromWalletAddress'], conn['toWalletAddress'])
+        before = self.edges.get(key)
+        if before is not None:
+            self._remove(*key)
+        self._add(conn)
+        self.version += 1
+        self._notify("upsert", key[0], key[1], before, self.edges[key])
+
+    def remove_connection(self, from_walletAddress, to_walletAddress):
+        if not self.loaded:
+            return
+        before = self.edges.get((from_walletAddress, to_walletAddress))
+        if before is not None:
+            self._remove(from_walletAddress, to_walletAddress)
+            self.version += 1
+            self._notify("remove", from_walletAddress, to_walletAddress, before, None)
+
+    def non_forwarding_wallets(self):
+        """Wallets a shipment can start or end at but never pass through (everything but distributors)."""
+        return [wallet for wallet, entity_type in self.node_types.items() if entity_type != "distributor"]
+
+    def csr(self):
+        """CSR copy of the cached adjacency, rebuilt lazily after topology or coordinate changes."""
+        if self._csr_version != (self.version, self.geo_version):
+            self._csr = CSRGraph.from_adjacency(self.adjacency, coordinates=self.coordinates)
+            self._csr_version = (self.version, self.geo_version)
+        return self._csr
+
+    def cold_csr(self):
+        """
+        CSR of the cold-chain subgraph, rebuilt lazily like csr(). Until both
+        entities and connections carry coldChain flags that subgraph is
+        empty, so cold-chain requests are routed over the full graph instead.
+        """
+        if not self.cold_nodes or not self.cold_edges:
+            if not self._cold_fallback_warned:
+                print("Warning: no coldChain entities or connections are flagged yet; "
+                      "cold-chain requests are routed over the full graph")
+                self._cold_fallback_warned = True
+            return self.csr()
+        self._cold_fallback_warned = False
+        version = (self.version, self.geo_version, self.cold_version)
+        if self._cold_csr_version != version:
+            adjacency = {}
+            for src, dst in self.cold_edges:
+                if src in self.cold_nodes and dst in self.cold_nodes:
+                    cost, time = self.edges[(src, dst)]
+                    adjacency.setdefault(src, []).append((dst, cost, time))
+                    adjacency.setdefault(dst, []).append((src, cost, time))
+            self._cold_csr = CSRGraph.from_adjacency(adjacency, coordinates=self.coordinates)
+            self._cold_csr_version = version
+        return self._cold_csr
+
+    def view(self, product_weight=1, required_qty=1):
+        return ScaledGraph(self.adjacency, product_weight * required_qty, cache=self)
+
+
+graph_cache = GraphCache()
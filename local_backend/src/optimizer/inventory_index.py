@@ -0,0 +1,156 @@
+import asyncio
+from config.db import db
+
+ENTITY_COLLECTIONS = {
+    "retailer": db.get_collection("retailers"),
+    "distributor": db.get_collection("distributors"),
+}
+
+INVENTORY_FIELDS = {
+    "_id": 0,
+    "walletAddress": 1,
+    "inventory.productName": 1,
+    "inventory.productIds": 1,
+    "inventory.qty": 1,
+    "inventory.qtyRemaining": 1,
+}
+
+
+def _item_value(item, key, default=None):
+    if isinstance(item, dict):
+        return item.get(key, default)
+    return getattr(item, key, default)
+
+
+def _entry_for(entity_type, items):
+    """
+    Collapses the inventory items of one product at one wallet into an index entry.
+    Items without unit IDs count towards untrackedQty, as in the optimizer source scan.
+    """
+    product_ids = []
+    qty = 0
+    untracked_qty = 0
+    for item in items:
+        item_qty = _item_value(item, "qty")
+        if item_qty is None:
+            item_qty = _item_value(item, "qtyRemaining", 1)
+        qty += item_qty or 0
+        ids = _item_value(item, "productIds") or []
+        if ids:
+            product_ids.extend(ids)
+        else:
+            untracked_qty += item_qty or 0
+    return {
+        "entityType": entity_type,
+        "qty": qty,
+        "productIds": product_ids,
+        "untrackedQty": untracked_qty,
+    }
+
+
+class InventoryIndex:
+    """
+    Product -> {wallet -> stock} index over retailer and distributor inventories.
+
+    Loaded once and kept current by the inventory write paths in
+    retailer_controller and distributor_controller, so the optimizer can find
+    every holder of a product without scanning both collections.
+    Product names are matched case-insensitively. Each uvicorn worker keeps its own copy.
+    Listeners are called with the set of product names whose stock changed
+    (None after a full reload).
+    """
+
+    def __init__(self):
+        self.products = {}        # productName.lower() -> {wallet: entry}
+        self.wallet_products = {} # wallet -> {productName.lower(), ...}
+        self.loaded = False
+        self.listeners = []
+        self._lock = asyncio.Lock()
+
+    async def load(self):
+        self.products = {}
+        self.wallet_products = {}
+        for entity_type, collection in ENTITY_COLLECTIONS.items():
+            async for doc in collection.find({}, INVENTORY_FIELDS):
+                self._set(doc["walletAddress"], entity_type, doc.get("inventory") or [])
+        self.loaded = True
+        self._notify(None)
+
+    def load_entries(self, products):
+        """Replaces the index with {productName.lower(): {wallet: entry}}, e.g. from a network snapshot."""
+        self.products = products
+        self.wallet_products = {}
+        for name, holders in products.items():
+            for wallet in holders:
+                self.wallet_products.setdefault(wallet, set()).add(name)
+        self.loaded = True
+        self._notify(None)
+
+    async def ensure_loaded(self):
+        if self.loaded:
+            return
+        async with self._lock:
+            if not self.loaded:
+                await self.load()
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def _notify(self, product_names):
+        if product_names is not None and not product_names:
+            return
+        for callback in self.listeners:
+            callback(product_names)
+
+    def _entries(self, wallet):
+        return {name: self.products[name][wallet] for name in self.wallet_products.get(wallet, ())}
+
+    def _set(self, wallet, entity_type, inventory):
+        self._remove(wallet)
+        grouped = {}
+        for item in inventory:
+            name = (_item_value(item, "productName") or "").lower()
+            grouped.setdefault(name, []).append(item)
+        for name, items in grouped.items():
+            self.products.setdefault(name, {})[wallet] = _entry_for(entity_type, items)
+        if grouped:
+            self.wallet_products[wallet] = set(grouped)
+
+    def _remove(self, wallet):
+        for name in self.wallet_products.pop(wallet, ()):
+            holders = self.products.get(name, {})
+            holders.pop(wallet, None)
+            if not holders:
+                self.products.pop(name, None)
+
+    def set_inventory(self, wallet, entity_type, inventory):
+        """Replaces everything indexed for `wallet` with its new inventory array."""
+        if self.loaded:
+            before = self._entries(wallet)
+            self._set(wallet, entity_type, inventory or [])
+            after = self._entries(wallet)
+            self._notify({name for name in before.keys() | after.keys() if before.get(name) != after.get(name)})
+
+    def remove_wallet(self, wallet):
+        if self.loaded:
+            names = set(self.wallet_products.get(wallet, ()))
+            self._remove(wallet)
+            self._notify(names)
+
+    def rename_wallet(self, old_wallet, new_wallet):
+        if not self.loaded or old_wallet == new_wallet:
+            return
+        names = self.wallet_products.pop(old_wallet, set())
+        for name in names:
+            self.products[name][new_wallet] = self.products[name].pop(old_wallet)
+        if names:
+            self.wallet_products[new_wallet] = names
+        self._notify(names)
+
+    async def holders(self, product_name):
+        """Returns {wallet: entry} for every retailer/distributor stocking `product_name`."""
+        await self.ensure_loaded()
+        return self.products.get(product_name.lower(), {})
+
+
+inventory_index = InventoryIndex()
@@ -0,0 +1,117 @@
+import heapq
+
+INF = float("inf")
+
+
+def _edge_label(csr, weights, u, v):
+    """Best (weight, cost) over the parallel edges u -> v."""
+    return min(
+        (weights[e], csr.costs[e])
+        for e in range(csr.offsets[u], csr.offsets[u + 1]) if csr.targets[e] == v
+    )
+
+
+def _path_label(csr, weights, path):
+    priority = cost = 0.0
+    for u, v in zip(path, path[1:]):
+        edge_priority, edge_cost = _edge_label(csr, weights, u, v)
+        priority += edge_priority
+        cost += edge_cost
+    return priority, cost
+
+
+def _spur_search(csr, weights, start, goal, estimate, banned_nodes, banned_edges, blocked=frozenset()):
+    """
+    A* from start to goal avoiding banned nodes and (u, v) edges, and never
+    passing through a `blocked` node (they can only be the goal). `estimate`
+    holds exact distances to goal in the unrestricted graph, which can only
+    underestimate once nodes and edges are removed. Returns node ids or None.
+    """
+    best = {start: (0.0, 0.0)}
+    pred = {start: -1}
+    queue = [(estimate[start], 0.0, 0.0, start)]
+    while queue:
+        _, node_priority, node_cost, node = heapq.heappop(queue)
+        if best[node] != (node_priority, node_cost):
+            continue
+        if node == goal:
+            path = []
+            while node != -1:
+                path.append(node)
+                node = pred[node]
+            path.reverse()
+            return path
+        if node in blocked and node != start:
+            continue
+        for e in range(csr.offsets[node], csr.offsets[node + 1]):
+            neighbor = csr.targets[e]
+            if neighbor in banned_nodes or (node, neighbor) in banned_edges or estimate[neighbor] == INF:
+                continue
+            label = (node_priority + weights[e], node_cost + csr.costs[e])
+            if label < best.get(neighbor, (INF, INF)):
+                best[neighbor] = label
+                pred[neighbor] = node
+                heapq.heappush(queue, (label[0] + estimate[neighbor], label[0], label[1], neighbor))
+    return None
+
+
+def k_shortest_paths(tree, src, k, csr=None, no_transit=()):
+    """
+    Yen's k shortest loopless paths from `src` to the root of `tree`.
+
+    `tree` is the csr.SearchResult of a Dijkstra rooted at the target over the
+    reversed graph, so it already holds the best route and the exact distance
+    of every node to the target; the spur searches use those distances as an
+    A* heuristic. `csr` is the forward graph the spur searches follow; it
+    defaults to tree.csr, which is right for the bidirectional connection
+    graph (its own reverse). No route passes through a `no_transit` wallet;
+    `tree` must have been searched with the same restriction. Returns up to k
+    (path, total_cost, total_priority) tuples in the shape of shortest_path,
+    best first.
+    """
+    csr = csr if csr is not None else tree.csr
+    src_id = csr.index.get(src)
+    if k <= 0 or src_id is None or not tree.reached(src):
+        return []
+    weights = csr.times if tree.return_time else csr.costs
+    goal = csr.index[tree.root]
+    blocked = {csr.index[wallet] for wallet in no_transit if wallet in csr.index}
+    if csr is tree.csr:
+        estimate = tree.priority
+    else:
+        # The reversed graph may number its nodes differently
+        estimate = [
+            tree.priority[tree.csr.index[node]] if node in tree.csr.index else INF for node in csr.nodes
+        ]
+
+    found = [[csr.index[node] for node in tree.path_to_root(src)]]
+    candidates = []
+    seen = {tuple(found[0])}
+    while len(found) < k:
+        last = found[-1]
+        for i in range(len(last) - 1):
+            root_path = last[:i + 1]
+            banned_edges = {
+                (path[i], path[i + 1]) for path in found
+                if len(path) > i + 1 and path[:i + 1] == root_path
+            }
+            spur = _spur_search(
+                csr, weights, last[i], goal, estimate, set(root_path[:-1]), banned_edges, blocked
+            )
+            if spur is None:
+                continue
+            path = root_path[:-1] + spur
+            if tuple(path) not in seen:
+                seen.add(tuple(path))
+                heapq.heappush(candidates, (_path_label(csr, weights, path), path))
+        if not candidates:
+            break
+        found.append(heapq.heappop(candidates)[1])
+
+    routes = []
+    for path in found:
+        priority, cost = _path_label(csr, weights, path)
+        if not tree.return_time:
+            priority *= tree.scale
+        routes.append(([csr.nodes[i] for i in path], cost * tree.scale, priority))
+    return routes
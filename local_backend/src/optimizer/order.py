@@ -0,0 +1,222 @@
+from controllers.manufacturer_controller import all_manufacturers
+from optimizer.algorithm import build_source_nodes, manufacturer_fallback, plan_allocations
+from optimizer.batch import NetworkSnapshot
+from optimizer.csr import dijkstra
+from optimizer.executor import graph_executor
+from optimizer.graph_cache import graph_cache
+from optimizer.inventory_index import inventory_index
+from optimizer.reservations import reservations, order_unit_ids
+from optimizer.stats import OptimizerTrace
+from optimizer.utils import path_from_tree
+
+
+def order_path(path, node_types, connections_lookup):
+    """
+    Turns a route [source, ..., retailer] into the hops stored in
+    lineItems[].allocations[].path (PathModel).
+    """
+    hops = []
+    for src, dst in zip(path, path[1:]):
+        # Connections are bidirectional, so the hop may run against the stored direction
+        eta = connections_lookup.get((src, dst), connections_lookup.get((dst, src), 0))
+        hops.append({
+            "fromType": node_types.get(src),
+            "fromWalletAddress": src,
+            "toType": node_types.get(dst),
+            "toWalletAddress": dst,
+            "etaDays": eta,
+        })
+    return hops
+
+
+def order_allocation(source, path, product_ids, qty, total_cost, node_types, connections_lookup):
+    """AllocationsModel-shaped allocation, plus the source and route cost for the caller."""
+    hops = order_path(path, node_types, connections_lookup)
+    return {
+        "qty": qty,
+        "batchId": None,
+        "productUnitIds": product_ids,
+        "currentStage": 0,
+        "fulfilled": False,
+        "path": hops,
+        "source": source,
+        "total_cost": total_cost,
+        "eta_days": sum(hop["etaDays"] for hop in hops),
+    }
+
+
+class OrderLine:
+    def __init__(self, index, item, snapshot, target_wallet, is_cold_storage, trees, no_transit):
+        self.index = index
+        self.product_name = item.productName
+        self.name = item.productName.lower()
+        self.qty = item.qty
+        self.cold_chain = is_cold_storage or snapshot.cold_chain[self.name]
+        self.csr = snapshot.graph(self.cold_chain)
+        # One search per cold chain flag is shared by every line of the order;
+        # routes only relay through distributors, so every hop is a valid PathModel
+        if self.cold_chain not in trees:
+            trees[self.cold_chain] = dijkstra(self.csr, target_wallet, is_cold_storage, no_transit=no_transit)
+        self.tree = trees[self.cold_chain].with_scale(snapshot.weights[self.name] * item.qty)
+        self.allocations = []   # optimizer-shaped, as returned by plan_allocations
+
+    def source_nodes(self, snapshot, target_wallet):
+        return build_source_nodes(
+            snapshot.inventories[self.name], snapshot.available_ids, target_wallet,
+            self.csr, snapshot.consumed.get(self.name)
+        )
+
+
+def pick_consolidated_source(open_lines, snapshot, target_wallet):
+    """
+    The source that can fill the most open lines on its own (cheapest on a tie).
+    Returns (wallet, [(line, source_node, route), ...]) or None.
+    """
+    cover = {}
+    for line in open_lines:
+        for src in line.source_nodes(snapshot, target_wallet):
+            if src["available_qty"] < line.qty:
+                continue
+            route = path_from_tree(line.tree, src["wallet"])
+            if route is not None:
+                cover.setdefault(src["wallet"], []).append((line, src, route))
+    if not cover:
+        return None
+    return max(
+        cover.items(),
+        key=lambda item: (len(item[1]), -sum(route[1] for _, _, route in item[1]))
+    )
+
+
+async def optimize_order(request):
+    """
+    Plans every line item of an order for one retailer against one network
+    snapshot.
+
+    Lines are first given to single sources, picking each time the source
+    that can fill the most remaining lines, so the order ships from as few
+    places as possible. Lines no single source can fill are split greedily
+    across sources like optimize_supply_path. Allocations are shaped like
+    lineItems[].allocations[] (AllocationsModel) and can be written to the
+    order as they are. Unless request.reserve is false (or reservations are
+    off) their units are reserved under the returned reservationId until the
+    order is created.
+    """
+    target_wallet = request.retailerWalletAddress
+    trace = OptimizerTrace(target=target_wallet, mode="order", line_items=len(request.lineItems))
+    with trace:
+        if not reservations.wanted(request.reserve):
+            return await _optimize_order(request, trace)
+        result, reservation = await reservations.reserve(
+            lambda: _optimize_order(request, trace), lambda result: order_unit_ids(result["lineItems"])
+        )
+        if reservation is not None:
+            trace.count("reserved_units", len(order_unit_ids(result["lineItems"])))
+            result.update(reservation)
+    return result
+
+
+def plan_order(csr, cold_csr, connections_lookup, snapshot, request, no_transit):
+    """
+    CPU-bound part of optimize_order (route search and allocation); runs in
+    graph_executor, so it only touches its arguments. `no_transit` holds the
+    wallets routes may not relay through. Returns ([(cold_chain,
+    allocations) per line item], number of route searches).
+    """
+    snapshot.attach(csr, cold_csr, connections_lookup)
+    target_wallet = request.retailerWalletAddress
+    trees = {}
+    lines = [
+        OrderLine(i, item, snapshot, target_wallet, request.is_cold_storage, trees, no_transit)
+        for i, item in enumerate(request.lineItems)
+    ]
+
+    # Consolidation: single sources first, each time the one filling the most open lines
+    open_lines = [line for line in lines if line.qty > 0]
+    while open_lines:
+        picked = pick_consolidated_source(open_lines, snapshot, target_wallet)
+        if picked is None:
+            break
+        wallet, options = picked
+        products_taken = set()
+        for line, src, (path, cost, _) in options:
+            # Two lines of the same product: stock is rechecked on the next round
+            if line.name in products_taken:
+                continue
+            products_taken.add(line.name)
+            allocation = {
+                "source": wallet,
+                "path": path,
+                "product_ids": src["product_ids"][:line.qty],
+                "total_cost": cost,
+                "allocated_qty": line.qty,
+            }
+            line.allocations.append(allocation)
+            snapshot.consume(line.name, [allocation])
+            open_lines.remove(line)
+
+    # Lines no single source can fill are split greedily
+    for line in open_lines:
+        allocations, _ = plan_allocations(
+            line.source_nodes(snapshot, target_wallet), line.tree, line.qty,
+            request.is_cold_storage, snapshot.transit_times
+        )
+        line.allocations.extend(allocations)
+        snapshot.consume(line.name, allocations)
+
+    return [(line.cold_chain, line.allocations) for line in lines], len(trees)
+
+
+async def _optimize_order(request, trace):
+    target_wallet = request.retailerWalletAddress
+    with trace.phase("graph_load"):
+        await graph_cache.ensure_loaded()
+        await inventory_index.ensure_loaded()
+
+    with trace.phase("snapshot"):
+        snapshot = NetworkSnapshot()
+        await snapshot.load([item.productName for item in request.lineItems])
+
+    with trace.phase("route_search"):
+        planned, route_searches = await graph_executor.run_with_graphs(
+            plan_order, snapshot, request, graph_cache.non_forwarding_wallets()
+        )
+    trace.count("route_searches", route_searches)
+
+    line_items = []
+    for item_request, (cold_chain, allocations) in zip(request.lineItems, planned):
+        allocated = sum(a["allocated_qty"] for a in allocations)
+        item = {
+            "productName": item_request.productName,
+            "qty": item_request.qty,
+            "allocations": [
+                order_allocation(
+                    a["source"], a["path"], a["product_ids"], a["allocated_qty"], a["total_cost"],
+                    graph_cache.node_types, graph_cache.transit_times
+                )
+                for a in allocations
+            ],
+            "status": "complete" if allocated >= item_request.qty else "partial",
+        }
+        if allocated == 0 and item_request.qty > 0:
+            if snapshot.manufacturers is None:
+                snapshot.manufacturers = await all_manufacturers()
+            item["wait_recommendation"] = manufacturer_fallback(
+                item_request.productName, snapshot.manufacturers, cold_chain
+            )["wait_recommendation"]
+        elif allocated < item_request.qty:
+            item["wait_recommendation"] = {
+                "message": f"Only {allocated} units available for {item_request.productName}. Please wait for restock."
+            }
+        line_items.append(item)
+
+    sources = sorted({a["source"] for _, allocations in planned for a in allocations})
+    trace.count("sources", len(sources))
+
+    return {
+        "retailerWalletAddress": target_wallet,
+        "lineItems": line_items,
+        "sources": sources,
+        "total_cost": sum(a["total_cost"] for item in line_items for a in item["allocations"]),
+        "status": "complete" if all(item["status"] == "complete" for item in line_items) else "partial",
+    }
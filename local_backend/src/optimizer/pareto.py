@@ -0,0 +1,92 @@
+import heapq
+import os
+from array import array
+
+# Upper bound on non-dominated routes kept per node
+PARETO_MAX_LABELS = int(os.getenv("PARETO_MAX_LABELS", "16"))
+
+
+class ParetoResult:
+    """
+    Non-dominated (cost, time) labels for every node reached from `root`.
+    Labels live in flat arrays; pred links point at the label a route was
+    extended from, so each label spells out one full route to the root.
+    """
+
+    def __init__(self, csr, root, node_labels, label_node, label_cost, label_time, label_pred, pushes=0):
+        self.csr = csr
+        self.root = root
+        self.node_labels = node_labels  # node id -> [label id, ...] in increasing cost
+        self.label_node = label_node
+        self.label_cost = label_cost
+        self.label_time = label_time
+        self.label_pred = label_pred
+        self.pushes = pushes  # heap pushes; len(label_node) labels were settled
+
+    def path(self, label):
+        path = []
+        while label != -1:
+            path.append(self.csr.nodes[self.label_node[label]])
+            label = self.label_pred[label]
+        return path
+
+    def frontier(self, node, scale=1):
+        """Returns [(path_to_root, total_cost, total_time), ...] for `node`, cheapest first."""
+        i = self.csr.index.get(node)
+        if i is None:
+            return []
+        return [
+            (self.path(label), self.label_cost[label] * scale, self.label_time[label])
+            for label in self.node_labels.get(i, ())
+        ]
+
+
+def pareto_search(csr, root, max_labels=PARETO_MAX_LABELS, no_transit=()):
+    """
+    Bi-objective label-setting search over (costPerUnit, transitTimeDays) from `root`.
+    Wallets in `no_transit` (other than the root) get labels but are never passed through.
+
+    Labels are settled in lexicographic (cost, time) order, so a label is
+    dominated exactly when its time is not below the best time already
+    settled at its node; that one comparison does all the dominance pruning.
+    Each node keeps at most `max_labels` routes. On the bidirectional
+    connection graph the labels at node v are the routes from v to root.
+    """
+    n = len(csr)
+    best_time = array('d', [float("inf")]) * n
+    node_labels = {}
+    label_node, label_cost, label_time, label_pred = array('i'), array('d'), array('d'), array('i')
+
+    root_id = csr.index.get(root)
+    if root_id is None:
+        return ParetoResult(csr, root, node_labels, label_node, label_cost, label_time, label_pred)
+
+    blocked = {csr.index[wallet] for wallet in no_transit if wallet in csr.index} - {root_id}
+    offsets, targets, costs, times = csr.offsets, csr.targets, csr.costs, csr.times
+    queue = [(0.0, 0.0, root_id, -1)]  # (cost, time, node id, pred label)
+    pushes = 1
+    while queue:
+        cost, time, node, pred = heapq.heappop(queue)
+        if time >= best_time[node]:
+            continue
+        labels = node_labels.setdefault(node, [])
+        if len(labels) >= max_labels:
+            continue
+        best_time[node] = time
+        label = len(label_node)
+        label_node.append(node)
+        label_cost.append(cost)
+        label_time.append(time)
+        label_pred.append(pred)
+        labels.append(label)
+        if node in blocked:
+            continue
+
+        for e in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[e]
+            next_time = time + times[e]
+            if next_time < best_time[neighbor]:
+                heapq.heappush(queue, (cost + costs[e], next_time, neighbor, label))
+                pushes += 1
+
+    return ParetoResult(csr, root, node_labels, label_node, label_cost, label_time, label_pred, pushes)
@@ -0,0 +1,321 @@
+import asyncio
+import math
+import os
+import time
+import uuid
+from datetime import datetime
+from fastapi import HTTPException
+from pymongo import UpdateOne
+from config.db import db
+from optimizer.algorithm import build_source_nodes
+from optimizer.batch import NetworkSnapshot
+from optimizer.csr import nearest_sources
+from optimizer.executor import graph_executor
+from optimizer.graph_cache import graph_cache
+from optimizer.inventory_index import inventory_index
+from optimizer.order import order_allocation
+from optimizer.stats import OptimizerTrace
+from utils.leases import Lease
+
+retailers = db.get_collection("retailers")
+proposed_orders = db.get_collection("proposed_orders")
+
+# Seconds between scheduled runs; 0 (default) disables the schedule, manual runs still work
+REPLENISHMENT_INTERVAL_SECONDS = float(os.getenv("REPLENISHMENT_INTERVAL_SECONDS", "0"))
+# Stock below reorderLevel is topped back up to reorderLevel * this factor
+REPLENISHMENT_ORDER_UP_TO = float(os.getenv("REPLENISHMENT_ORDER_UP_TO", "2"))
+# Longest a worker that died mid-run keeps other workers from running the planner
+REPLENISHMENT_RUN_LEASE_SECONDS = float(os.getenv("REPLENISHMENT_RUN_LEASE_SECONDS", "300"))
+WRITE_BATCH = 1000
+
+
+def _entity_stages(entity_type):
+    return [
+        {"$project": {"_id": 0, "walletAddress": 1, "entityType": {"$literal": entity_type}, "inventory": 1}},
+        {"$unwind": "$inventory"},
+    ]
+
+
+# Per (wallet, product): stock summed over inventory items, kept only when below reorderLevel
+BELOW_REORDER_LEVEL_STAGES = [
+    {"$group": {
+        "_id": {"wallet": "$walletAddress", "product": {"$toLower": "$inventory.productName"}},
+        "productName": {"$first": "$inventory.productName"},
+        "entityType": {"$first": "$entityType"},
+        "qty": {"$sum": {"$ifNull": ["$inventory.qty", {"$ifNull": ["$inventory.qtyRemaining", 0]}]}},
+        "reorderLevel": {"$max": "$inventory.reorderLevel"},
+    }},
+    {"$match": {"reorderLevel": {"$gt": 0}, "$expr": {"$lt": ["$qty", "$reorderLevel"]}}},
+    {"$project": {
+        "_id": 0,
+        "walletAddress": "$_id.wallet",
+        "entityType": 1,
+        "productName": 1,
+        "qty": 1,
+        "reorderLevel": 1,
+    }},
+]
+
+
+def below_reorder_level_pipeline():
+    """One pass over retailers and distributors (via $unionWith)."""
+    return [
+        *_entity_stages("retailer"),
+        {"$unionWith": {"coll": "distributors", "pipeline": _entity_stages("distributor")}},
+        *BELOW_REORDER_LEVEL_STAGES,
+    ]
+
+
+async def find_below_reorder_level():
+    return await retailers.aggregate(below_reorder_level_pipeline()).to_list(length=None)
+
+
+def plan_replenishment(csr, sources, demands, product_weight, no_transit=(), return_time=False):
+    """
+    Assigns every demand ({wallet: qty}) to its nearest source with stock,
+    over routes that never pass through a `no_transit` wallet.
+
+    Each round is one multi-source Dijkstra from all sources that still have
+    stock, so the whole product is planned in a few graph searches however
+    many wallets are short. Demands closest to their source are served first;
+    whatever a source can't cover is retried in the next round against the
+    sources left. Returns ({wallet: [allocation, ...]}, {wallet: unfilled_qty},
+    search_stats).
+    """
+    stock = {
+        src["wallet"]: {"qty": src["available_qty"], "ids": list(src["product_ids"])}
+        for src in sources
+    }
+    pending = dict(demands)
+    allocations = {}
+    stats = {"algorithm": "multi_source_dijkstra", "rounds": 0, "settled": 0, "heap_pushes": 0}
+
+    while pending:
+        live = [wallet for wallet, s in stock.items() if s["qty"] > 0]
+        if not live:
+            break
+        search, origin = nearest_sources(csr, live, return_time, no_transit)
+        stats["rounds"] += 1
+        stats["settled"] += search.settled
+        stats["heap_pushes"] += search.pushes
+
+        reachable = sorted(
+            (wallet for wallet in pending if search.reached(wallet)),
+            key=lambda wallet: search.priority[csr.index[wallet]]
+        )
+        progress = False
+        for wallet in reachable:
+            i = csr.index[wallet]
+            source = csr.nodes[origin[i]]
+            s = stock[source]
+            if s["qty"] <= 0:
+                continue
+            take = min(pending[wallet], s["qty"])
+            # Serialized units go first; the rest comes out of untracked stock
+            ids = s["ids"][:take]
+            del s["ids"][:take]
+            s["qty"] -= take
+            allocations.setdefault(wallet, []).append({
+                "source": source,
+                "path": search.path_to_root(wallet)[::-1],
+                "product_ids": ids,
+                "allocated_qty": take,
+                "total_cost": search.cost[i] * product_weight * take,
+            })
+            pending[wallet] -= take
+            if not pending[wallet]:
+                del pending[wallet]
+            progress = True
+        if not progress:
+            break
+
+    return allocations, pending, stats
+
+
+def plan_replenishment_run(csr, cold_csr, connections_lookup, snapshot, demands, no_transit):
+    """
+    CPU-bound part of a run; runs in graph_executor, so it only touches its
+    arguments. Plans every product of `demands` ({product: {wallet: qty}})
+    on the snapshot's graphs. Returns (planned, unfilled, searches), planned
+    as {wallet: {product: [allocation, ...]}} and unfilled as
+    {wallet: {product: qty}}.
+    """
+    snapshot.attach(csr, cold_csr, connections_lookup)
+    planned = {}
+    unfilled = {}
+    searches = []
+    for name, product_demands in demands.items():
+        graph = snapshot.graph(snapshot.cold_chain[name])
+        # Wallets that are short themselves never ship this product out
+        sources = [
+            src for src in build_source_nodes(snapshot.inventories[name], snapshot.available_ids, None, graph)
+            if src["wallet"] not in product_demands
+        ]
+        allocations, pending, search = plan_replenishment(
+            graph, sources, product_demands, snapshot.weights[name], no_transit
+        )
+        searches.append({"product": name, **search})
+        for wallet, wallet_allocations in allocations.items():
+            planned.setdefault(wallet, {})[name] = wallet_allocations
+        for wallet, qty in pending.items():
+            unfilled.setdefault(wallet, {})[name] = qty
+    return planned, unfilled, searches
+
+
+class ReplenishmentPlanner:
+    """
+    Finds every (wallet, product) below its reorderLevel and upserts one
+    proposed order per (wallet, product) into `proposed_orders`, so a
+    proposal keeps its _id and createdAt across runs. Proposals still in
+    status "proposed" whose wallet is no longer short of the product are
+    removed; anything moved past "proposed" is left alone. Runs on demand
+    (run()) and, when REPLENISHMENT_INTERVAL_SECONDS is set, on a schedule
+    (start()).
+
+    Every uvicorn worker starts the schedule, so both are coordinated
+    through Mongo leases (utils.leases). A run holds the "replenishment-run"
+    lease, so runs never overlap, even across workers. The schedule fires
+    only in the worker holding the "replenishment-schedule" lease. That
+    worker renews the lease on every tick, and the lease outlives a tick
+    by half an interval. If the worker goes away, another one takes over
+    within about one interval.
+    """
+
+    def __init__(self, interval=REPLENISHMENT_INTERVAL_SECONDS):
+        self.interval = interval
+        self.last_run = None
+        self._task = None
+        self._lock = asyncio.Lock()
+        self.run_lease = Lease("replenishment-run", REPLENISHMENT_RUN_LEASE_SECONDS)
+        self.schedule_lease = Lease("replenishment-schedule", interval * 1.5)
+
+    async def run(self):
+        async with self._lock, self.run_lease.hold() as acquired:
+            if not acquired:
+                raise HTTPException(status_code=409, detail="A replenishment run is already in progress")
+            report = await self._run()
+        self.last_run = report
+        return report
+
+    async def _run(self):
+        run_id = uuid.uuid4().hex
+        started = time.perf_counter()
+        trace = OptimizerTrace(mode="replenishment", run_id=run_id)
+        with trace:
+            with trace.phase("graph_load"):
+                await graph_cache.ensure_loaded()
+                await inventory_index.ensure_loaded()
+
+            with trace.phase("find_below_reorder_level"):
+                rows = await find_below_reorder_level()
+            trace.count("below_reorder_level", len(rows))
+
+            demands = {}        # productName.lower() -> {wallet: qty}
+            product_names = {}  # productName.lower() -> productName as stored
+            wallet_types = {}
+            for row in rows:
+                needed = math.ceil(row["reorderLevel"] * REPLENISHMENT_ORDER_UP_TO) - row["qty"]
+                if needed > 0:
+                    demands.setdefault(row["productName"].lower(), {})[row["walletAddress"]] = needed
+                    product_names.setdefault(row["productName"].lower(), row["productName"])
+                    wallet_types[row["walletAddress"]] = row["entityType"]
+
+            with trace.phase("snapshot"):
+                snapshot = NetworkSnapshot()
+                await snapshot.load(list(demands))
+
+            with trace.phase("planning"):
+                # Only distributors forward stock
+                planned, unfilled, searches = await graph_executor.run_with_graphs(
+                    plan_replenishment_run, snapshot, demands, graph_cache.non_forwarding_wallets()
+                )
+            for search in searches:
+                trace.search(search)
+
+            with trace.phase("write_proposals"):
+                documents = self._proposals(run_id, demands, product_names, planned, unfilled, wallet_types)
+                now = datetime.utcnow()
+                for i in range(0, len(documents), WRITE_BATCH):
+                    await proposed_orders.bulk_write([
+                        UpdateOne(
+                            {"retailerWalletAddress": doc["retailerWalletAddress"],
+                             "productName": doc["productName"], "status": "proposed"},
+                            {"$set": {**doc, "updatedAt": now}, "$setOnInsert": {"createdAt": now}},
+                            upsert=True,
+                        )
+                        for doc in documents[i:i + WRITE_BATCH]
+                    ], ordered=False)
+                # Wallets restocked since an earlier run
+                await proposed_orders.delete_many({"status": "proposed", "runId": {"$ne": run_id}})
+            trace.count("proposed_orders", len(documents))
+
+        seconds = time.perf_counter() - started
+        return {
+            "runId": run_id,
+            "below_reorder_level": len(rows),
+            "products": len(demands),
+            "proposed_orders": len(documents),
+            "units_proposed": sum(
+                a["allocated_qty"] for products in planned.values()
+                for allocations in products.values() for a in allocations
+            ),
+            "units_unfilled": sum(qty for products in unfilled.values() for qty in products.values()),
+            "seconds": round(seconds, 3),
+            "demands_per_second": round(len(rows) / seconds, 1) if seconds else None,
+            "phases_ms": trace.as_dict()["phases_ms"],
+        }
+
+    @staticmethod
+    def _proposals(run_id, demands, product_names, planned, unfilled, wallet_types):
+        """One OrderModel-shaped document (a single line item) per short (wallet, product)."""
+        documents = []
+        for name, product_demands in demands.items():
+            for wallet in sorted(product_demands):
+                allocations = planned.get(wallet, {}).get(name, [])
+                documents.append({
+                    "retailerWalletAddress": wallet,
+                    "productName": product_names[name],
+                    "entityType": wallet_types[wallet],
+                    "lineItems": [{
+                        "productName": product_names[name],
+                        "qty": product_demands[wallet],
+                        "allocations": [
+                            order_allocation(
+                                a["source"], a["path"], a["product_ids"], a["allocated_qty"], a["total_cost"],
+                                graph_cache.node_types, graph_cache.transit_times
+                            )
+                            for a in allocations
+                        ],
+                        "unfilledQty": unfilled.get(wallet, {}).get(name, 0),
+                    }],
+                    "status": "proposed",
+                    "runId": run_id,
+                })
+        return documents
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if not await self.schedule_lease.acquire():
+                    # Another worker runs the schedule
+                    continue
+                report = await self.run()
+                print(f"Replenishment run {report['runId']}: {report['proposed_orders']} proposed orders "
+                      f"in {report['seconds']}s")
+            except HTTPException as e:
+                print(f"Replenishment run skipped: {e.detail}")
+            except Exception as e:
+                print(f"Replenishment run failed: {e}")
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+replenishment_planner = ReplenishmentPlanner()
@@ -0,0 +1,277 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from config.db import db
+
+collection = db.get_collection("unit_reservations")
+
+# How long an optimize result holds its units; 0 turns reservations off
+RESERVATION_TTL_SECONDS = float(os.getenv("RESERVATION_TTL_SECONDS", "300"))
+# Optimize attempts before giving up on units that other requests keep claiming
+RESERVATION_CLAIM_ATTEMPTS = int(os.getenv("RESERVATION_CLAIM_ATTEMPTS", "3"))
+DUPLICATE_KEY = 11000
+
+
+def optimize_result_unit_ids(result):
+    """Units of an optimize_supply_path result."""
+    return [pid for allocation in result.get("allocations") or [] for pid in allocation.get("product_ids") or []]
+
+
+def order_unit_ids(line_items):
+    """Units of lineItems[].allocations[] (AllocationsModel-shaped dicts)."""
+    return [
+        pid for item in line_items for allocation in item["allocations"]
+        for pid in allocation.get("productUnitIds") or []
+    ]
+
+
+class ReservationTable:
+    """
+    Short-lived holds on serialized product units, so concurrent optimize
+    calls don't hand out the same productUnitIds.
+
+    `unit_reservations` is the source of truth: one document per unit with
+    _id = productId, claimed atomically by an upsert that only matches a free
+    (expired) or own document. Documents carry expiresAt (TTL index) while they
+    are reservations; create_order converts them into allocation holds by
+    setting orderId and dropping expiresAt, and deleting or closing the order
+    releases them.
+
+    `units` mirrors every hold this process has made or run into, so the
+    optimizer skips held units without a round trip. Holds made by other
+    workers are learned when a claim hits them. Untracked stock (inventory
+    without unit IDs) can't be reserved.
+
+    On by default: /test-optimize, /test-optimize/batch (one reservation
+    per entry) and /test-optimize/order hold the units they allocate for
+    RESERVATION_TTL_SECONDS, unless called with reserve=false (a dry run).
+    RESERVATION_TTL_SECONDS=0 turns reservations off. Python callers of
+    optimize_supply_path / optimize_batch only reserve with reserve=True.
+    """
+
+    def __init__(self, ttl=RESERVATION_TTL_SECONDS):
+        self.ttl = ttl
+        self.units = {}           # productId -> (reservationId, expiresAt or None for orders)
+        self.by_reservation = {}  # reservationId -> {productId, ...}
+        self.claims = 0
+        self.conflicts = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    async def ensure_indexes(self):
+        await collection.create_index("expiresAt", expireAfterSeconds=0)
+        await collection.create_index("reservationId")
+        await collection.create_index("orderId", sparse=True)
+
+    def _remember(self, unit_id, reservation_id, expires_at):
+        if unit_id in self.units:
+            self._drop(unit_id)
+        self.units[unit_id] = (reservation_id, expires_at)
+        self.by_reservation.setdefault(reservation_id, set()).add(unit_id)
+
+    def _drop(self, unit_id):
+        reservation_id, _ = self.units.pop(unit_id)
+        units = self.by_reservation.get(reservation_id)
+        if units is not None:
+            units.discard(unit_id)
+            if not units:
+                del self.by_reservation[reservation_id]
+
+    def _forget(self, reservation_id):
+        # Units already converted into an order stay held
+        for unit_id in list(self.by_reservation.get(reservation_id, ())):
+            if self.units[unit_id][1] is not None:
+                self._drop(unit_id)
+
+    def held(self, unit_ids):
+        """The subset of unit_ids under a live hold (reservation or order)."""
+        if not self.enabled:
+            return set()
+        now = datetime.utcnow()
+        if isinstance(unit_ids, (set, dict)) and len(self.units) < len(unit_ids):
+            candidates = [pid for pid in self.units if pid in unit_ids]
+        else:
+            candidates = [pid for pid in unit_ids if pid in self.units]
+        out = set()
+        for pid in candidates:
+            expires_at = self.units[pid][1]
+            if expires_at is not None and expires_at <= now:
+                self._drop(pid)
+            else:
+                out.add(pid)
+        return out
+
+    async def _write(self, unit_ids, reservation_id, update):
+        """
+        Upserts each unit's document unless another live hold owns it.
+        Returns the unit IDs that were refused.
+        """
+        if not unit_ids:
+            return []
+        now = datetime.utcnow()
+        ops = [
+            UpdateOne(
+                {"_id": pid, "$or": [{"reservationId": reservation_id}, {"expiresAt": {"$lte": now}}]},
+                update, upsert=True
+            )
+            for pid in unit_ids
+        ]
+        try:
+            await collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error["code"] != DUPLICATE_KEY for error in errors):
+                raise
+            refused = [unit_ids[error["index"]] for error in errors]
+            await self._learn(refused, now)
+            return refused
+        return []
+
+    async def _learn(self, unit_ids, now):
+        # Re-check other workers' holds after one TTL at the latest
+        recheck_at = now + timedelta(seconds=self.ttl)
+        async for doc in collection.find({"_id": {"$in": unit_ids}}, {"reservationId": 1, "expiresAt": 1}):
+            expires_at = doc.get("expiresAt")
+            self._remember(doc["_id"], doc["reservationId"], min(expires_at or recheck_at, recheck_at))
+
+    async def claim(self, reservation_id, unit_ids):
+        """Reserves unit_ids for one TTL. Returns (refused unit IDs, expiresAt)."""
+        unit_ids = list(dict.fromkeys(unit_ids))
+        expires_at = datetime.utcnow() + timedelta(seconds=self.ttl)
+        refused = await self._write(
+            unit_ids, reservation_id,
+            {"$set": {"reservationId": reservation_id, "expiresAt": expires_at}}
+        )
+        self.claims += 1
+        self.conflicts += bool(refused)
+        refused_set = set(refused)
+        for pid in unit_ids:
+            if pid not in refused_set:
+                self._remember(pid, reservation_id, expires_at)
+        return refused, expires_at
+
+    def wanted(self, reserve):
+        """Whether a call reserves: as asked, or whenever reservations are on when it didn't say."""
+        return self.enabled if reserve is None else reserve
+
+    def require_enabled(self):
+        if not self.enabled:
+            raise HTTPException(
+                status_code=400,
+                detail="Unit reservations are off; set RESERVATION_TTL_SECONDS to turn them on"
+            )
+
+    async def reserve(self, plan, unit_ids):
+        """
+        Runs `plan` (an async callable returning a result) and reserves the
+        units unit_ids(result) names. When another request got to some of them
+        first, the partial claim is dropped and `plan` runs again, now skipping
+        those units. Returns (result, {"reservationId", "reservedUntil"} or None).
+        """
+        async def plan_one():
+            return [await plan()]
+
+        results, holds = await self.reserve_each(plan_one, unit_ids)
+        return results[0], holds[0]
+
+    async def reserve_each(self, plan, unit_ids):
+        """
+        Like reserve() for a `plan` that returns a list of results (a batch):
+        each result's units are claimed under a reservation of its own. If any
+        claim is refused every claim of the attempt is dropped and the whole
+        batch is planned again. Returns (results, [reservation or None per result]).
+        """
+        self.require_enabled()
+        for _ in range(RESERVATION_CLAIM_ATTEMPTS):
+            results = await plan()
+            holds, refused = [], False
+            for result in results:
+                ids = unit_ids(result)
+                if not ids:
+                    holds.append(None)
+                    continue
+                reservation_id = uuid.uuid4().hex
+                refused_ids, expires_at = await self.claim(reservation_id, ids)
+                holds.append({"reservationId": reservation_id, "reservedUntil": expires_at})
+                if refused_ids:
+                    refused = True
+                    break
+            if not refused:
+                return results, holds
+            for hold in holds:
+                if hold is not None:
+                    await self.release(hold["reservationId"])
+        raise HTTPException(
+            status_code=409,
+            detail="The units for this request are being reserved by concurrent requests, please retry"
+        )
+
+    async def release(self, reservation_id):
+        """Drops a reservation that was not turned into an order."""
+        self._forget(reservation_id)
+        result = await collection.delete_many({"reservationId": reservation_id, "orderId": {"$exists": False}})
+        return result.deleted_count
+
+    async def convert(self, reservation_id, order_id, unit_ids):
+        """
+        Turns the units of a new order into allocation holds that don't expire.
+        Units must be free or held by `reservation_id` (orders created without
+        one just take free units). Returns the refused unit IDs; if there are
+        any nothing is converted. Units of the reservation the order didn't
+        use are released.
+        """
+        if not self.enabled:
+            return []
+        unit_ids = list(dict.fromkeys(unit_ids))
+        holder = reservation_id or uuid.uuid4().hex
+        refused = await self._write(
+            unit_ids, holder,
+            {"$set": {"reservationId": holder, "orderId": order_id}, "$unset": {"expiresAt": ""}}
+        )
+        if refused:
+            # Back to a plain reservation, so the caller can still fix the order and retry
+            expires_at = datetime.utcnow() + timedelta(seconds=self.ttl)
+            await collection.update_many(
+                {"orderId": order_id},
+                {"$set": {"expiresAt": expires_at}, "$unset": {"orderId": ""}}
+            )
+            return refused
+
+        for pid in unit_ids:
+            self._remember(pid, holder, None)
+        if reservation_id:
+            await self.release(reservation_id)
+        return []
+
+    async def release_order(self, order_id):
+        """Frees the units held by an order (deleted, cancelled or completed)."""
+        return await self.release_orders([order_id])
+
+    async def release_orders(self, order_ids):
+        """Frees the units held by several orders in one find and one delete."""
+        if not self.enabled or not order_ids:
+            return 0
+        query = {"orderId": {"$in": list(order_ids)}}
+        unit_ids = [doc["_id"] async for doc in collection.find(query, {"_id": 1})]
+        for pid in unit_ids:
+            if pid in self.units:
+                self._drop(pid)
+        result = await collection.delete_many(query)
+        return result.deleted_count
+
+    def stats(self):
+        return {
+            "ttl_seconds": self.ttl,
+            "held_units": len(self.units),
+            "reservations": len(self.by_reservation),
+            "claims": self.claims,
+            "conflicts": self.conflicts,
+        }
+
+
+reservations = ReservationTable()
@@ -0,0 +1,134 @@
+import os
+import time
+from collections import OrderedDict
+from optimizer.graph_cache import graph_cache
+from optimizer.inventory_index import inventory_index
+
+# Max cached optimize results (0 disables the cache) and their lifetime in seconds.
+# The lifetime bounds how long a write made through another uvicorn worker can go unseen
+OPTIMIZER_CACHE_SIZE = int(os.getenv("OPTIMIZER_CACHE_SIZE", "1024"))
+OPTIMIZER_CACHE_TTL = float(os.getenv("OPTIMIZER_CACHE_TTL", "10"))
+
+
+class ResultCache:
+    """
+    LRU + TTL cache of optimize_supply_path results.
+
+    Keys are (product_name.lower(), required_qty, target_wallet, is_cold_storage, mode, k_routes).
+    Entries are dropped per product when its inventory or a unit's inTransit flag
+    changes, and all at once when a connection changes. A result computed while
+    its product was invalidated is not stored, so a slow optimize call can't put
+    a stale answer back. get() can also be given a check for answers that went
+    stale another way (e.g. units reserved since); those are dropped and count
+    as misses, so `hits` only counts results that were actually returned.
+
+    Invalidation is per process: it follows the writes this worker makes,
+    like the graph cache and inventory index the results are computed from.
+    Writes that reach Mongo through another worker (or directly) are only
+    picked up when an entry expires, so OPTIMIZER_CACHE_TTL is kept short.
+    """
+
+    def __init__(self, max_size=OPTIMIZER_CACHE_SIZE, ttl=OPTIMIZER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, result)
+        self.by_product = {}          # productName.lower() -> {key, ...}
+        self.generations = {}         # productName.lower() -> invalidation count
+        self.epoch = 0                # bumped by clear()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stale = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(product_name, required_qty, target_wallet, is_cold_storage, mode, k_routes=1):
+        return (product_name.lower(), required_qty, target_wallet, is_cold_storage, mode, k_routes)
+
+    def token(self, product_name):
+        """Taken before computing a result and handed back to put()."""
+        return self.epoch, self.generations.get(product_name.lower(), 0)
+
+    def get(self, key, usable=None):
+        """The cached result for key, or None. usable(result) returning False drops it."""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, result = entry
+        if expires_at < time.monotonic():
+            self._drop(key)
+            self.expired += 1
+            self.misses += 1
+            return None
+        if usable is not None and not usable(result):
+            self._drop(key)
+            self.stale += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, result, token):
+        if self.max_size <= 0 or token != self.token(key[0]):
+            return
+        if key in self.entries:
+            self.entries.move_to_end(key)
+        self.entries[key] = (time.monotonic() + self.ttl, result)
+        self.by_product.setdefault(key[0], set()).add(key)
+        while len(self.entries) > self.max_size:
+            self._drop(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _drop(self, key):
+        self.entries.pop(key, None)
+        keys = self.by_product.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.by_product[key[0]]
+
+    def invalidate_products(self, product_names):
+        """Drops every entry for the given product names (None drops everything)."""
+        if product_names is None:
+            self.clear()
+            return
+        for name in {name.lower() for name in product_names if name}:
+            self.generations[name] = self.generations.get(name, 0) + 1
+            keys = self.by_product.pop(name, ())
+            for key in keys:
+                self.entries.pop(key, None)
+            self.invalidations += len(keys)
+
+    def clear(self):
+        self.invalidations += len(self.entries)
+        self.entries.clear()
+        self.by_product.clear()
+        self.generations.clear()
+        self.epoch += 1
+
+    def on_graph_change(self, event, src, dst, before, after):
+        # Any route may have changed, so nothing cached is safe to keep
+        self.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expired": self.expired,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+result_cache = ResultCache()
+graph_cache.add_listener(result_cache.on_graph_change)
+inventory_index.add_listener(result_cache.invalidate_products)
@@ -0,0 +1,219 @@
+import os
+from collections import OrderedDict
+import numpy as np
+from optimizer.csr import dijkstra
+from optimizer.executor import graph_executor
+from optimizer.graph_cache import graph_cache
+
+# Shortest-path trees kept, one per (target, metric); 0 disables the table.
+# A row takes 8 bytes per node (80 KB at 10k nodes), so 512 rows stay near 40 MB.
+ROUTING_TABLE_ROWS = int(os.getenv("ROUTING_TABLE_ROWS", "512"))
+
+# metric -> return_time flag passed to dijkstra
+METRICS = {"cost": False, "time": True}
+
+
+def _compute_row(csr, connections_lookup, target, return_time, no_transit):
+    """Dijkstra tree rooted at `target` (runs on graph_executor). Returns (dist, next_hop)."""
+    result = dijkstra(csr, target, return_time, no_transit=no_transit)
+    return (
+        np.frombuffer(result.priority, dtype=np.float64).astype(np.float32),
+        np.frombuffer(result.pred, dtype=np.intc).astype(np.int32),
+    )
+
+
+def _edge_key(values, metric):
+    # Ordering Dijkstra uses for a metric: (primary weight, cost tie-break)
+    if values is None:
+        return None
+    cost, time = values
+    return (time, cost) if METRICS[metric] else (cost, cost)
+
+
+class TableRow:
+    """
+    One shortest-path tree: dist[i] is node i's distance to the root and
+    next_hop[i] its next node towards it (-1 at the root or when unreachable),
+    indexed like the CSR it was computed on.
+    """
+
+    __slots__ = ("nodes", "index", "dist", "next_hop")
+
+    def __init__(self, nodes, index, dist, next_hop):
+        self.nodes = nodes
+        self.index = index
+        self.dist = dist
+        self.next_hop = next_hop
+
+    def affected_by(self, src, dst, before, after, metric):
+        """True when the connection change (src, dst) may change this tree."""
+        u, v = self.index.get(src), self.index.get(dst)
+        if u is None and v is None:
+            return False
+        if u is None or v is None:
+            # A new node is reachable exactly when its neighbour is
+            return bool(np.isfinite(self.dist[v if u is None else u]))
+        old, new = _edge_key(before, metric), _edge_key(after, metric)
+        if old == new:
+            return False
+        if old is not None and (self.next_hop[u] == v or self.next_hop[v] == u):
+            # The tree routes over the edge (in either direction)
+            return True
+        if new is not None and (old is None or new < old):
+            # The new or cheaper edge could shorten a route
+            w = new[0]
+            du, dv = float(self.dist[u]), float(self.dist[v])
+            tolerance = 1e-5 * max(1.0, min(du, dv))
+            return (np.isfinite(du) and du + w <= dv + tolerance) or \
+                   (np.isfinite(dv) and dv + w <= du + tolerance)
+        return False
+
+
+class TableTree:
+    """
+    Shortest-path tree rooted at `target`, read from a routing table row.
+    Same interface as csr.SearchResult, so path_from_tree works on it.
+    """
+
+    def __init__(self, row, target, return_time, scale=1):
+        self.row = row
+        self.root = target
+        self.return_time = return_time
+        self.scale = scale
+
+    def with_scale(self, scale):
+        return TableTree(self.row, self.root, self.return_time, scale)
+
+    def reached(self, node):
+        i = self.row.index.get(node)
+        return i is not None and bool(np.isfinite(self.row.dist[i]))
+
+    def path_to_root(self, node):
+        next_hop, nodes = self.row.next_hop, self.row.nodes
+        i = self.row.index[node]
+        path = []
+        while i != -1:
+            path.append(nodes[i])
+            i = int(next_hop[i])
+        return path
+
+    def labels(self, node):
+        """Walks the route summing the edges Dijkstra would pick, so no per-pair cost is stored."""
+        csr = graph_cache.csr()
+        path = self.path_to_root(node)
+        total_cost = 0.0
+        total_time = 0.0
+        for a, b in zip(path, path[1:]):
+            ia, ib = csr.index[a], csr.index[b]
+            first, second = min(
+                (csr.times[e], csr.costs[e]) if self.return_time else (csr.costs[e], csr.times[e])
+                for e in range(csr.offsets[ia], csr.offsets[ia + 1]) if csr.targets[e] == ib
+            )
+            edge_time, edge_cost = (first, second) if self.return_time else (second, first)
+            total_cost += edge_cost
+            total_time += edge_time
+        priority = total_time if self.return_time else total_cost * self.scale
+        return total_cost * self.scale, priority
+
+
+class RoutingTable:
+    """
+    Shortest-path trees over the cached connection graph, one row per
+    (target, metric), built on first use and kept in an LRU of
+    ROUTING_TABLE_ROWS rows.
+
+    Only next hops and distances are stored (float32 + int32 per node); a
+    route's cost and time are summed along its edges on lookup. Memory is
+    rows x nodes x 8 bytes whatever the network size, instead of the
+    nodes^2 of a full all-pairs table, so it stays bounded at 10k+ nodes.
+
+    Rows are computed on graph_executor and, like every optimizer route, never
+    pass through a non-distributor (graph_cache.non_forwarding_wallets()). A
+    connection change drops only the rows whose tree used the edge, that the
+    new edge could improve, or that reach a node the connection brings in;
+    they are rebuilt on their next lookup. A change in which wallets forward
+    stock drops every row. A row computed while the graph changed is not
+    stored.
+    """
+
+    def __init__(self, max_rows=ROUTING_TABLE_ROWS):
+        self.max_rows = max_rows
+        self.rows = OrderedDict()  # (target, metric) -> TableRow
+        self.no_transit = frozenset()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def tree(self, target_wallet, return_time, scale=1):
+        """Returns a TableTree rooted at target_wallet from a cached row, or None."""
+        key = (target_wallet, "time" if return_time else "cost")
+        row = self.rows.get(key)
+        if row is None:
+            return None
+        self.rows.move_to_end(key)
+        return TableTree(row, target_wallet, return_time, scale)
+
+    async def load_tree(self, target_wallet, return_time, scale=1):
+        """Like tree(), computing and caching the row on a miss. None when the table is off."""
+        tree = self.tree(target_wallet, return_time, scale)
+        if tree is not None:
+            self.hits += 1
+            return tree
+        if self.max_rows <= 0:
+            return None
+        self.misses += 1
+        # graph_executor searches graph_cache.csr() as of this call
+        csr, version = graph_cache.csr(), graph_cache.version
+        dist, next_hop = await graph_executor.run(_compute_row, target_wallet, return_time, self.no_transit)
+        row = TableRow(csr.nodes, csr.index, dist, next_hop)
+        if graph_cache.version == version:
+            key = (target_wallet, "time" if return_time else "cost")
+            self.rows[key] = row
+            while len(self.rows) > self.max_rows:
+                self.rows.popitem(last=False)
+        return TableTree(row, target_wallet, return_time, scale)
+
+    def shortest_path(self, src, dst, return_time=True, scale=1):
+        """Table lookup with shortest_path's return shape; None if unreachable or not cached."""
+        tree = self.tree(dst, return_time, scale)
+        if tree is None or not tree.reached(src):
+            return None
+        cost, priority = tree.labels(src)
+        return tree.path_to_root(src), cost, priority
+
+    def on_graph_change(self, event, src, dst, before, after):
+        if event == "cold":
+            # Rows cover the full graph; cold-chain routing uses its own subgraph
+            return
+        no_transit = self.no_transit
+        if event == "reload":
+            no_transit = frozenset(graph_cache.non_forwarding_wallets())
+        else:
+            for wallet in (src, dst):
+                if (graph_cache.node_types.get(wallet, "distributor") != "distributor") != (wallet in no_transit):
+                    no_transit = no_transit ^ {wallet}
+        if event == "reload" or no_transit != self.no_transit:
+            self.no_transit = no_transit
+            self.invalidations += len(self.rows)
+            self.rows.clear()
+            return
+        for key, row in list(self.rows.items()):
+            if row.affected_by(src, dst, before, after, key[1]):
+                del self.rows[key]
+                self.invalidations += 1
+
+    def clear(self):
+        self.rows.clear()
+
+    def stats(self):
+        return {
+            "rows": len(self.rows),
+            "max_rows": self.max_rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+routing_table = RoutingTable()
+graph_cache.add_listener(routing_table.on_graph_change)
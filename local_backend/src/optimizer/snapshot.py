@@ -0,0 +1,387 @@
+"""
+Binary snapshot of the optimizer's network state, for fast worker startup.
+
+A snapshot holds the interned node table, the CSR edge arrays, every
+connection and the per-product stock of the inventory index. Workers map
+the file at startup instead of reading every connection, entity and
+inventory from Mongo. The CSR arrays are used in place, so all workers
+(and the optimizer's process pool) share one copy in the page cache. The
+rest is turned back into the caches' dicts. Writes made after the
+snapshot was taken are replayed from the `network_changes` log.
+
+Write or refresh a snapshot from Mongo (run from local_backend/src):
+    python -m optimizer.snapshot [--path network.snapshot]
+"""
+import argparse
+import asyncio
+import json
+import math
+import mmap
+import os
+import sys
+import time
+from array import array
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from config.db import db
+from optimizer.csr import CSRGraph
+from optimizer.graph_cache import graph_cache, CONNECTION_FIELDS, NODE_FIELDS
+from optimizer.inventory_index import inventory_index, INVENTORY_FIELDS
+
+# Snapshot file; empty turns snapshots (and the change log) off
+NETWORK_SNAPSHOT_PATH = os.getenv("NETWORK_SNAPSHOT_PATH", "")
+# Changes are kept this long; older snapshots are ignored and rebuilt from Mongo
+NETWORK_CHANGES_RETENTION_DAYS = float(os.getenv("NETWORK_CHANGES_RETENTION_DAYS", "7"))
+# Rewrite the snapshot at startup once this many changes had to be replayed on top of it
+NETWORK_SNAPSHOT_REWRITE_CHANGES = int(os.getenv("NETWORK_SNAPSHOT_REWRITE_CHANGES", "1000"))
+# Changes are replayed from this long before the snapshot was taken, to cover clock skew between workers
+CLOCK_SKEW_SECONDS = 60
+
+MAGIC = b"MCNETSNP"
+FORMAT_VERSION = 1
+PREAMBLE = len(MAGIC) + 8  # magic, format version, header length
+ENTITY_TYPES = ["", "manufacturer", "distributor", "retailer"]
+ENTITY_COLLECTIONS = {
+    "manufacturer": db.get_collection("manufacturers"),
+    "distributor": db.get_collection("distributors"),
+    "retailer": db.get_collection("retailers"),
+}
+connections = db.get_collection("connections")
+
+
+class NetworkChangeLog:
+    """
+    Keys of the connections and entities written since a point in time.
+    One document per key (upserted with the time of its last write), so the
+    log grows with the number of things changed, not the number of writes.
+    Only the key is logged: replaying re-reads the current document.
+    """
+
+    def __init__(self, enabled=bool(NETWORK_SNAPSHOT_PATH)):
+        self.collection = db.get_collection("network_changes")
+        self.enabled = enabled
+
+    async def ensure_indexes(self):
+        await self.collection.create_index(
+            "at", expireAfterSeconds=int(NETWORK_CHANGES_RETENTION_DAYS * 86400)
+        )
+
+    async def record(self, connections=(), wallets=()):
+        """connections: [(fromWalletAddress, toWalletAddress)], wallets: entity wallets."""
+        if not self.enabled:
+            return
+        now = datetime.utcnow()
+        ops = [
+            UpdateOne(
+                {"_id": f"connection:{src}|{dst}"},
+                {"$set": {"kind": "connection", "from": src, "to": dst, "at": now}},
+                upsert=True
+            )
+            for src, dst in connections
+        ] + [
+            UpdateOne(
+                {"_id": f"node:{wallet}"},
+                {"$set": {"kind": "node", "wallet": wallet, "at": now}},
+                upsert=True
+            )
+            for wallet in wallets if wallet
+        ]
+        if ops:
+            await self.collection.bulk_write(ops, ordered=False)
+
+    async def since(self, at):
+        return await self.collection.find({"at": {"$gte": at}}).to_list(length=None)
+
+
+network_changes = NetworkChangeLog()
+
+
+def _aligned(size):
+    return -(-size // 8) * 8
+
+
+def _strings(values):
+    return "\0".join(values).encode()
+
+
+def _read_strings(buffer):
+    data = bytes(buffer).decode()
+    return data.split("\0") if data else []
+
+
+def _coordinate(coordinates, wallet, i):
+    coords = coordinates.get(wallet)
+    return coords[i] if coords is not None else math.nan
+
+
+def _maybe_int(value):
+    return int(value) if value.is_integer() else value
+
+
+def write_snapshot(path, created_at):
+    """
+    Writes the current graph cache and inventory index to `path` (atomically,
+    through a temporary file). `created_at` must be taken before the caches
+    were loaded from Mongo: changes logged from then on are replayed on load.
+    """
+    csr = graph_cache.csr()
+    nodes = list(csr.nodes)
+    index = dict(csr.index)
+
+    def intern(wallet):
+        if wallet not in index:
+            index[wallet] = len(nodes)
+            nodes.append(wallet)
+        return index[wallet]
+
+    for wallet in (*graph_cache.coordinates, *graph_cache.cold_nodes, *graph_cache.node_types):
+        intern(wallet)
+    conn_keys = list(graph_cache.edges)
+    conn_from = array('i', (intern(src) for src, _ in conn_keys))
+    conn_to = array('i', (intern(dst) for _, dst in conn_keys))
+
+    products = sorted(inventory_index.products)
+    holder_product, holder_wallet, holder_type = array('i'), array('i'), array('B')
+    holder_qty, holder_untracked, unit_offsets = array('d'), array('d'), array('i', [0])
+    unit_ids = []
+    for p, name in enumerate(products):
+        for wallet, entry in inventory_index.products[name].items():
+            holder_product.append(p)
+            holder_wallet.append(intern(wallet))
+            holder_type.append(ENTITY_TYPES.index(entry["entityType"]))
+            holder_qty.append(entry["qty"])
+            holder_untracked.append(entry["untrackedQty"])
+            unit_ids.extend(entry["productIds"])
+            unit_offsets.append(len(unit_ids))
+
+    sections = {
+        "nodes": _strings(nodes),
+        "node_lng": array('d', (_coordinate(graph_cache.coordinates, w, 0) for w in nodes)),
+        "node_lat": array('d', (_coordinate(graph_cache.coordinates, w, 1) for w in nodes)),
+        "node_cold": array('B', (w in graph_cache.cold_nodes for w in nodes)),
+        "node_type": array('B', (ENTITY_TYPES.index(graph_cache.node_types.get(w, "")) for w in nodes)),
+        "csr_offsets": array('i', csr.offsets),
+        "csr_targets": array('i', csr.targets),
+        "csr_costs": array('d', csr.costs),
+        "csr_times": array('d', csr.times),
+        "csr_lat": array('d', csr.lat),
+        "csr_lng": array('d', csr.lng),
+        "conn_from": conn_from,
+        "conn_to": conn_to,
+        "conn_cost": array('d', (graph_cache.edges[key][0] for key in conn_keys)),
+        "conn_time": array('d', (graph_cache.edges[key][1] for key in conn_keys)),
+        "conn_transit": array('d', (graph_cache.transit_times[key] for key in conn_keys)),
+        "conn_cold": array('B', (key in graph_cache.cold_edges for key in conn_keys)),
+        "products": _strings(products),
+        "holder_product": holder_product,
+        "holder_wallet": holder_wallet,
+        "holder_type": holder_type,
+        "holder_qty": holder_qty,
+        "holder_untracked": holder_untracked,
+        "unit_offsets": unit_offsets,
+        "unit_ids": _strings(unit_ids),
+    }
+
+    # Header: JSON with every section's (offset, typecode, count); offsets count from
+    # the end of the header, and every section starts 8-byte aligned
+    layout = {}
+    offset = 0
+    for name, data in sections.items():
+        typecode = data.typecode if isinstance(data, array) else 'B'
+        layout[name] = (offset, typecode, len(data))
+        offset += _aligned(len(data) * array(typecode).itemsize)
+    header = {
+        "format": FORMAT_VERSION,
+        "createdAt": created_at.isoformat(),
+        "byteorder": sys.byteorder,
+        "csr_nodes": len(csr),
+        "sections": layout,
+    }
+    header_bytes = json.dumps(header).encode()
+    header_bytes = header_bytes.ljust(_aligned(PREAMBLE + len(header_bytes)) - PREAMBLE)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(array('I', [FORMAT_VERSION, len(header_bytes)]).tobytes())
+        f.write(header_bytes)
+        for name, data in sections.items():
+            raw = data.tobytes() if isinstance(data, array) else data
+            f.write(raw.ljust(_aligned(len(raw)), b"\0"))
+    os.replace(tmp_path, path)
+    return header
+
+
+def read_snapshot(path):
+    """
+    Maps `path` and loads it into the graph cache and the inventory index.
+    Returns the header, or None when the file is missing, from another
+    format version or byte order, or older than the change log retention.
+    """
+    try:
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            buffer = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    except (FileNotFoundError, ValueError):
+        return None
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        return None
+    format_version, header_length = array('I', bytes(buffer[len(MAGIC):PREAMBLE]))
+    if format_version != FORMAT_VERSION:
+        return None
+    header = json.loads(bytes(buffer[PREAMBLE:PREAMBLE + header_length]))
+    created_at = datetime.fromisoformat(header["createdAt"])
+    if header["byteorder"] != sys.byteorder or \
+            created_at < datetime.utcnow() - timedelta(days=NETWORK_CHANGES_RETENTION_DAYS):
+        return None
+
+    base = PREAMBLE + header_length
+    layout = {name: (base + offset, typecode, count) for name, (offset, typecode, count) in header["sections"].items()}
+
+    def section(name):
+        offset, typecode, count = layout[name]
+        return buffer[offset:offset + count * array(typecode).itemsize].cast(typecode)
+
+    nodes = _read_strings(section("nodes"))
+    n = header["csr_nodes"]
+    csr = CSRGraph.from_mapped_file(
+        path, nodes[:n],
+        {name: layout["csr_" + name] for name in ("offsets", "targets", "costs", "times", "lat", "lng")},
+        (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    )
+
+    adjacency = {}
+    offsets, targets, costs, times = csr.offsets, csr.targets, csr.costs, csr.times
+    for u in range(n):
+        adjacency[nodes[u]] = [
+            (nodes[targets[e]], costs[e], times[e]) for e in range(offsets[u], offsets[u + 1])
+        ]
+
+    edges, transit_times, cold_edges = {}, {}, set()
+    conn_cost, conn_time, conn_transit = section("conn_cost"), section("conn_time"), section("conn_transit")
+    conn_cold = section("conn_cold")
+    for i, (u, v) in enumerate(zip(section("conn_from"), section("conn_to"))):
+        key = (nodes[u], nodes[v])
+        edges[key] = (conn_cost[i], conn_time[i])
+        transit_times[key] = _maybe_int(conn_transit[i])
+        if conn_cold[i]:
+            cold_edges.add(key)
+
+    coordinates, cold_nodes, node_types = {}, set(), {}
+    node_lng, node_lat = section("node_lng"), section("node_lat")
+    node_cold, node_type = section("node_cold"), section("node_type")
+    for i, wallet in enumerate(nodes):
+        if not math.isnan(node_lng[i]):
+            coordinates[wallet] = (node_lng[i], node_lat[i])
+        if node_cold[i]:
+            cold_nodes.add(wallet)
+        if node_type[i]:
+            node_types[wallet] = ENTITY_TYPES[node_type[i]]
+
+    graph_cache.load_state(
+        adjacency, edges, transit_times, cold_edges, node_types, coordinates, cold_nodes, csr=csr
+    )
+
+    products = {}
+    product_names = _read_strings(section("products"))
+    unit_ids = _read_strings(section("unit_ids"))
+    unit_offsets = section("unit_offsets")
+    holder_qty, holder_untracked = section("holder_qty"), section("holder_untracked")
+    holder_type = section("holder_type")
+    for i, (p, w) in enumerate(zip(section("holder_product"), section("holder_wallet"))):
+        products.setdefault(product_names[p], {})[nodes[w]] = {
+            "entityType": ENTITY_TYPES[holder_type[i]],
+            "qty": _maybe_int(holder_qty[i]),
+            "productIds": unit_ids[unit_offsets[i]:unit_offsets[i + 1]],
+            "untrackedQty": _maybe_int(holder_untracked[i]),
+        }
+    inventory_index.load_entries(products)
+    return header
+
+
+async def apply_changes(since):
+    """Re-reads every connection and entity logged as changed since `since` into the caches."""
+    changes = await network_changes.since(since - timedelta(seconds=CLOCK_SKEW_SECONDS))
+    conn_keys = [(c["from"], c["to"]) for c in changes if c["kind"] == "connection"]
+    wallets = [c["wallet"] for c in changes if c["kind"] == "node"]
+
+    if conn_keys:
+        current = {}
+        query = {"$or": [{"fromWalletAddress": src, "toWalletAddress": dst} for src, dst in conn_keys]}
+        async for doc in connections.find(query, CONNECTION_FIELDS):
+            current[(doc["fromWalletAddress"], doc["toWalletAddress"])] = doc
+        for key in conn_keys:
+            if key in current:
+                # Unchanged connections keep the mapped CSR in use
+                if not graph_cache.has_connection(current[key]):
+                    graph_cache.upsert_connection(current[key])
+            else:
+                graph_cache.remove_connection(*key)
+
+    if wallets:
+        found = set()
+        for entity_type, entity_collection in ENTITY_COLLECTIONS.items():
+            fields = {**NODE_FIELDS, **INVENTORY_FIELDS}
+            async for doc in entity_collection.find({"walletAddress": {"$in": wallets}}, fields):
+                wallet = doc["walletAddress"]
+                found.add(wallet)
+                graph_cache.set_location(wallet, doc.get("geo"))
+                graph_cache.set_cold_chain(wallet, doc.get("coldChain"))
+                if entity_type != "manufacturer":
+                    inventory_index.set_inventory(wallet, entity_type, doc.get("inventory"))
+        for wallet in set(wallets) - found:
+            graph_cache.remove_node(wallet)
+            inventory_index.remove_wallet(wallet)
+    return len(changes)
+
+
+async def load_network(path=NETWORK_SNAPSHOT_PATH):
+    """
+    Loads the graph cache and the inventory index: from the snapshot at
+    `path` plus the changes logged since, or from Mongo when there is no
+    usable snapshot (then a snapshot is written for the next start).
+    Returns a small report of what was done.
+    """
+    started = time.perf_counter()
+    if path:
+        header = read_snapshot(path)
+        if header is not None:
+            watermark = datetime.utcnow()
+            replayed = await apply_changes(datetime.fromisoformat(header["createdAt"]))
+            report = {"source": "snapshot", "changes_replayed": replayed}
+            if replayed >= NETWORK_SNAPSHOT_REWRITE_CHANGES:
+                await asyncio.to_thread(write_snapshot, path, watermark)
+                report["rewritten"] = True
+            report["seconds"] = round(time.perf_counter() - started, 3)
+            return report
+
+    watermark = datetime.utcnow()
+    await graph_cache.load()
+    await inventory_index.load()
+    report = {"source": "mongo"}
+    if path:
+        await asyncio.to_thread(write_snapshot, path, watermark)
+        report["rewritten"] = True
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=NETWORK_SNAPSHOT_PATH or "network.snapshot")
+    args = parser.parse_args()
+    watermark = datetime.utcnow()
+    await graph_cache.load()
+    await inventory_index.load()
+    header = write_snapshot(args.path, watermark)
+    await network_changes.ensure_indexes()
+    print(json.dumps({
+        "path": args.path,
+        "createdAt": header["createdAt"],
+        "bytes": os.path.getsize(args.path),
+        "sections": {name: count for name, (_, _, count) in header["sections"].items()},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pymongo import monitoring
+
+logger = logging.getLogger("optimizer")
+
+# Traces slower than this are logged at WARNING, the rest at DEBUG
+OPTIMIZER_SLOW_MS = float(os.getenv("OPTIMIZER_SLOW_MS", "1000"))
+
+# Trace of the optimize call running in the current task (motor copies it into its worker threads)
+_current_trace = ContextVar("optimizer_trace", default=None)
+
+# Callables taking a finished trace dict, e.g. to feed a metrics backend
+metrics_hooks = []
+
+
+def add_metrics_hook(hook):
+    metrics_hooks.append(hook)
+
+
+class OptimizerTrace:
+    """
+    Wall time per phase, Mongo round trips, search statistics and candidate
+    counts for one optimize call. Use as a context manager: while it is open,
+    every Mongo command issued from the same task is counted against it, and
+    on exit the trace is logged and handed to the metrics hooks.
+    """
+
+    def __init__(self, **request):
+        self.request = request
+        self.phases = {}        # phase name -> ms
+        self.mongo = {}         # command name -> round trips
+        self.searches = []      # one dict per graph search
+        self.counts = {}
+        self.total_ms = None
+        self._started = None
+        self._token = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        self._token = _current_trace.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _current_trace.reset(self._token)
+        self.total_ms = (time.perf_counter() - self._started) * 1000
+        self.emit()
+        return False
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def count(self, name, value=1):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def search(self, stats):
+        if stats:
+            self.searches.append(stats)
+
+    def as_dict(self):
+        return {
+            **self.request,
+            "total_ms": round(self.total_ms, 3) if self.total_ms is not None else None,
+            "phases_ms": {name: round(ms, 3) for name, ms in self.phases.items()},
+            "mongo_round_trips": sum(self.mongo.values()),
+            "mongo_commands": dict(self.mongo),
+            "searches": self.searches,
+            "counts": dict(self.counts),
+        }
+
+    def emit(self):
+        report = self.as_dict()
+        level = logging.WARNING if self.total_ms >= OPTIMIZER_SLOW_MS else logging.DEBUG
+        if logger.isEnabledFor(level):
+            logger.log(level, "optimizer trace %s", json.dumps(report, default=str),
+                       extra={"optimizer_trace": report})
+        for hook in metrics_hooks:
+            try:
+                hook(report)
+            except Exception:
+                logger.exception("Optimizer metrics hook failed")
+
+
+class MongoCommandCounter(monitoring.CommandListener):
+    """Counts Mongo commands (one per round trip) against the current OptimizerTrace."""
+
+    def started(self, event):
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.mongo[event.command_name] = trace.mongo.get(event.command_name, 0) + 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+mongo_command_counter = MongoCommandCounter()
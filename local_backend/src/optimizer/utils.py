@@ -1,3 +1,8 @@
+from optimizer.csr import CSRGraph, dijkstra
+from optimizer.astar import astar as astar_search
+from optimizer.ksp import k_shortest_paths as yen_k_shortest_paths
+
+
 def build_weighted_graph(connections,product_weight, required_qty):
     """
     connections: list of dicts, each with 'fromWalletAddress', 'toWalletAddress', 'costPerUnit', 'transitTimeDays'
@@ -15,28 +20,85 @@ def build_weighted_graph(connections,product_weight, required_qty):
         graph.setdefault(dst, []).append((src, cost, time))
     return graph
 
-import heapq
 
-def shortest_path(graph, src, dst, return_time=True):
-    print("hello1", src, dst)
+def to_csr(graph):
+    """
+    Returns (csr, scale) for a graph. Cached graph views hand out their shared
+    CSR arrays; plain adjacency dicts are converted on the fly.
+    """
+    if hasattr(graph, "csr"):
+        return graph.csr(), graph.scale
+    return CSRGraph.from_adjacency(graph), 1
+
+
+def shortest_path(graph, src, dst, return_time=True, astar=False):
     """
-    Dijkstra's algorithm.
+    Dijkstra's algorithm, or A* guided by node coordinates when astar=True.
     If return_time=True, optimize for time, else for cost.
-    Returns: (path, total_cost, total_time)
-    """
-    queue = [(0, 0, src, [])]  # (priority, cost, node, path)
-    visited = set()
-    while queue:
-        priority, cost, node, path = heapq.heappop(queue)
-        if node in visited:
-            continue
-        path = path + [node]
-        if node == dst:
-            return path, cost, priority
-        visited.add(node)
-        for neighbor, edge_cost, edge_time in graph.get(node, []):
-            if neighbor not in visited:
-                next_priority = priority + (edge_time if return_time else edge_cost)
-                next_cost = cost + edge_cost
-                heapq.heappush(queue, (next_priority, next_cost, neighbor, path))
-    return
\ No newline at end of file
+    Returns: (path, total_cost, total_priority), or None if dst is unreachable
+    """
+    if src == dst:
+        return [src], 0, 0
+    csr, scale = to_csr(graph)
+    if src not in csr.index or dst not in csr.index:
+        return None
+    if astar:
+        result = astar_search(csr, src, dst, return_time, scale)
+    else:
+        result = dijkstra(csr, src, return_time, scale, target=dst)
+    if not result.reached(dst):
+        return None
+    path = result.path_to_root(dst)
+    path.reverse()
+    cost, priority = result.labels(dst)
+    return path, cost, priority
+
+
+def reverse_graph(graph):
+    """
+    Returns the graph with every edge flipped, so a search rooted at a target
+    follows edges backwards. Cached views provide their own reversed().
+    """
+    if hasattr(graph, "reversed"):
+        return graph.reversed()
+    reversed_graph = {}
+    for node, edges in graph.items():
+        for neighbor, edge_cost, edge_time in edges:
+            reversed_graph.setdefault(neighbor, []).append((node, edge_cost, edge_time))
+    return reversed_graph
+
+
+def shortest_path_tree(graph, root, return_time=True):
+    """
+    Single Dijkstra rooted at `root`.
+    Run over reverse_graph(graph) it yields, for every node, the best route *to* root.
+    Returns a csr.SearchResult; read routes with path_from_tree.
+    """
+    csr, scale = to_csr(graph)
+    return dijkstra(csr, root, return_time, scale)
+
+
+def path_from_tree(tree, src):
+    """
+    Reads the route from `src` to the tree's root.
+    Returns: (path, total_cost, total_priority) like shortest_path, or None if unreachable.
+    """
+    if not tree.reached(src):
+        return None
+    cost, priority = tree.labels(src)
+    return tree.path_to_root(src), cost, priority
+
+
+def k_shortest_paths(graph, src, dst, k, return_time=True, tree=None):
+    """
+    Up to k loopless routes from src to dst, best first (Yen's algorithm).
+    Pass the shortest_path_tree already computed for dst as `tree` to reuse it.
+    Returns: [(path, total_cost, total_priority), ...] like shortest_path.
+    """
+    if src == dst:
+        return [([src], 0, 0)] if k > 0 else []
+    if tree is None:
+        tree = shortest_path_tree(reverse_graph(graph), dst, return_time)
+    # Spur searches follow the forward edges; the reverse tree only supplies distances to dst
+    csr, _ = to_csr(graph)
+    return yen_k_shortest_paths(tree, src, k, csr)
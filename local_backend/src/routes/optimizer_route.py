@@ -1,7 +1,14 @@
 # filepath: c:\Users\glaks\Desktop\Hackathon\PROJECT2\MediChain\local_backend\src\routes\optimizer_route.py
 
 from fastapi import APIRouter, Query
+from typing import List, Literal, Optional
+from models.optimizer import OptimizeRequest, OrderOptimizeRequest
 from optimizer.algorithm import optimize_supply_path
+from optimizer.batch import optimize_batch
+from optimizer.order import optimize_order
+from optimizer.replenishment import replenishment_planner
+from optimizer.result_cache import result_cache
+from optimizer.reservations import reservations
 
 router = APIRouter()
 
@@ -10,12 +17,77 @@ async def test_optimize(
     product_name: str = Query("paracetamol"),  # exact name from your data
     required_qty: int = Query(10),                   # choose a test quantity
     target_wallet: str = Query("0xR1"),              # valid wallet from your retailers
-    is_cold_storage: bool = Query(False)             # test with normal first
+    is_cold_storage: bool = Query(False),            # test with normal first
+    mode: Literal["greedy", "mincost", "pareto", "astar"] = Query("greedy"),  # allocation strategy (pareto: cost/time frontier per source)
+    k_routes: int = Query(1, ge=1, le=10),  # routes per allocation; extras go in alternative_paths
+    explain: bool = Query(False),  # add per-phase timings, Mongo round trips and search stats
+    reserve: Optional[bool] = Query(None)  # hold the allocated units for create_order; false for a dry run
 ):
     result = await optimize_supply_path(
         product_name=product_name,
         required_qty=required_qty,
         target_wallet=target_wallet,
-        is_cold_storage=is_cold_storage
+        is_cold_storage=is_cold_storage,
+        mode=mode,
+        k_routes=k_routes,
+        explain=explain,
+        reserve=reservations.wanted(reserve)
     )
     return result
+
+
+
+@router.post("/test-optimize/batch")
+async def test_optimize_batch(requests: List[OptimizeRequest], reserve: Optional[bool] = Query(None)):
+    """
+    Plans many optimize requests against one snapshot of the network.
+    Stock allocated to an earlier entry is not offered to later ones.
+    Returns one result per entry, in order; unless reserve=false, each
+    entry's units are held under its own reservationId.
+    """
+    return await optimize_batch(requests, reserve=reservations.wanted(reserve))
+
+
+@router.post("/test-optimize/order")
+async def test_optimize_order(request: OrderOptimizeRequest):
+    """
+    Plans all line items of an order (OrderModel-shaped body) in one pass,
+    preferring sources that can fill several items. Each line item's
+    allocations can be written to lineItems[].allocations as returned.
+    The units are held for create_order unless the body has "reserve": false.
+    """
+    return await optimize_order(request)
+
+
+@router.post("/test-optimize/replenishment")
+async def run_replenishment():
+    """
+    Runs the reorder-level replenishment planner now and returns its report
+    (counts, seconds, throughput). Proposals go to the proposed_orders collection.
+    409 while another run (from any worker) is in progress.
+    """
+    return await replenishment_planner.run()
+
+
+@router.get("/test-optimize/replenishment")
+async def last_replenishment():
+    """Report of the last replenishment run (None before the first one)."""
+    return replenishment_planner.last_run
+
+
+@router.delete("/test-optimize/reservations/{reservation_id}")
+async def release_reservation(reservation_id: str):
+    """Gives back the units of an optimize result that won't become an order."""
+    return {"released": await reservations.release(reservation_id)}
+
+
+@router.get("/test-optimize/reservations")
+async def reservation_stats():
+    """Units held in this worker's reservation table and claim/conflict counters."""
+    return reservations.stats()
+
+
+@router.get("/test-optimize/cache-stats")
+async def test_optimize_cache_stats():
+    """Hit/miss/eviction counters of the /test-optimize result cache."""
+    return result_cache.stats()
@@ -0,0 +1,64 @@
+import asyncio
+import os
+from pymongo import ReturnDocument
+from config.db import db
+
+counters = db.get_collection("counters")
+
+# Digits after the prefix. Zero padding keeps string order equal to creation order
+# (O0000099999 < O0000100000), and the width keeps new IDs distinct from the old
+# random 4-digit ones (O1234)
+ID_WIDTH = 10
+# IDs each worker takes from the counter at a time. 1 keeps IDs in creation order across
+# workers; larger blocks save round trips but leave gaps when a worker restarts
+ID_BLOCK_SIZE = int(os.getenv("ID_BLOCK_SIZE", "1"))
+
+
+class IdService:
+    """
+    Sequential IDs per prefix ("O", "ship_", "ret_", ...), zero-padded to
+    ID_WIDTH digits, e.g. O0000000001, O0000000002.
+
+    Backed by one atomic $inc per prefix on the `counters` collection, so an
+    ID never needs a read to check for collisions. IDs are unique across
+    workers and, with ID_BLOCK_SIZE = 1, sort (as strings) by creation
+    order. Old random IDs have no order and sort before or after new ones.
+    """
+
+    def __init__(self, block_size=ID_BLOCK_SIZE):
+        self.block_size = max(1, block_size)
+        self.blocks = {}  # prefix -> [next number, end (exclusive)]
+        self._locks = {}
+
+    async def _reserve(self, prefix, count):
+        """Takes `count` numbers from the shared counter; returns the first one."""
+        doc = await counters.find_one_and_update(
+            {"_id": prefix},
+            {"$inc": {"seq": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc["seq"] - count + 1
+
+    async def allocate(self, prefix, count):
+        """`count` new IDs for `prefix`, e.g. for a bulk insert (at most one round trip)."""
+        lock = self._locks.setdefault(prefix, asyncio.Lock())
+        async with lock:
+            block = self.blocks.get(prefix, [0, 0])
+            take = min(count, block[1] - block[0])
+            numbers = list(range(block[0], block[0] + take))
+            block[0] += take
+            missing = count - len(numbers)
+            if missing:
+                size = max(missing, self.block_size)
+                start = await self._reserve(prefix, size)
+                numbers.extend(range(start, start + missing))
+                block = [start + missing, start + size]
+            self.blocks[prefix] = block
+        return [f"{prefix}{number:0{ID_WIDTH}d}" for number in numbers]
+
+    async def next(self, prefix):
+        return (await self.allocate(prefix, 1))[0]
+
+
+id_service = IdService()
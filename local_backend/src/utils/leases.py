@@ -0,0 +1,62 @@
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from config.db import db
+
+collection = db.get_collection("leases")
+
+
+class Lease:
+    """
+    Cross-worker lock on one `leases` document (_id = name).
+
+    acquire() takes the document when it is free, expired or already ours,
+    through one upsert that only matches those cases. When another worker
+    holds a live lease, the upsert collides on _id and acquire() returns
+    False. Leases expire after `ttl` seconds, so a worker that dies
+    while holding one blocks the others for at most that long.
+    """
+
+    def __init__(self, name, ttl):
+        self.name = name
+        self.ttl = ttl
+        self.holder = uuid.uuid4().hex
+
+    async def acquire(self):
+        """Takes or renews the lease for `ttl` seconds. Returns False when another worker holds it."""
+        now = datetime.utcnow()
+        try:
+            await collection.find_one_and_update(
+                {"_id": self.name, "$or": [{"holder": self.holder}, {"expiresAt": {"$lte": now}}]},
+                {"$set": {"holder": self.holder, "expiresAt": now + timedelta(seconds=self.ttl)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def release(self):
+        await collection.delete_one({"_id": self.name, "holder": self.holder})
+
+    async def _renew(self):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            await self.acquire()
+
+    @asynccontextmanager
+    async def hold(self):
+        """
+        Yields whether the lease was acquired; while it is held it is renewed
+        in the background, and it is released on exit.
+        """
+        if not await self.acquire():
+            yield False
+            return
+        renewal = asyncio.create_task(self._renew())
+        try:
+            yield True
+        finally:
+            renewal.cancel()
+            await self.release()
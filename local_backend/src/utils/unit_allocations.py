@@ -0,0 +1,66 @@
+from pymongo import ReplaceOne
+from config.db import db
+
+collection = db.get_collection("unit_allocations")
+orders_collection = db.get_collection("orders")
+
+
+def allocation_entries(order):
+    """unit_allocations documents for every productUnitId in an order's allocations."""
+    return [
+        {"_id": pid, "orderId": order["orderId"], "order": order["_id"], "lineItem": i, "allocation": j}
+        for i, line_item in enumerate(order.get("lineItems") or [])
+        for j, allocation in enumerate(line_item.get("allocations") or [])
+        for pid in allocation.get("productUnitIds") or []
+    ]
+
+
+class UnitAllocationIndex:
+    """
+    Reverse index productUnitId -> (orderId, lineItem index, allocation index).
+
+    One document per unit with _id = productUnitId, so finding the allocation
+    of a scanned unit is a point read on the _id index instead of a query on
+    the multikey lineItems.allocations.productUnitIds path. Rewritten for an
+    order whenever its allocations are written (create_order, update_order
+    with lineItems, add_path_to_order) and dropped with the order. Its
+    orderId index is in config/indexes.py.
+    """
+
+    async def index_order(self, order):
+        """Points the units of `order` (an orders document) at their current allocations."""
+        entries = allocation_entries(order)
+        if entries:
+            await collection.bulk_write([ReplaceOne({"_id": e["_id"]}, e, upsert=True) for e in entries], ordered=False)
+        # Units no longer allocated in this order
+        await collection.delete_many({"orderId": order["orderId"], "_id": {"$nin": [e["_id"] for e in entries]}})
+        return len(entries)
+
+    async def remove_order(self, order_id):
+        result = await collection.delete_many({"orderId": order_id})
+        return result.deleted_count
+
+    async def lookup(self, unit_ids):
+        """{productUnitId: entry} for the allocated ones among unit_ids, in one $in read."""
+        unique_ids = list(dict.fromkeys(unit_ids))
+        return {doc["_id"]: doc async for doc in collection.find({"_id": {"$in": unique_ids}})}
+
+    async def rebuild(self):
+        """Re-indexes every order; used to backfill orders created before the index existed."""
+        await collection.delete_many({})
+        count = 0
+        async for order in orders_collection.find({}, {"orderId": 1, "lineItems.allocations.productUnitIds": 1}):
+            entries = allocation_entries(order)
+            if entries:
+                await collection.bulk_write([ReplaceOne({"_id": e["_id"]}, e, upsert=True) for e in entries], ordered=False)
+                count += len(entries)
+        return count
+
+    async def ensure_populated(self):
+        """Backfills the index on first start against an existing orders collection."""
+        if await collection.estimated_document_count() == 0 and await orders_collection.estimated_document_count() > 0:
+            return await self.rebuild()
+        return None
+
+
+unit_allocations = UnitAllocationIndex()
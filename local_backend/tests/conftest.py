@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The app imports modules relative to src (run from local_backend/src)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+# config.db builds a (lazy) client at import time; tests never reach a server
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_DB", "medichain_test")
+# Plan on the event loop; test_executor builds its own process and thread pools
+os.environ.setdefault("OPTIMIZER_EXECUTOR", "inline")
@@ -0,0 +1,65 @@
+import math
+import random
+
+import pytest
+
+from optimizer.astar import AStarRoutes, astar, multi_goal_astar
+from optimizer.csr import CSRGraph, dijkstra
+
+
+def geo_network(seed, nodes=400, degree=3):
+    """Nodes scattered over a region, each linked to its nearest neighbours at cost ~ distance."""
+    rng = random.Random(seed)
+    coordinates = {f"0xN{i}": (rng.uniform(0, 10), rng.uniform(40, 50)) for i in range(nodes)}
+    adjacency = {}
+    for node, (lng, lat) in coordinates.items():
+        nearest = sorted(coordinates, key=lambda other: math.dist(coordinates[other], (lng, lat)))[1:degree + 1]
+        for other in nearest:
+            km = math.dist(coordinates[other], (lng, lat)) * 100
+            cost, time = round(km * rng.uniform(1, 2), 2), round(km * rng.uniform(1, 3) / 500, 2)
+            adjacency.setdefault(node, []).append((other, cost, time))
+            adjacency.setdefault(other, []).append((node, cost, time))
+    return CSRGraph.from_adjacency(adjacency, coordinates=coordinates)
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("return_time", [False, True])
+def test_multi_goal_search_matches_dijkstra_and_settles_fewer_nodes(seed, return_time):
+    csr = geo_network(seed)
+    rng = random.Random(seed)
+    target = "0xN0"
+    sources = rng.sample(csr.nodes[1:], 5)
+
+    tree = dijkstra(csr, target, return_time)
+    routes = AStarRoutes(csr, target, sources, return_time)
+    for source in sources:
+        assert routes.reached(source)
+        assert routes.labels(source) == pytest.approx(tree.labels(source))
+
+    # Dijkstra has to settle every node closer than the farthest source
+    farthest = max(tree.priority[csr.index[source]] for source in sources)
+    dijkstra_settled = sum(1 for p in tree.priority if p <= farthest)
+    per_source = sum(astar(csr, target, source, return_time).settled for source in sources)
+    assert routes.settled <= dijkstra_settled
+    assert routes.settled < per_source
+
+
+def test_unreachable_goals_do_not_hide_reachable_ones():
+    csr = CSRGraph.from_adjacency({
+        "0xA": [("0xB", 1, 1)], "0xB": [("0xA", 1, 1)],
+        "0xC": [("0xD", 1, 1)], "0xD": [("0xC", 1, 1)],
+    })
+    search = multi_goal_astar(csr, "0xA", ["0xB", "0xD", "0xMissing"])
+    assert search.reached("0xB") and not search.reached("0xD")
+
+
+def test_many_goals_search_without_an_estimate(monkeypatch):
+    from optimizer import astar as astar_module
+    monkeypatch.setattr(astar_module, "ASTAR_MAX_GOALS", 2)
+    csr = geo_network(4, nodes=100)
+    sources = csr.nodes[10:15]
+    tree = dijkstra(csr, "0xN0")
+    search = multi_goal_astar(csr, "0xN0", sources)
+    farthest = max(tree.priority[csr.index[source]] for source in sources)
+    # As Dijkstra, stopping once the farthest source is settled
+    assert search.settled == sum(1 for p in tree.priority if p <= farthest)
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from models.optimizer import OptimizeRequest
+from optimizer.batch import NetworkSnapshot, optimize_batch
+from optimizer.graph_cache import graph_cache
+from optimizer.inventory_index import inventory_index
+
+STOCK = {
+    "0xD1": {"entityType": "distributor", "qty": 3, "productIds": ["P1", "P2", "P3"], "untrackedQty": 0},
+    "0xD2": {"entityType": "distributor", "qty": 5, "productIds": [], "untrackedQty": 5},
+    "0xR": {"entityType": "retailer", "qty": 9, "productIds": [], "untrackedQty": 9},
+}
+
+
+def connection(src, dst, cost):
+    return {"fromWalletAddress": src, "toWalletAddress": dst, "costPerUnit": cost, "transitTimeDays": cost}
+
+
+@pytest.fixture
+def network(monkeypatch):
+    graph_cache.load_connections([
+        connection("0xD1", "0xT", 1), connection("0xD2", "0xT", 2), connection("0xR", "0xT", 1),
+    ])
+    monkeypatch.setattr(inventory_index, "loaded", True)
+
+    async def load(snapshot, product_names):
+        for name in {name.lower() for name in product_names}:
+            snapshot.inventories[name] = dict(STOCK) if name == "aspirin" else {}
+            snapshot.weights[name], snapshot.cold_chain[name] = 1, False
+        snapshot.available_ids = {"P1", "P2", "P3"}
+
+    monkeypatch.setattr(NetworkSnapshot, "load", load)
+    yield
+    graph_cache.load_connections([])
+    graph_cache.loaded = False
+
+
+def request(product_name, qty):
+    return OptimizeRequest(product_name=product_name, required_qty=qty, target_wallet="0xT")
+
+
+def test_later_entries_only_get_the_stock_earlier_ones_left(network):
+    first, second, third, missing = asyncio.run(optimize_batch([
+        request("Aspirin", 3), request("aspirin", 3), request("Aspirin", 3), request("Ibuprofen", 1),
+    ]))
+    assert [(a["source"], a["allocated_qty"], a["product_ids"]) for a in first["allocations"]] == \
+        [("0xD1", 3, ["P1", "P2", "P3"])]
+    assert first["status"] == second["status"] == "complete"
+    assert [(a["source"], a["allocated_qty"]) for a in second["allocations"]] == [("0xD2", 3)]
+    # Retailers never supply, so only D2's last 2 units are left
+    assert third["status"] == "partial"
+    assert [(a["source"], a["allocated_qty"]) for a in third["allocations"]] == [("0xD2", 2)]
+    assert missing["wait_recommendation"]["message"] == "Product 'Ibuprofen' not found in the system."
@@ -0,0 +1,64 @@
+import pytest
+
+from models.optimizer import OptimizeRequest
+from optimizer.batch import NetworkSnapshot, plan_batch
+from optimizer.graph_cache import graph_cache
+
+
+def connection(src, dst, cost, cold_chain=True):
+    return {"fromWalletAddress": src, "toWalletAddress": dst, "costPerUnit": cost, "transitTimeDays": 1,
+            "coldChain": cold_chain}
+
+
+@pytest.fixture
+def network():
+    # The cheap route runs over a connection and an entity without cold storage
+    graph_cache.load_connections([
+        connection("0xS", "0xA", 1, cold_chain=False), connection("0xA", "0xT", 1),
+        connection("0xS", "0xB", 1), connection("0xB", "0xT", 1),
+        connection("0xS", "0xC", 5), connection("0xC", "0xT", 5),
+    ])
+    graph_cache.load_nodes([{"walletAddress": wallet, "coldChain": wallet != "0xB"}
+                            for wallet in ("0xS", "0xA", "0xB", "0xC", "0xT")])
+    yield
+    graph_cache.load_connections([])
+    graph_cache.load_nodes([])
+    graph_cache.loaded = False
+
+
+def plan(product_cold_chain, is_cold_storage=False):
+    snapshot = NetworkSnapshot()
+    snapshot.inventories["vaccine"] = {"0xS": {"entityType": "distributor", "productIds": [], "untrackedQty": 5}}
+    snapshot.weights["vaccine"], snapshot.cold_chain["vaccine"] = 1, product_cold_chain
+    request = OptimizeRequest(product_name="vaccine", required_qty=1, target_wallet="0xT",
+                              is_cold_storage=is_cold_storage)
+    [result] = plan_batch(graph_cache.csr(), graph_cache.cold_csr(), graph_cache.transit_times, snapshot, [request])
+    return result
+
+
+def test_cold_subgraph_keeps_cold_connections_between_cold_entities(network):
+    cold = graph_cache.cold_csr()
+    assert sorted(cold.nodes) == ["0xA", "0xC", "0xS", "0xT"]
+    assert cold.edge_count == 6
+
+
+def test_cold_chain_products_route_over_the_cold_subgraph(network):
+    assert plan(product_cold_chain=False)[1][0]["path"] == ["0xS", "0xA", "0xT"]
+    assert plan(product_cold_chain=True)[1][0]["path"] == ["0xS", "0xC", "0xT"]
+    assert plan(product_cold_chain=False, is_cold_storage=True)[1][0]["path"] == ["0xS", "0xC", "0xT"]
+
+
+def test_entity_flag_changes_reach_the_subgraph(network):
+    graph_cache.set_cold_chain("0xB", True)
+    assert plan(product_cold_chain=True)[1][0]["path"] == ["0xS", "0xB", "0xT"]
+    graph_cache.remove_node("0xC")
+    graph_cache.set_cold_chain("0xB", False)
+    assert plan(product_cold_chain=True) == ("fallback", True)
+
+
+def test_full_graph_is_used_until_flags_exist(network, capsys):
+    graph_cache.load_nodes([])
+    assert graph_cache.cold_csr() is graph_cache.csr()
+    assert graph_cache.cold_csr() is graph_cache.csr()
+    assert capsys.readouterr().out.count("no coldChain") == 1
+    assert plan(product_cold_chain=True)[1][0]["path"] == ["0xS", "0xA", "0xT"]
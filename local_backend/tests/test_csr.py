@@ -0,0 +1,46 @@
+import pytest
+
+from optimizer.csr import CSRGraph, dijkstra
+from optimizer.graph_cache import graph_cache
+
+
+def connection(src, dst, cost, time):
+    return {"fromWalletAddress": src, "toWalletAddress": dst, "costPerUnit": cost, "transitTimeDays": time}
+
+
+@pytest.fixture
+def network():
+    # A - B - D is cheaper, A - C - D is faster
+    graph_cache.load_connections([
+        connection("0xA", "0xB", 1, 5), connection("0xB", "0xD", 1, 5),
+        connection("0xA", "0xC", 4, 1), connection("0xC", "0xD", 4, 1),
+    ])
+    yield graph_cache.csr()
+    graph_cache.load_connections([])
+    graph_cache.loaded = False
+
+
+def test_adjacency_is_laid_out_per_node():
+    csr = CSRGraph.from_adjacency({"0xA": [("0xB", 2, 3), ("0xC", 4, 5)], "0xC": [("0xA", 4, 5)]})
+    assert csr.nodes == ["0xA", "0xC", "0xB"]
+    assert list(csr.offsets) == [0, 2, 3, 3]
+    assert [csr.nodes[t] for t in csr.targets] == ["0xB", "0xC", "0xA"]
+    assert list(csr.costs) == [2, 4, 4] and list(csr.times) == [3, 5, 5]
+
+
+def test_searches_read_labels_with_the_requested_scale(network):
+    by_cost = dijkstra(network, "0xA", return_time=False, scale=10)
+    assert by_cost.path_to_root("0xD") == ["0xD", "0xB", "0xA"]
+    assert by_cost.labels("0xD") == (20, 20)
+    by_time = dijkstra(network, "0xA", return_time=True, scale=10)
+    assert by_time.path_to_root("0xD") == ["0xD", "0xC", "0xA"]
+    assert by_time.labels("0xD") == (80, 2)
+    assert not by_time.reached("0xMissing")
+
+
+def test_the_cached_csr_is_shared_until_the_topology_changes(network):
+    assert graph_cache.view(2, 3).csr() is network
+    graph_cache.upsert_connection(connection("0xD", "0xE", 1, 1))
+    rebuilt = graph_cache.csr()
+    assert rebuilt is not network and "0xE" in rebuilt.index
+    assert graph_cache.csr() is rebuilt
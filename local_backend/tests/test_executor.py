@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import pytest
+
+from optimizer.executor import GraphExecutor
+from optimizer.graph_cache import graph_cache
+
+
+def connection(src, dst):
+    return {"fromWalletAddress": src, "toWalletAddress": dst, "costPerUnit": 1, "transitTimeDays": 1}
+
+
+def graph_size(csr, connections_lookup, delay=0):
+    time.sleep(delay)
+    return len(csr), len(connections_lookup)
+
+
+@pytest.fixture
+def network():
+    graph_cache.load_connections([connection("0xA", "0xB")])
+    yield
+    graph_cache.load_connections([])
+    graph_cache.loaded = False
+
+
+def test_process_calls_finish_on_the_graph_they_were_submitted_with(network):
+    executor = GraphExecutor("process", workers=1)
+
+    async def run():
+        slow = asyncio.create_task(executor.run(graph_size, 0.5))
+        await asyncio.sleep(0.2)
+        old_pool = executor._pool
+        graph_cache.upsert_connection(connection("0xB", "0xC"))
+        assert await executor.run(graph_size) == (3, 2)
+        # The old pool was kept for the running call, then shut down
+        assert await slow == (2, 1)
+        assert old_pool not in executor._in_flight and list(executor._in_flight) == [executor._pool]
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown()
+
+
+def test_idle_pools_are_only_replaced_on_the_next_call(network):
+    executor = GraphExecutor("process", workers=1)
+
+    async def run():
+        await executor.run(graph_size)
+        pool = executor._pool
+        for wallet in ("0xC", "0xD", "0xE"):
+            graph_cache.upsert_connection(connection("0xA", wallet))
+        assert executor._pool is pool
+        assert await executor.run(graph_size) == (5, 4)
+        assert executor._pool is not pool
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown()
+
+
+def test_thread_calls_get_a_copy_of_the_transit_times(network):
+    executor = GraphExecutor("thread", workers=1)
+    seen = []
+
+    def record(csr, connections_lookup):
+        seen.append(connections_lookup)
+
+    asyncio.run(executor.run(record))
+    asyncio.run(executor.run_with_graphs(lambda csr, cold_csr, lookup: seen.append(lookup)))
+    executor.shutdown()
+    assert seen == [graph_cache.transit_times] * 2
+    assert all(lookup is not graph_cache.transit_times for lookup in seen)
@@ -0,0 +1,38 @@
+from optimizer.algorithm import plan_allocations, plan_min_cost_allocations
+from optimizer.csr import CSRGraph, dijkstra
+
+
+def network():
+    # D1 reaches T cheaper through H than directly
+    return CSRGraph.from_adjacency({
+        "0xD1": [("0xT", 5, 1), ("0xH", 1, 1)],
+        "0xH": [("0xD1", 1, 1), ("0xT", 1, 1)],
+        "0xD2": [("0xT", 10, 1)],
+        "0xT": [("0xD1", 5, 1), ("0xH", 1, 1), ("0xD2", 10, 1)],
+    })
+
+
+def sources():
+    return [
+        {"wallet": "0xD1", "available_qty": 2, "product_ids": ["P1", "P2"]},
+        {"wallet": "0xD2", "available_qty": 5, "product_ids": []},
+    ]
+
+
+def test_min_cost_splits_when_one_source_would_cost_more():
+    csr = network()
+    greedy, _ = plan_allocations(sources(), dijkstra(csr, "0xT", False).with_scale(2 * 4), 4, False, {})
+    assert [a["source"] for a in greedy] == ["0xD2"] and greedy[0]["total_cost"] == 80
+
+    allocations, remaining, _ = plan_min_cost_allocations(sources(), csr, "0xT", 4, 2, False, {})
+    assert remaining == 0
+    assert [(a["source"], a["path"], a["allocated_qty"], a["product_ids"], a["total_cost"]) for a in allocations] == [
+        ("0xD1", ["0xD1", "0xH", "0xT"], 2, ["P1", "P2"], 8),
+        ("0xD2", ["0xD2", "0xT"], 2, [], 40),
+    ]
+
+
+def test_min_cost_reports_what_it_could_not_route():
+    allocations, remaining, _ = plan_min_cost_allocations(sources(), network(), "0xT", 9, 1, False, {})
+    assert sum(a["allocated_qty"] for a in allocations) == 7 and remaining == 2
+    assert plan_min_cost_allocations(sources(), network(), "0xMissing", 1, 1, False, {})[:2] == ([], 1)
@@ -0,0 +1,28 @@
+from benchmarks.generator import generate_network, unit_documents
+
+
+def test_networks_are_reproducible_and_well_formed():
+    network = generate_network(nodes=200, products=5, units=2000, seed=3)
+    units = list(unit_documents(network))
+    again = generate_network(nodes=200, products=5, units=2000, seed=3)
+    assert network["connections"] == again["connections"] and units == list(unit_documents(again))
+    assert network["connections"] != generate_network(nodes=200, products=5, units=2000, seed=4)["connections"]
+    assert len(units) == len({unit["productId"] for unit in units}) == 2000
+    assert {unit["productId"] for unit in units if unit["inTransit"]} == network["in_transit"]
+
+    # Every connection touches a distributor, and the distributor tier is connected
+    distributors = {doc["walletAddress"] for doc in network["distributors"]}
+    neighbours = {}
+    for conn in network["connections"]:
+        src, dst = conn["fromWalletAddress"], conn["toWalletAddress"]
+        assert src in distributors or dst in distributors
+        if src in distributors and dst in distributors:
+            neighbours.setdefault(src, set()).add(dst)
+            neighbours.setdefault(dst, set()).add(src)
+    reached, frontier = set(), [next(iter(distributors))]
+    while frontier:
+        wallet = frontier.pop()
+        if wallet not in reached:
+            reached.add(wallet)
+            frontier.extend(neighbours.get(wallet, ()))
+    assert reached == distributors
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from controllers import connection_controller
+from models.connection import ConnectionUpdateModel
+from optimizer.graph_cache import graph_cache
+
+
+def connection(src, dst, cost=1, time=1):
+    return {"fromWalletAddress": src, "toWalletAddress": dst, "costPerUnit": cost, "transitTimeDays": time}
+
+
+@pytest.fixture
+def network():
+    graph_cache.load_connections([connection("0xA", "0xB", 2, 3), connection("0xB", "0xC", 4, 5)])
+    yield
+    graph_cache.load_connections([])
+    graph_cache.loaded = False
+
+
+def test_connections_are_cached_in_both_directions(network):
+    assert graph_cache.adjacency == {
+        "0xA": [("0xB", 2, 3)],
+        "0xB": [("0xA", 2, 3), ("0xC", 4, 5)],
+        "0xC": [("0xB", 4, 5)],
+    }
+    assert graph_cache.transit_times == {("0xA", "0xB"): 3, ("0xB", "0xC"): 5}
+
+
+def test_upserts_replace_the_cached_edge(network):
+    graph_cache.upsert_connection(connection("0xA", "0xB", 7, 1))
+    graph_cache.upsert_connection(connection("0xC", "0xD"))
+    assert sorted(graph_cache.adjacency["0xB"]) == [("0xA", 7, 1), ("0xC", 4, 5)]
+    assert graph_cache.adjacency["0xD"] == [("0xC", 1, 1)]
+    assert graph_cache.transit_times[("0xA", "0xB")] == 1
+
+
+def test_removing_the_last_edge_drops_the_node(network):
+    graph_cache.remove_connection("0xB", "0xC")
+    graph_cache.remove_connection("0xB", "0xMissing")
+    assert graph_cache.adjacency == {"0xA": [("0xB", 2, 3)], "0xB": [("0xA", 2, 3)]}
+    assert ("0xB", "0xC") not in graph_cache.transit_times
+
+
+def test_writes_before_the_first_load_are_left_to_the_load():
+    graph_cache.loaded = False
+    graph_cache.upsert_connection(connection("0xA", "0xB"))
+    assert not graph_cache.loaded and "0xA" not in graph_cache.adjacency
+
+
+def test_views_scale_costs_without_touching_the_cache(network):
+    view = graph_cache.view(product_weight=2, required_qty=5)
+    assert view["0xB"] == [("0xA", 20, 3), ("0xC", 40, 5)]
+    assert graph_cache.adjacency["0xB"] == [("0xA", 2, 3), ("0xC", 4, 5)]
+    assert "0xC" in view and "0xZ" not in view and view.get("0xZ") is None
+
+
+class FakeConnections:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def find_one_and_update(self, query, update, return_document=None):
+        doc = next((d for d in self.docs if all(d[k] == v for k, v in query.items())), None)
+        if doc is not None:
+            before = dict(doc)
+            doc.update(update["$set"])
+            return before
+
+
+def test_update_connection_patches_the_cache(network, monkeypatch):
+    monkeypatch.setattr(connection_controller, "collection", FakeConnections([connection("0xA", "0xB", 2, 3)]))
+    update = ConnectionUpdateModel.model_construct(toWalletAddress="0xC", costPerUnit=6)
+    asyncio.run(connection_controller.update_connection("0xA", "0xB", update))
+    assert ("0xA", "0xB") not in graph_cache.transit_times
+    assert graph_cache.adjacency["0xA"] == [("0xC", 6, 3)]
+    assert sorted(graph_cache.adjacency["0xC"]) == [("0xA", 6, 3), ("0xB", 4, 5)]
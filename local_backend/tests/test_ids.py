@@ -0,0 +1,60 @@
+import asyncio
+
+from utils import ids
+from utils.ids import ID_WIDTH, IdService
+
+
+class FakeCounters:
+    def __init__(self):
+        self.seq = {}
+        self.calls = 0
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        self.calls += 1
+        # Let other coroutines interleave, as a real round trip would
+        await asyncio.sleep(0)
+        prefix = query["_id"]
+        self.seq[prefix] = self.seq.get(prefix, 0) + update["$inc"]["seq"]
+        return {"_id": prefix, "seq": self.seq[prefix]}
+
+
+def test_ids_are_fixed_width_and_sort_by_creation(monkeypatch):
+    monkeypatch.setattr(ids, "counters", FakeCounters())
+    ids.counters.seq["O"] = 99998
+    service = IdService()
+
+    async def run():
+        return [await service.next("O") for _ in range(3)]
+
+    allocated = asyncio.run(run())
+    assert allocated == ["O0000099999", "O0000100000", "O0000100001"]
+    assert all(len(i) == 1 + ID_WIDTH for i in allocated)
+    assert sorted(allocated) == allocated
+
+
+def test_workers_never_hand_out_the_same_id(monkeypatch):
+    counters = FakeCounters()
+    monkeypatch.setattr(ids, "counters", counters)
+    workers = [IdService(block_size=1), IdService(block_size=5)]
+
+    async def run():
+        batches = await asyncio.gather(*(
+            worker.allocate("ship_", n) for worker in workers for n in (1, 3, 2, 7)
+        ))
+        return [i for batch in batches for i in batch]
+
+    allocated = asyncio.run(run())
+    assert len(allocated) == len(set(allocated)) == 26
+
+
+def test_blocks_save_round_trips(monkeypatch):
+    counters = FakeCounters()
+    monkeypatch.setattr(ids, "counters", counters)
+    service = IdService(block_size=10)
+
+    async def run():
+        return [await service.next("ret_") for _ in range(10)] + await service.allocate("ret_", 3)
+
+    allocated = asyncio.run(run())
+    assert allocated == [f"ret_{n:0{ID_WIDTH}d}" for n in range(1, 14)]
+    assert counters.calls == 2
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from config import indexes
+
+
+class FakeCollection:
+    def __init__(self, existing):
+        self.existing = existing
+        self.created = []
+
+    async def list_indexes(self):
+        for index in [{"key": {"_id": 1}, "name": "_id_"}, *self.existing]:
+            yield index
+
+    async def create_indexes(self, models):
+        self.created += [model.document["name"] for model in models]
+
+    def aggregate(self, pipeline):
+        return self
+
+    async def to_list(self, length=None):
+        # As on a server without $indexStats
+        raise OperationFailure("Unrecognized pipeline stage name: '$indexStats'")
+
+
+class FakeDb:
+    def __init__(self, collections):
+        self.collections = collections
+
+    def get_collection(self, name):
+        return self.collections[name]
+
+
+REGISTRY = {
+    "orders": [
+        IndexModel([("orderId", ASCENDING)], name="orderId_unique", unique=True,
+                   partialFilterExpression={"orderId": {"$type": "string"}}),
+        IndexModel([("status", ASCENDING)], name="status"),
+        IndexModel([("retailerWalletAddress", ASCENDING)], name="retailerWalletAddress"),
+    ],
+}
+
+
+@pytest.fixture
+def orders(monkeypatch):
+    def install(existing):
+        collection = FakeCollection(existing)
+        monkeypatch.setattr(indexes, "db", FakeDb({"orders": collection}))
+        return collection
+    return install
+
+
+def test_matching_indexes_are_left_alone(orders):
+    collection = orders([
+        {"key": {"orderId": 1}, "name": "orderId_1", "unique": True,
+         "partialFilterExpression": {"orderId": {"$type": "string"}}},
+        {"key": {"status": 1}, "name": "status", "sparse": False},
+    ])
+    report = asyncio.run(indexes.ensure_indexes(REGISTRY))
+    assert report == {"created": ["orders.retailerWalletAddress"], "failed": {}, "mismatched": {}}
+    assert collection.created == ["retailerWalletAddress"]
+
+
+def test_same_key_with_other_options_is_reported(orders):
+    collection = orders([
+        # Not unique, and no partial filter
+        {"key": {"orderId": 1}, "name": "orderId_1"},
+        {"key": {"status": 1}, "name": "status", "expireAfterSeconds": 3600},
+    ])
+    report = asyncio.run(indexes.ensure_indexes(REGISTRY))
+    assert report["mismatched"] == {
+        "orders.orderId_unique": {
+            "expected": {"unique": True, "partialFilterExpression": {"orderId": {"$type": "string"}}},
+            "existing": [{"name": "orderId_1"}],
+        },
+        "orders.status": {"expected": {}, "existing": [{"name": "status", "expireAfterSeconds": 3600}]},
+    }
+    # Never dropped or recreated
+    assert collection.created == ["retailerWalletAddress"]
+
+
+def test_index_report_lists_missing_and_mismatched(orders):
+    orders([{"key": {"orderId": 1}, "name": "orderId_unique", "unique": True}])
+    report = asyncio.run(indexes.index_report(REGISTRY))
+    assert report["orders"]["missing"] == ["status", "retailerWalletAddress"]
+    assert list(report["orders"]["mismatched"]) == ["orderId_unique"]
+    assert "unused" not in report["orders"]
@@ -0,0 +1,72 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from controllers import distributor_controller
+from optimizer import inventory_index as inventory_index_module
+from optimizer.inventory_index import inventory_index
+
+
+class FakeEntities:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query=None, projection=None):
+        async def cursor():
+            for doc in self.docs:
+                yield doc
+        return cursor()
+
+    async def find_one(self, query):
+        return next((d for d in self.docs if d["walletAddress"] == query["walletAddress"]), None)
+
+    async def update_one(self, query, update):
+        doc = await self.find_one(query)
+        doc.update(update["$set"])
+        return SimpleNamespace(matched_count=1, modified_count=1)
+
+
+def item(name, qty, ids=()):
+    return {"productName": name, "qty": qty, "productIds": list(ids)}
+
+
+@pytest.fixture
+def entities(monkeypatch):
+    distributors = FakeEntities([
+        {"walletAddress": "0xD", "inventory": [item("Aspirin", 3, ["P1", "P2"]), item("aspirin", 4)]},
+    ])
+    retailers = FakeEntities([{"walletAddress": "0xR", "inventory": [item("Vaccine", 2)]}, {"walletAddress": "0xE"}])
+    monkeypatch.setattr(inventory_index_module, "ENTITY_COLLECTIONS",
+                        {"retailer": retailers, "distributor": distributors})
+    asyncio.run(inventory_index.load())
+    yield distributors
+    inventory_index.products, inventory_index.wallet_products = {}, {}
+    inventory_index.loaded = False
+
+
+def test_holders_are_indexed_by_product_name(entities):
+    assert asyncio.run(inventory_index.holders("ASPIRIN")) == {
+        "0xD": {"entityType": "distributor", "qty": 7, "productIds": ["P1", "P2"], "untrackedQty": 4},
+    }
+    assert asyncio.run(inventory_index.holders("vaccine"))["0xR"]["entityType"] == "retailer"
+    assert asyncio.run(inventory_index.holders("nothing")) == {}
+
+
+def test_writes_patch_only_the_wallet_they_touch(entities):
+    inventory_index.set_inventory("0xD", "distributor", [item("Vaccine", 5)])
+    assert "aspirin" not in inventory_index.products
+    assert set(inventory_index.products["vaccine"]) == {"0xD", "0xR"}
+
+    inventory_index.rename_wallet("0xR", "0xR2")
+    inventory_index.remove_wallet("0xD")
+    assert inventory_index.products == {
+        "vaccine": {"0xR2": {"entityType": "retailer", "qty": 2, "productIds": [], "untrackedQty": 2}},
+    }
+
+
+def test_inventory_updates_reach_the_index(entities, monkeypatch):
+    monkeypatch.setattr(distributor_controller, "collection", entities)
+    asyncio.run(distributor_controller.update_inventory_item("0xD", "Aspirin", 1, ["P1"], action="remove"))
+    assert inventory_index.products["aspirin"]["0xD"]["productIds"] == ["P2"]
+    assert inventory_index.products["aspirin"]["0xD"]["qty"] == 6
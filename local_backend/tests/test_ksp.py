@@ -0,0 +1,39 @@
+from optimizer.utils import k_shortest_paths, shortest_path
+
+
+DIRECTED = {
+    "A": [("B", 1, 1), ("C", 5, 1)],
+    "B": [("D", 1, 1)],
+    "C": [("D", 1, 1)],
+}
+
+
+def test_directed_graph_routes_follow_edge_direction():
+    routes = k_shortest_paths(DIRECTED, "A", "D", 2, return_time=False)
+    assert routes == [(["A", "B", "D"], 2.0, 2.0), (["A", "C", "D"], 6.0, 6.0)]
+
+
+def test_directed_graph_has_no_route_against_the_edges():
+    assert k_shortest_paths(DIRECTED, "D", "A", 2, return_time=False) == []
+
+
+def test_routes_are_loopless_and_ordered():
+    graph = {
+        "A": [("B", 1, 1), ("C", 2, 1)],
+        "B": [("D", 1, 1), ("C", 1, 1)],
+        "C": [("D", 1, 1)],
+    }
+    routes = k_shortest_paths(graph, "A", "D", 5, return_time=False)
+    assert [path for path, _, _ in routes] == [["A", "B", "D"], ["A", "B", "C", "D"], ["A", "C", "D"]]
+    assert [cost for _, cost, _ in routes] == [2.0, 3.0, 3.0]
+    assert all(len(set(path)) == len(path) for path, _, _ in routes)
+
+
+def test_first_route_matches_shortest_path():
+    graph = {
+        "A": [("B", 4, 1), ("C", 1, 3)],
+        "B": [("D", 1, 1)],
+        "C": [("B", 1, 1), ("D", 6, 1)],
+    }
+    for return_time in (True, False):
+        assert k_shortest_paths(graph, "A", "D", 1, return_time)[0] == shortest_path(graph, "A", "D", return_time)
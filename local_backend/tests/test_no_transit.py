@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from models.optimizer import OptimizeRequest, OrderLineItemRequest, OrderOptimizeRequest
+from optimizer.algorithm import pareto_routes, plan_routes
+from optimizer.batch import NetworkSnapshot, plan_batch
+from optimizer.executor import graph_executor
+from optimizer.graph_cache import graph_cache
+from optimizer.order import plan_order
+from optimizer.routing_table import routing_table
+
+# Only the D routes may carry stock from 0xS to the retailer 0xT
+ALLOWED = [["0xS", "0xD1", "0xT"], ["0xS", "0xD2", "0xT"]]
+TYPES = {"0xS": "distributor", "0xD1": "distributor", "0xD2": "distributor",
+         "0xR": "retailer", "0xM": "manufacturer", "0xT": "retailer"}
+
+
+def connection(src, dst, cost):
+    return {"fromWalletAddress": src, "toWalletAddress": dst, "costPerUnit": cost, "transitTimeDays": cost,
+            "fromType": TYPES[src], "toType": TYPES[dst]}
+
+
+@pytest.fixture
+def network(monkeypatch):
+    monkeypatch.setattr(graph_executor, "kind", "inline")
+    graph_cache.load_connections([
+        connection("0xS", "0xR", 1), connection("0xR", "0xT", 1),
+        connection("0xS", "0xM", 1), connection("0xM", "0xT", 2),
+        connection("0xS", "0xD1", 3), connection("0xD1", "0xT", 3),
+        connection("0xS", "0xD2", 4), connection("0xD2", "0xT", 4),
+    ])
+    yield graph_cache.csr()
+    graph_cache.load_connections([])
+    graph_cache.loaded = False
+    routing_table.clear()
+
+
+def snapshot(product="drug"):
+    snap = NetworkSnapshot()
+    snap.inventories[product] = {"0xS": {"entityType": "distributor", "productIds": [], "untrackedQty": 10}}
+    snap.weights[product], snap.cold_chain[product] = 1, False
+    return snap
+
+
+def routes(allocation):
+    return [allocation["path"]] + [alt["path"] for alt in allocation.get("alternative_paths", [])]
+
+
+@pytest.mark.parametrize("mode", ["greedy", "astar", "mincost"])
+def test_single_requests_route_only_through_distributors(network, mode):
+    source = {"wallet": "0xS", "available_qty": 5, "product_ids": []}
+    allocations, remaining, _ = plan_routes(
+        network, graph_cache.transit_times, mode, [source], "0xT", 5, 1, False, 3,
+        graph_cache.non_forwarding_wallets()
+    )
+    assert remaining == 0 and routes(allocations[0]) == ALLOWED
+
+
+def test_pareto_frontiers_route_only_through_distributors(network):
+    source = {"wallet": "0xS", "available_qty": 5, "product_ids": []}
+    frontiers, _ = pareto_routes(
+        network, graph_cache.transit_times, [source], "0xT", 1, graph_cache.non_forwarding_wallets()
+    )
+    assert [route["path"] for route in frontiers[0]["routes"]] == ALLOWED[:1]
+
+
+def test_batch_routes_only_through_distributors(network):
+    requests = [OptimizeRequest(product_name="drug", required_qty=2, target_wallet="0xT", mode=mode, k_routes=3)
+                for mode in ("greedy", "astar", "mincost")]
+    plans = plan_batch(network, graph_cache.cold_csr(), graph_cache.transit_times, snapshot(), requests,
+                       graph_cache.non_forwarding_wallets())
+    assert [routes(plan[1][0]) for plan in plans] == [ALLOWED] * 3
+
+
+def test_order_planner_routes_only_through_distributors(network):
+    request = OrderOptimizeRequest(retailerWalletAddress="0xT", lineItems=[OrderLineItemRequest(productName="drug", qty=3)])
+    planned, _ = plan_order(network, graph_cache.cold_csr(), graph_cache.transit_times, snapshot(), request,
+                            graph_cache.non_forwarding_wallets())
+    assert [a["path"] for a in planned[0][1]] == ALLOWED[:1]
+
+
+def test_routing_table_rows_route_only_through_distributors(network):
+    tree = asyncio.run(routing_table.load_tree("0xT", False))
+    assert tree.path_to_root("0xS") == ALLOWED[0]
+    # A retailer that becomes a distributor may carry traffic from then on
+    graph_cache.upsert_connection({**connection("0xS", "0xR", 1), "fromType": "distributor", "toType": "distributor"})
+    assert routing_table.rows == {}
+    assert asyncio.run(routing_table.load_tree("0xT", False)).path_to_root("0xS") == ["0xS", "0xR", "0xT"]
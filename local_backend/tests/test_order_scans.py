@@ -0,0 +1,171 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from controllers import order_controller, product_controller
+from optimizer.reservations import reservations
+from utils import unit_allocations as unit_allocations_module
+from utils.unit_allocations import unit_allocations
+
+
+def values(doc, path):
+    """Every value at a dotted path, descending into arrays like Mongo does."""
+    found = [doc]
+    for key in path.split("."):
+        found = [
+            item[key] for value in found for item in (value if isinstance(value, list) else [value])
+            if isinstance(item, dict) and key in item
+        ]
+    return [v for value in found for v in (value if isinstance(value, list) else [value])]
+
+
+def matches(doc, query):
+    for path, condition in query.items():
+        found = values(doc, path)
+        if isinstance(condition, dict) and "$in" in condition:
+            ok = any(v in condition["$in"] for v in found)
+        elif isinstance(condition, dict) and "$nin" in condition:
+            ok = not any(v in condition["$nin"] for v in found)
+        elif isinstance(condition, dict) and "$ne" in condition:
+            ok = condition["$ne"] not in found
+        else:
+            ok = condition in found
+        if not ok:
+            return False
+    return True
+
+
+def set_path(doc, path, value):
+    *parents, last = path.split(".")
+    for key in parents:
+        doc = doc[int(key)] if key.isdigit() else doc[key]
+    doc[last] = value
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return self.docs
+
+    def __aiter__(self):
+        async def iterate():
+            for doc in self.docs:
+                yield doc
+        return iterate()
+
+
+class FakeCollection:
+    """The handful of Motor calls the scan endpoints make, over a list of documents."""
+
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.queries = []
+        self.writes = []
+
+    def find(self, query=None, projection=None):
+        self.queries.append(query)
+        return FakeCursor([doc for doc in self.docs if matches(doc, query or {})])
+
+    async def bulk_write(self, ops, ordered=True):
+        self.writes.append(("bulk_write", len(ops)))
+        for op in ops:
+            doc = next((d for d in self.docs if matches(d, op._filter)), None)
+            if "$set" not in op._doc:
+                if doc is not None:
+                    self.docs.remove(doc)
+                self.docs.append(dict(op._doc))
+                continue
+            for path, value in op._doc["$set"].items():
+                set_path(doc, path, value)
+
+    async def update_many(self, query, update):
+        self.writes.append(("update_many", query))
+        for doc in [d for d in self.docs if matches(d, query)]:
+            for path, value in update["$set"].items():
+                set_path(doc, path, value)
+
+    async def delete_many(self, query):
+        kept = [d for d in self.docs if not matches(d, query)]
+        deleted, self.docs = len(self.docs) - len(kept), kept
+        return SimpleNamespace(deleted_count=deleted)
+
+
+def allocation(unit_ids, to_wallet, fulfilled=False):
+    return {"productUnitIds": unit_ids, "qty": len(unit_ids), "fulfilled": fulfilled,
+            "path": [{"fromWalletAddress": "0xD", "toWalletAddress": to_wallet}]}
+
+
+def order(_id, order_id, allocations, status="created"):
+    return {"_id": _id, "orderId": order_id, "status": status,
+            "lineItems": [{"productName": "Aspirin", "allocations": allocations}]}
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    orders = FakeCollection([
+        order(1, "O1", [allocation(["U1", "U2"], "0xR1"), allocation(["U3"], "0xR1")]),
+        order(2, "O2", [allocation(["U4"], "0xR2")]),
+        order(3, "O3", [allocation(["U5"], "0xR3")], status="completed"),
+    ])
+    units = FakeCollection([
+        {"productId": "U1", "location": {"walletAddress": "0xR1"}, "inTransit": False},
+        {"productId": "U2", "location": {"walletAddress": "0xR1"}, "inTransit": False},
+        {"productId": "U3", "location": {"walletAddress": "0xR1"}, "inTransit": True},
+        {"productId": "U4", "location": {"walletAddress": "0xR2"}, "inTransit": False},
+    ])
+    monkeypatch.setattr(order_controller, "collection", orders)
+    monkeypatch.setattr(product_controller, "collection", units)
+    monkeypatch.setattr(unit_allocations_module, "collection", FakeCollection())
+    released = []
+    monkeypatch.setattr(reservations, "release_orders",
+                        lambda order_ids: asyncio.sleep(0, released.append(order_ids)))
+    for doc in orders.docs:
+        asyncio.run(unit_allocations.index_order(doc))
+    return orders, released
+
+
+def fulfilled(orders):
+    return [[a["fulfilled"] for a in doc["lineItems"][0]["allocations"]] for doc in orders.docs]
+
+
+def test_scans_update_the_fulfilled_flags_in_one_write(scans):
+    orders, _ = scans
+    result = asyncio.run(order_controller.update_allocations_fulfilled_by_products(["U4", "U9", "U3", "U1"]))
+    # In scan order; U3 is still in transit, so its allocation stays open
+    assert result == {"updatedOrders": ["O2", "O1"]}
+    assert fulfilled(orders) == [[True, False], [True], [False]]
+    assert orders.writes == [("bulk_write", 2)]
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(order_controller.update_allocations_fulfilled_by_products(["U1", "U4"]))
+    assert error.value.status_code == 404
+
+
+def test_status_updates_touch_each_order_once(scans):
+    orders, released = scans
+    result = asyncio.run(order_controller.update_order_status_by_products(["U4", "U5", "U2", "U1"], "completed"))
+    assert result == {"updatedOrders": ["O2", "O1"], "newStatus": "completed"}
+    assert [doc["status"] for doc in orders.docs] == ["completed"] * 3
+    assert [kind for kind, _ in orders.writes] == ["update_many"] and released == [["O2", "O1"]]
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(order_controller.update_order_status_by_products(["U1"], "completed"))
+    assert error.value.status_code == 404
+
+
+def test_scanned_units_are_found_through_the_index(scans):
+    orders, _ = scans
+    moved = order(1, "O1", [allocation(["U3"], "0xR1"), allocation(["U1"], "0xR1")])
+    orders.docs[0] = moved
+    asyncio.run(unit_allocations.index_order(moved))
+    entries = asyncio.run(unit_allocations.lookup(["U1", "U2", "U3"]))
+    assert {pid: (e["orderId"], e["allocation"]) for pid, e in entries.items()} == {"U1": ("O1", 1), "U3": ("O1", 0)}
+
+    asyncio.run(order_controller.update_allocations_fulfilled_by_products(["U1"]))
+    assert fulfilled(orders)[0] == [False, True]
+    # Orders are read by _id, never by the multikey unit path
+    assert all("lineItems.allocations.productUnitIds" not in query for query in orders.queries)
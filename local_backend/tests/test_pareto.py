@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from optimizer.csr import CSRGraph
+from optimizer.pareto import pareto_search
+
+
+def random_network(seed, nodes=9, edges=16):
+    rng = random.Random(seed)
+    wallets = [f"0xN{i}" for i in range(nodes)]
+    adjacency = {}
+    for a, b in {tuple(rng.sample(wallets, 2)) for _ in range(edges)}:
+        cost, time = rng.randint(1, 9), rng.randint(1, 9)
+        adjacency.setdefault(a, []).append((b, cost, time))
+        adjacency.setdefault(b, []).append((a, cost, time))
+    return adjacency
+
+
+def simple_routes(adjacency, node, root, seen=()):
+    """Every loopless (cost, time) from node to root."""
+    if node == root:
+        yield 0, 0
+        return
+    for neighbor, cost, time in adjacency.get(node, ()):
+        if neighbor not in seen:
+            for rest_cost, rest_time in simple_routes(adjacency, neighbor, root, seen + (node,)):
+                yield cost + rest_cost, time + rest_time
+
+
+def non_dominated(points):
+    frontier = []
+    for cost, time in sorted(set(points)):
+        if not frontier or time < frontier[-1][1]:
+            frontier.append((cost, time))
+    return frontier
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_frontiers_hold_every_non_dominated_route(seed):
+    adjacency = random_network(seed)
+    csr = CSRGraph.from_adjacency(adjacency)
+    root = csr.nodes[0]
+    result = pareto_search(csr, root, max_labels=100)
+    for node in csr.nodes:
+        frontier = result.frontier(node)
+        assert [(cost, time) for _, cost, time in frontier] == non_dominated(simple_routes(adjacency, node, root))
+        for path, _, _ in frontier:
+            assert path[0] == node and path[-1] == root
+
+
+def test_labels_per_node_are_capped_and_scaled():
+    # Four parallel routes, each cheaper but slower than the last
+    adjacency = {"0xS": [], "0xT": []}
+    for i in range(4):
+        hop = f"0xH{i}"
+        adjacency["0xS"].append((hop, i + 1, 4 - i))
+        adjacency[hop] = [("0xS", i + 1, 4 - i), ("0xT", 1, 1)]
+        adjacency["0xT"].append((hop, 1, 1))
+    result = pareto_search(CSRGraph.from_adjacency(adjacency), "0xT", max_labels=2)
+    assert result.frontier("0xS", scale=10) == [
+        (["0xS", "0xH0", "0xT"], 20, 5),
+        (["0xS", "0xH1", "0xT"], 30, 4),
+    ]
+    assert result.frontier("0xMissing") == []
@@ -0,0 +1,31 @@
+import asyncio
+
+from controllers import product_controller
+from optimizer.algorithm import get_product_profile
+
+
+class FakeProducts:
+    def __init__(self, doc):
+        self.doc = doc
+        self.calls = []
+
+    async def find_one(self, query, projection=None):
+        self.calls.append((query, projection))
+        return self.doc
+
+    def find(self, *args, **kwargs):
+        raise AssertionError("the profile lookup must not scan every unit")
+
+
+def test_profile_reads_one_projected_unit(monkeypatch):
+    products = FakeProducts({"unitWeight": 2.5, "coldChain": True})
+    monkeypatch.setattr(product_controller, "collection", products)
+    assert asyncio.run(get_product_profile("Vaccine")) == (2.5, True)
+    [(query, projection)] = products.calls
+    assert query == {"productName": {"$regex": "Vaccine", "$options": "i"}}
+    assert projection == {"_id": 0, "unitWeight": 1, "coldChain": 1}
+
+
+def test_unknown_products_get_the_defaults(monkeypatch):
+    monkeypatch.setattr(product_controller, "collection", FakeProducts(None))
+    assert asyncio.run(get_product_profile("nothing")) == (1, False)
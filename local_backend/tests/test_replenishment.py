@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from optimizer import replenishment
+from optimizer.batch import NetworkSnapshot
+from optimizer.executor import graph_executor
+from optimizer.graph_cache import graph_cache
+from optimizer.inventory_index import inventory_index
+from optimizer.replenishment import ReplenishmentPlanner, plan_replenishment
+
+
+def connection(src, dst, cost, from_type="distributor", to_type="distributor"):
+    return {"fromWalletAddress": src, "toWalletAddress": dst, "costPerUnit": cost, "transitTimeDays": 1,
+            "fromType": from_type, "toType": to_type}
+
+
+def source(wallet, qty, ids=()):
+    return {"wallet": wallet, "available_qty": qty, "product_ids": list(ids)}
+
+
+@pytest.fixture
+def network():
+    # D1 - R1 - R2 is cheap, but R1 is a retailer; D1 - D2 - R2 is the way round
+    graph_cache.load_connections([
+        connection("0xD1", "0xR1", 1, to_type="retailer"),
+        connection("0xR1", "0xR2", 1, "retailer", "retailer"),
+        connection("0xD1", "0xD2", 3),
+        connection("0xD2", "0xR2", 3, to_type="retailer"),
+        connection("0xD3", "0xR3", 1, to_type="retailer"),
+    ])
+    yield graph_cache.csr()
+    graph_cache.load_connections([])
+    graph_cache.loaded = False
+
+
+def test_demands_go_to_the_nearest_source_first(network):
+    allocations, pending, stats = plan_replenishment(
+        network, [source("0xD1", 5, ["P1", "P2"]), source("0xD3", 1)], {"0xR1": 4, "0xR3": 3}, 1
+    )
+    assert [(a["source"], a["allocated_qty"], a["product_ids"]) for a in allocations["0xR1"]] == \
+        [("0xD1", 4, ["P1", "P2"])]
+    assert [a["source"] for a in allocations["0xR3"]] == ["0xD3"]
+    # D1's last unit is not connected to R3
+    assert pending == {"0xR3": 2}
+    assert stats["rounds"] == 2
+
+
+def test_routes_never_pass_through_no_transit_wallets(network):
+    allocations, pending, _ = plan_replenishment(
+        network, [source("0xD1", 1)], {"0xR2": 1}, 1, no_transit=graph_cache.non_forwarding_wallets()
+    )
+    assert allocations["0xR2"][0]["path"] == ["0xD1", "0xD2", "0xR2"] and pending == {}
+
+
+class FakeProposals:
+    """The proposed_orders calls a run makes, on a list of documents."""
+
+    def __init__(self):
+        self.docs = []
+        self.next_id = 0
+
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            doc = next((d for d in self.docs if all(d.get(k) == v for k, v in op._filter.items())), None)
+            if doc is None:
+                self.next_id += 1
+                doc = {"_id": self.next_id, **op._filter, **op._doc["$setOnInsert"]}
+                self.docs.append(doc)
+            doc.update(op._doc["$set"])
+
+    async def delete_many(self, query):
+        self.docs = [
+            d for d in self.docs
+            if not (d["status"] == query["status"] and d["runId"] != query["runId"]["$ne"])
+        ]
+
+
+@pytest.fixture
+def planner(network, monkeypatch):
+    monkeypatch.setattr(graph_executor, "kind", "inline")
+    monkeypatch.setattr(inventory_index, "loaded", True)
+    proposals = FakeProposals()
+    monkeypatch.setattr(replenishment, "proposed_orders", proposals)
+    stock = {"0xD1": {"entityType": "distributor", "productIds": [], "untrackedQty": 20}}
+
+    async def load(snapshot, product_names):
+        for name in product_names:
+            snapshot.inventories[name] = stock
+            snapshot.weights[name], snapshot.cold_chain[name] = 1, False
+
+    monkeypatch.setattr(NetworkSnapshot, "load", load)
+    return ReplenishmentPlanner(), proposals
+
+
+def short(wallet, qty):
+    return {"walletAddress": wallet, "entityType": "retailer", "productName": "Drug", "qty": qty,
+            "reorderLevel": 5}
+
+
+def test_runs_upsert_one_proposal_per_wallet_and_product(planner, monkeypatch):
+    planner, proposals = planner
+    monkeypatch.setattr(replenishment, "find_below_reorder_level",
+                        lambda: asyncio.sleep(0, [short("0xR1", 2), short("0xR2", 0)]))
+    asyncio.run(planner._run())
+    first = {d["retailerWalletAddress"]: d for d in proposals.docs}
+    assert [d["lineItems"][0]["qty"] for d in first.values()] == [8, 10]
+
+    # R2 was restocked; R1's proposal is updated in place
+    monkeypatch.setattr(replenishment, "find_below_reorder_level",
+                        lambda: asyncio.sleep(0, [short("0xR1", 1)]))
+    report = asyncio.run(planner._run())
+    assert [(d["_id"], d["retailerWalletAddress"], d["lineItems"][0]["qty"]) for d in proposals.docs] == \
+        [(first["0xR1"]["_id"], "0xR1", 9)]
+    assert proposals.docs[0]["createdAt"] == first["0xR1"]["createdAt"]
+    assert proposals.docs[0]["runId"] == report["runId"]
@@ -0,0 +1,222 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import BulkWriteError
+
+from optimizer import reservations as reservations_module
+from optimizer.reservations import DUPLICATE_KEY, ReservationTable
+
+UNITS = ["P1", "P2", "P3", "P4"]
+
+
+def matches(doc, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(doc, q) for q in condition):
+                return False
+            continue
+        value = doc.get(field)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+        for op, operand in condition.items():
+            if op == "$in" and value not in operand:
+                return False
+            if op == "$exists" and (field in doc) != operand:
+                return False
+            if op == "$lte" and (value is None or value > operand):
+                return False
+    return True
+
+
+def apply(doc, update):
+    doc.update(update.get("$set", {}))
+    for field in update.get("$unset", {}):
+        doc.pop(field, None)
+
+
+class Result:
+    def __init__(self, deleted_count=0):
+        self.deleted_count = deleted_count
+
+
+class FakeCollection:
+    """The unit_reservations calls ReservationTable makes, on a dict of documents."""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def bulk_write(self, ops, ordered=True):
+        errors = []
+        for index, op in enumerate(ops):
+            doc = self.docs.get(op._filter["_id"])
+            if doc is None:
+                doc = self.docs[op._filter["_id"]] = {"_id": op._filter["_id"]}
+            elif not matches(doc, op._filter):
+                # The upsert would insert a second document with this _id
+                errors.append({"index": index, "code": DUPLICATE_KEY})
+                continue
+            apply(doc, op._doc)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+    async def find(self, query, projection=None):
+        for doc in list(self.docs.values()):
+            if matches(doc, query):
+                yield dict(doc)
+
+    async def update_many(self, query, update):
+        for doc in self.docs.values():
+            if matches(doc, query):
+                apply(doc, update)
+
+    async def delete_many(self, query):
+        gone = [key for key, doc in self.docs.items() if matches(doc, query)]
+        for key in gone:
+            del self.docs[key]
+        return Result(len(gone))
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    fake = FakeCollection()
+    monkeypatch.setattr(reservations_module, "collection", fake)
+    return fake
+
+
+def first_free(table, qty):
+    """A plan that takes the first qty units nobody holds, like the optimizer does."""
+    async def plan():
+        held = table.held(UNITS)
+        return [pid for pid in UNITS if pid not in held][:qty]
+    return plan
+
+
+def reserve(table, qty):
+    return asyncio.run(table.reserve(first_free(table, qty), lambda units: units))
+
+
+def test_reserve_claims_the_planned_units(collection):
+    table = ReservationTable(ttl=300)
+    units, hold = reserve(table, 2)
+    assert units == ["P1", "P2"]
+    assert table.held(UNITS) == {"P1", "P2"}
+    assert {pid: doc["reservationId"] for pid, doc in collection.docs.items()} == {
+        "P1": hold["reservationId"], "P2": hold["reservationId"]
+    }
+    assert hold["reservedUntil"] == collection.docs["P1"]["expiresAt"]
+
+
+def test_later_reservations_skip_held_units(collection):
+    table = ReservationTable(ttl=300)
+    reserve(table, 2)
+    units, _ = reserve(table, 2)
+    assert units == ["P3", "P4"]
+
+
+def test_units_held_by_another_worker_are_learned_and_planned_around(collection):
+    other, table = ReservationTable(ttl=300), ReservationTable(ttl=300)
+    reserve(other, 1)
+    units, hold = reserve(table, 2)
+    assert units == ["P2", "P3"]
+    assert table.held(["P1"]) == {"P1"}
+    assert (table.claims, table.conflicts) == (2, 1)
+    # The refused attempt's partial claim was dropped
+    assert all(collection.docs[pid]["reservationId"] == hold["reservationId"] for pid in units)
+
+
+def test_reserve_gives_up_when_every_attempt_is_refused(collection, monkeypatch):
+    other, table = ReservationTable(ttl=300), ReservationTable(ttl=300)
+    _, theirs = reserve(other, 4)
+    # Never learning the other holds, every attempt plans on the same units
+    monkeypatch.setattr(table, "_learn", lambda unit_ids, now: asyncio.sleep(0))
+    with pytest.raises(HTTPException) as error:
+        reserve(table, 1)
+    assert error.value.status_code == 409
+    assert (table.claims, table.conflicts) == (3, 3)
+    assert all(doc["reservationId"] == theirs["reservationId"] for doc in collection.docs.values())
+
+
+def test_release_frees_the_units(collection):
+    table = ReservationTable(ttl=300)
+    _, hold = reserve(table, 2)
+    assert asyncio.run(table.release(hold["reservationId"])) == 2
+    assert table.held(UNITS) == set()
+    assert collection.docs == {}
+
+
+def test_expired_reservations_are_free(collection):
+    table = ReservationTable(ttl=300)
+    _, hold = reserve(table, 2)
+    past = datetime.utcnow() - timedelta(seconds=1)
+    for pid in ("P1", "P2"):
+        collection.docs[pid]["expiresAt"] = past
+        table.units[pid] = (hold["reservationId"], past)
+    assert table.held(UNITS) == set()
+    units, _ = reserve(ReservationTable(ttl=300), 2)
+    assert units == ["P1", "P2"]
+
+
+def test_convert_turns_the_reservation_into_an_order_hold(collection):
+    table = ReservationTable(ttl=300)
+    _, hold = reserve(table, 3)
+    refused = asyncio.run(table.convert(hold["reservationId"], "O1", ["P1", "P2"]))
+    assert refused == []
+    assert {pid: doc.get("orderId") for pid, doc in collection.docs.items()} == {"P1": "O1", "P2": "O1"}
+    assert all("expiresAt" not in doc for doc in collection.docs.values())
+    # The unit the order didn't use went back to stock
+    assert table.held(UNITS) == {"P1", "P2"}
+
+
+def test_convert_refuses_units_held_elsewhere(collection):
+    other, table = ReservationTable(ttl=300), ReservationTable(ttl=300)
+    _, theirs = reserve(other, 1)
+    _, mine = reserve(table, 1)
+    refused = asyncio.run(table.convert(mine["reservationId"], "O1", ["P1", "P2"]))
+    assert refused == ["P1"]
+    assert collection.docs["P1"]["reservationId"] == theirs["reservationId"]
+    # Nothing was converted; the order's own unit is a plain reservation again
+    assert "orderId" not in collection.docs["P2"] and "expiresAt" in collection.docs["P2"]
+
+
+def test_release_order_frees_the_order_units(collection):
+    table = ReservationTable(ttl=300)
+    _, hold = reserve(table, 2)
+    asyncio.run(table.convert(hold["reservationId"], "O1", ["P1", "P2"]))
+    assert asyncio.run(table.release_order("O1")) == 2
+    assert table.held(UNITS) == set()
+    assert collection.docs == {}
+
+
+def test_reserve_each_holds_every_result_separately(collection):
+    table = ReservationTable(ttl=300)
+
+    async def plan():
+        held = table.held(UNITS)
+        free = [pid for pid in UNITS if pid not in held]
+        return [free[:2], [], free[2:3]]
+
+    results, holds = asyncio.run(table.reserve_each(plan, lambda units: units))
+    assert results == [["P1", "P2"], [], ["P3"]]
+    assert holds[1] is None
+    assert holds[0]["reservationId"] != holds[2]["reservationId"]
+    assert collection.docs["P3"]["reservationId"] == holds[2]["reservationId"]
+
+
+def test_reserving_while_disabled_is_refused(collection):
+    table = ReservationTable(ttl=0)
+    with pytest.raises(HTTPException) as error:
+        reserve(table, 1)
+    assert error.value.status_code == 400
+    assert table.held(UNITS) == set()
+    assert asyncio.run(table.convert(None, "O1", ["P1"])) == []
+    assert collection.docs == {}
+
+
+def test_calls_reserve_by_default_while_enabled():
+    on, off = ReservationTable(ttl=300), ReservationTable(ttl=0)
+    assert on.wanted(None) and not on.wanted(False)
+    assert not off.wanted(None) and off.wanted(True)
@@ -0,0 +1,74 @@
+from optimizer.result_cache import ResultCache
+
+
+def cached(cache, product="Paracetamol", qty=10, result=None):
+    key = cache.key(product, qty, "0xR1", False, "greedy")
+    cache.put(key, result or {"status": "ok", "qty": qty}, cache.token(product))
+    return key
+
+
+def test_hits_and_misses_are_counted():
+    cache = ResultCache(max_size=8, ttl=60)
+    key = cache.key("Paracetamol", 10, "0xR1", False, "greedy")
+    assert cache.get(key) is None
+    cached(cache)
+    assert cache.get(key) == {"status": "ok", "qty": 10}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_unusable_entry_is_a_miss_and_is_dropped():
+    cache = ResultCache(max_size=8, ttl=60)
+    key = cached(cache)
+    assert cache.get(key, usable=lambda result: False) is None
+    assert key not in cache.entries
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stale"]) == (0, 1, 1)
+    assert cache.get(key, usable=lambda result: True) is None
+    assert cache.stats()["hits"] == 0
+
+
+def test_expired_entry_is_a_miss():
+    cache = ResultCache(max_size=8, ttl=-1)
+    key = cached(cache)
+    assert cache.get(key) is None
+    assert (cache.stats()["expired"], cache.stats()["hits"]) == (1, 0)
+
+
+def test_invalidate_products_drops_only_that_product():
+    cache = ResultCache(max_size=8, ttl=60)
+    paracetamol = cached(cache, "Paracetamol")
+    insulin = cached(cache, "Insulin")
+    cache.invalidate_products(["paracetamol"])
+    assert cache.get(paracetamol) is None
+    assert cache.get(insulin) is not None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_result_computed_across_an_invalidation_is_not_stored():
+    cache = ResultCache(max_size=8, ttl=60)
+    key = cache.key("Paracetamol", 10, "0xR1", False, "greedy")
+    token = cache.token("Paracetamol")
+    cache.invalidate_products(["Paracetamol"])
+    cache.put(key, {"status": "ok"}, token)
+    assert key not in cache.entries
+
+
+def test_graph_change_clears_everything():
+    cache = ResultCache(max_size=8, ttl=60)
+    key = cached(cache)
+    token = cache.token("Insulin")
+    cache.on_graph_change("update", "0xD1", "0xR1", None, None)
+    assert cache.get(key) is None
+    cache.put(cache.key("Insulin", 1, "0xR1", False, "greedy"), {"status": "ok"}, token)
+    assert cache.stats()["size"] == 0
+
+
+def test_lru_eviction():
+    cache = ResultCache(max_size=2, ttl=60)
+    first = cached(cache, qty=1)
+    second = cached(cache, qty=2)
+    cache.get(first)
+    cached(cache, qty=3)
+    assert second not in cache.entries and first in cache.entries
+    assert cache.stats()["evictions"] == 1
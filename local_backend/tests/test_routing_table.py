@@ -0,0 +1,140 @@
+import asyncio
+import random
+
+import pytest
+
+from optimizer import routing_table as routing_table_module
+from optimizer.executor import graph_executor
+from optimizer.graph_cache import graph_cache
+from optimizer.routing_table import routing_table
+from optimizer.utils import path_from_tree, shortest_path_tree
+
+
+def connection(src, dst, cost, time):
+    return {"fromWalletAddress": src, "toWalletAddress": dst, "costPerUnit": cost, "transitTimeDays": time}
+
+
+def random_network(seed, nodes=30, edges=60):
+    rng = random.Random(seed)
+    wallets = [f"0xN{i}" for i in range(nodes)]
+    return [connection(*rng.sample(wallets, 2), rng.randint(1, 9), rng.randint(0, 5)) for _ in range(edges)]
+
+
+async def load_all():
+    for target in graph_cache.adjacency:
+        for return_time in (True, False):
+            await routing_table.load_tree(target, return_time)
+
+
+async def assert_matches_dijkstra():
+    view = graph_cache.view()
+    for target in graph_cache.adjacency:
+        for return_time in (True, False):
+            live = shortest_path_tree(view, target, return_time)
+            table = await routing_table.load_tree(target, return_time)
+            for node in graph_cache.adjacency:
+                expected, got = path_from_tree(live, node), path_from_tree(table, node)
+                assert (expected is None) == (got is None), (target, node)
+                if expected is not None:
+                    assert got[1] == pytest.approx(expected[1]) and got[2] == pytest.approx(expected[2])
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    monkeypatch.setattr(graph_executor, "kind", "inline")
+    count = []
+    compute = routing_table_module._compute_row
+
+    def counting(*args):
+        count.append(1)
+        return compute(*args)
+
+    monkeypatch.setattr(routing_table_module, "_compute_row", counting)
+    yield count
+    graph_cache.load_connections([])
+    graph_cache.loaded = False
+    routing_table.clear()
+
+
+def test_rows_are_built_on_first_use(builds):
+    async def run():
+        graph_cache.load_connections(random_network(1))
+        assert routing_table.tree("0xN1", True) is None
+        await routing_table.load_tree("0xN1", True)
+        await routing_table.load_tree("0xN1", True)
+        assert routing_table.tree("0xN1", True) is not None
+
+    asyncio.run(run())
+    assert len(builds) == 1
+
+
+def test_connection_changes_drop_only_affected_rows(builds):
+    async def run():
+        graph_cache.load_connections(random_network(1))
+        await load_all()
+        graph_cache.upsert_connection(connection("0xN1", "0xN2", 1, 0))
+        graph_cache.remove_connection(*next(iter(graph_cache.edges)))
+        await assert_matches_dijkstra()
+
+    asyncio.run(run())
+
+
+def test_rows_the_change_cannot_affect_are_kept(builds):
+    async def run():
+        graph_cache.load_connections([
+            connection("0xA", "0xB", 1, 1), connection("0xB", "0xC", 1, 1), connection("0xD", "0xE", 1, 1),
+        ])
+        await load_all()
+        # A dearer parallel route, and a change on the other component
+        graph_cache.upsert_connection(connection("0xA", "0xC", 5, 5))
+        graph_cache.upsert_connection(connection("0xD", "0xE", 2, 2))
+        assert sorted(target for target, metric in routing_table.rows) == ["0xA", "0xA", "0xB", "0xB", "0xC", "0xC"]
+        await assert_matches_dijkstra()
+
+    asyncio.run(run())
+
+
+def test_new_nodes_invalidate_rows_that_reach_them(builds):
+    async def run():
+        graph_cache.load_connections(random_network(2))
+        await load_all()
+        graph_cache.upsert_connection(connection("0xLeaf", "0xN3", 2, 1))
+        graph_cache.upsert_connection(connection("0xN4", "0xLeaf2", 5, 2))
+        graph_cache.upsert_connection(connection("0xIslandA", "0xIslandB", 3, 1))
+        await assert_matches_dijkstra()
+        # The new leaf can carry traffic to its own new neighbours
+        graph_cache.upsert_connection(connection("0xLeaf", "0xLeaf3", 1, 1))
+        await assert_matches_dijkstra()
+
+    asyncio.run(run())
+
+
+def test_least_recently_used_rows_are_evicted(builds, monkeypatch):
+    monkeypatch.setattr(routing_table, "max_rows", 3)
+
+    async def run():
+        graph_cache.load_connections(random_network(3))
+        for target in ("0xN1", "0xN2", "0xN3"):
+            await routing_table.load_tree(target, True)
+        await routing_table.load_tree("0xN1", True)
+        await routing_table.load_tree("0xN4", True)
+
+    asyncio.run(run())
+    assert list(routing_table.rows) == [("0xN3", "time"), ("0xN1", "time"), ("0xN4", "time")]
+
+
+def test_rows_computed_across_a_graph_change_are_not_kept(builds, monkeypatch):
+    compute = routing_table_module._compute_row
+
+    def changing(*args):
+        graph_cache.upsert_connection(connection("0xN1", "0xN2", 1, 0))
+        return compute(*args)
+
+    monkeypatch.setattr(routing_table_module, "_compute_row", changing)
+
+    async def run():
+        graph_cache.load_connections(random_network(4))
+        return await routing_table.load_tree("0xN1", True)
+
+    assert asyncio.run(run()) is not None
+    assert routing_table.rows == {}
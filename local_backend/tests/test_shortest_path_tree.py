@@ -0,0 +1,39 @@
+import random
+
+import pytest
+
+from optimizer.graph_cache import graph_cache
+from optimizer.utils import path_from_tree, reverse_graph, shortest_path, shortest_path_tree
+
+
+@pytest.fixture
+def network():
+    rng = random.Random(7)
+    wallets = [f"0xN{i}" for i in range(60)]
+    connections = [
+        {"fromWalletAddress": a, "toWalletAddress": b,
+         "costPerUnit": rng.randint(1, 20), "transitTimeDays": rng.randint(1, 10)}
+        for a, b in {tuple(rng.sample(wallets, 2)) for _ in range(150)}
+    ]
+    graph_cache.load_connections(connections)
+    yield wallets
+    graph_cache.load_connections([])
+    graph_cache.loaded = False
+
+
+@pytest.mark.parametrize("return_time", [False, True])
+def test_one_tree_gives_every_source_its_shortest_route(network, return_time):
+    graph = graph_cache.view(product_weight=2, required_qty=3)
+    target = network[0]
+    tree = shortest_path_tree(reverse_graph(graph), target, return_time)
+    for source in network[1:]:
+        expected = shortest_path(graph, source, target, return_time)
+        route = path_from_tree(tree, source)
+        if expected is None:
+            assert route is None
+            continue
+        path, cost, priority = route
+        # Equal-weight routes may differ, their totals may not
+        assert (cost, priority) == pytest.approx(expected[1:])
+        assert path[0] == source and path[-1] == target
+        assert all(any(n == b for n, _, _ in graph[a]) for a, b in zip(path, path[1:]))
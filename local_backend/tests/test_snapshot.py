@@ -0,0 +1,107 @@
+import copy
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+from optimizer.graph_cache import graph_cache
+from optimizer.inventory_index import inventory_index
+from optimizer.snapshot import read_snapshot, write_snapshot
+
+NODES = [
+    {"walletAddress": "0xM1", "geo": {"type": "Point", "coordinates": [77.59, 12.97]}, "coldChain": True},
+    {"walletAddress": "0xD1", "geo": {"type": "Point", "coordinates": [80.27, 13.08]}, "coldChain": True},
+    {"walletAddress": "0xD2"},
+    {"walletAddress": "0xR1", "geo": {"type": "Point", "coordinates": [72.88, 19.07]}},
+]
+CONNECTIONS = [
+    {"fromWalletAddress": "0xM1", "toWalletAddress": "0xD1", "fromType": "manufacturer", "toType": "distributor",
+     "costPerUnit": 2.5, "transitTimeDays": 2, "coldChain": True},
+    {"fromWalletAddress": "0xD1", "toWalletAddress": "0xR1", "fromType": "distributor", "toType": "retailer",
+     "costPerUnit": 1, "transitTimeDays": 1.5},
+    {"fromWalletAddress": "0xD2", "toWalletAddress": "0xR1", "fromType": "distributor", "toType": "retailer",
+     "costPerUnit": 4, "transitTimeDays": 3},
+]
+INVENTORY = {
+    "paracetamol": {
+        "0xD1": {"entityType": "distributor", "qty": 3, "productIds": ["P1", "P2", "P3"], "untrackedQty": 0},
+        "0xD2": {"entityType": "distributor", "qty": 7.5, "productIds": [], "untrackedQty": 7.5},
+    },
+    "insulin": {
+        "0xR1": {"entityType": "retailer", "qty": 1, "productIds": ["I1"], "untrackedQty": 0},
+    },
+}
+
+
+def graph_state():
+    return (
+        graph_cache.edges, graph_cache.adjacency, graph_cache.transit_times, graph_cache.cold_edges,
+        graph_cache.node_types, graph_cache.coordinates, graph_cache.cold_nodes,
+    )
+
+
+def csr_arrays(csr):
+    return [list(csr.nodes)] + [list(values) for values in (csr.offsets, csr.targets, csr.costs, csr.times)]
+
+
+def same_coordinates(a, b):
+    return all(x == y or (math.isnan(x) and math.isnan(y)) for x, y in zip(a, b))
+
+
+@pytest.fixture
+def network():
+    graph_cache.load_nodes(NODES)
+    graph_cache.load_connections(CONNECTIONS)
+    inventory_index.load_entries(copy.deepcopy(INVENTORY))
+    yield
+    graph_cache.load_nodes([])
+    graph_cache.load_connections([])
+    inventory_index.load_entries({})
+    graph_cache.loaded = inventory_index.loaded = False
+
+
+def test_snapshot_round_trip(network, tmp_path):
+    path = str(tmp_path / "network.snapshot")
+    created_at = datetime.utcnow()
+    before = copy.deepcopy(graph_state())
+    csr = graph_cache.csr()
+    before_csr = csr_arrays(csr)
+    before_lat, before_lng = list(csr.lat), list(csr.lng)
+
+    write_snapshot(path, created_at)
+    graph_cache.load_nodes([])
+    graph_cache.load_connections([])
+    inventory_index.load_entries({})
+
+    header = read_snapshot(path)
+    assert header["createdAt"] == created_at.isoformat()
+    assert graph_state() == before
+    assert inventory_index.products == INVENTORY
+    assert inventory_index.wallet_products == {"0xD1": {"paracetamol"}, "0xD2": {"paracetamol"}, "0xR1": {"insulin"}}
+    # The CSR is mapped from the file, not rebuilt
+    csr = graph_cache.csr()
+    assert csr.source is not None
+    assert csr_arrays(csr) == before_csr
+    assert same_coordinates(csr.lat, before_lat) and same_coordinates(csr.lng, before_lng)
+
+
+def test_snapshot_keeps_integer_values(network, tmp_path):
+    path = str(tmp_path / "network.snapshot")
+    write_snapshot(path, datetime.utcnow())
+    read_snapshot(path)
+    assert graph_cache.transit_times[("0xM1", "0xD1")] == 2
+    assert isinstance(graph_cache.transit_times[("0xM1", "0xD1")], int)
+    assert isinstance(inventory_index.products["paracetamol"]["0xD1"]["qty"], int)
+
+
+def test_missing_or_foreign_snapshot_is_ignored(network, tmp_path):
+    assert read_snapshot(str(tmp_path / "missing.snapshot")) is None
+    foreign = tmp_path / "foreign.snapshot"
+    foreign.write_bytes(b"not a snapshot at all")
+    assert read_snapshot(str(foreign)) is None
+
+
+def test_snapshot_older_than_the_change_log_is_ignored(network, tmp_path):
+    path = str(tmp_path / "network.snapshot")
+    write_snapshot(path, datetime.utcnow() - timedelta(days=365))
+    assert read_snapshot(path) is None
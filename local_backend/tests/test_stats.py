@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+from optimizer import stats
+from optimizer.stats import OptimizerTrace, mongo_command_counter
+
+
+def command(name):
+    return SimpleNamespace(command_name=name)
+
+
+def test_traces_count_the_mongo_commands_issued_while_open(monkeypatch):
+    reports = []
+
+    def failing_hook(report):
+        raise RuntimeError("metrics backend down")
+
+    monkeypatch.setattr(stats, "metrics_hooks", [failing_hook, reports.append])
+    mongo_command_counter.started(command("find"))
+    with OptimizerTrace(product_name="Aspirin", mode="greedy") as trace:
+        with trace.phase("search"):
+            mongo_command_counter.started(command("find"))
+            mongo_command_counter.started(command("aggregate"))
+            mongo_command_counter.started(command("find"))
+        trace.search({"algorithm": "dijkstra", "settled": 3, "heap_pushes": 4})
+        trace.search(None)
+        trace.count("candidates", 2)
+    mongo_command_counter.started(command("find"))
+
+    [report] = reports
+    assert report["product_name"] == "Aspirin" and report["mode"] == "greedy"
+    assert report["mongo_round_trips"] == 3
+    assert report["mongo_commands"] == {"find": 2, "aggregate": 1}
+    assert report["searches"] == [{"algorithm": "dijkstra", "settled": 3, "heap_pushes": 4}]
+    assert report["counts"] == {"candidates": 2}
+    assert set(report["phases_ms"]) == {"search"}
+    assert report["total_ms"] >= report["phases_ms"]["search"]
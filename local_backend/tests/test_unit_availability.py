@@ -0,0 +1,27 @@
+import asyncio
+
+from controllers import product_controller
+
+
+class FakeUnits:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query["productId"]["$in"])
+
+        async def cursor():
+            for doc in self.docs:
+                if doc["productId"] in query["productId"]["$in"]:
+                    yield doc
+        return cursor()
+
+
+def test_units_are_checked_in_chunks_and_in_transit_ones_dropped(monkeypatch):
+    units = FakeUnits([{"productId": f"P{i}", "inTransit": i == 3} for i in range(5)])
+    monkeypatch.setattr(product_controller, "collection", units)
+    ids = ["P0", "P1", "P1", "P2", "P3", "P4", "P9"]
+    assert asyncio.run(product_controller.get_available_product_ids(ids, chunk_size=2)) == {"P0", "P1", "P2", "P4"}
+    assert units.queries == [["P0", "P1"], ["P2", "P3"], ["P4", "P9"]]
+